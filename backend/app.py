@@ -5,22 +5,33 @@ Generates summaries, YouTube scripts, and Shorts scripts using Hugging Face mode
 
 import os
 import requests
+import httpx
 from typing import Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import logging
 from urllib.parse import urlparse
 import re
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from app import prompts
+from app.logs import configure_logging, get_logger
+from app.tracing import start_trace
+from app.config import get_settings
+from app.backends import HFRouterBackend
+from app.boilerplate import get_boilerplate_filter
+from app.condense import condense_for_mode
+from app.density import extract_main_paragraphs_async
+from app.digest import get_digest
+from app.extractors import soup_paragraphs
+from app.fetch import FetchError, get_fetcher
+from app.providers import AllTargetsFailedError, RejectedRequestError
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+configure_logging()
+logger = get_logger(__name__)
 
 app = FastAPI(
     title="Creator Transformer API",
@@ -35,8 +46,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """Assign a request ID and log each request with its duration"""
+    trace = start_trace(f"{request.method} {request.url.path}", request.headers.get("X-Request-ID"))
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        logger.info(
+            "request", method=request.method, path=request.url.path, status=status,
+            duration_ms=round(trace.finish() * 1000, 1), sampled=status < 400
+        )
+    response.headers["X-Request-ID"] = trace.request_id
+    return response
+
 # Pydantic models
 class GenerateRequest(BaseModel):
     input: str  # Changed from 'text' to 'input'
@@ -66,13 +95,22 @@ class GenerateAllResponse(BaseModel):
 
 # Hugging Face Router configuration
 HF_API_TOKEN = os.getenv("HF_API_TOKEN")
-HF_MODEL = "meta-llama/Llama-3.1-8B-Instruct:novita"
-HF_BASE_URL = "https://router.huggingface.co/v1"
+HF_BASE_URL = get_settings().hf_router_base
 HF_TIMEOUT = 60
 MAX_TOKENS_DEFAULT = 512
 
+STREAM_CHUNK_BYTES = 64 * 1024
+
 if not HF_API_TOKEN:
-    logger.warning("HF_API_TOKEN not set - API calls will fail!")
+    logger.warning("hf_token_missing")
+
+# Equivalent model:provider targets (HF_ROUTER_TARGETS); each call goes to
+# the fastest healthy one, failing over (and optionally hedging) to the others
+router_settings = get_settings()
+router_backend = HFRouterBackend(
+    router_settings.hf_router_targets, HF_API_TOKEN or "", base_url=HF_BASE_URL,
+    timeout=HF_TIMEOUT, hedge=router_settings.hf_router_hedge, hedge_delay=router_settings.hf_router_hedge_delay
+)
 
 def is_url(text: str) -> bool:
     """Check if the input text is a URL"""
@@ -82,66 +120,27 @@ def is_url(text: str) -> bool:
     except:
         return False
 
-def extract_content_from_url(url: str) -> str:
+async def extract_content_from_url(url: str) -> str:
     """Extract and clean text content from a URL with advanced processing"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove unwanted elements
-        for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 
-                           'menu', 'form', 'button', 'input', 'select', 'textarea',
-                           'iframe', 'noscript', 'meta', 'link']):
-            element.decompose()
-        
-        # Try to find main content areas
-        content_selectors = [
-            'article', 'main', '[role="main"]', '.content', '.post-content', 
-            '.entry-content', '.article-content', '.post-body', '.story-body',
-            '.article-body', '.content-body', '#content', '#main-content'
-        ]
-        
-        main_content = None
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                main_content = elements[0]
-                break
-        
-        if main_content:
-            text_content = main_content.get_text()
+        if get_settings().url_extractor == "density":
+            # Parse while downloading; the page is never held or built as a tree
+            async with get_fetcher().stream(url) as response:
+                cleaned_lines = await extract_main_paragraphs_async(
+                    response.aiter_bytes(chunk_size=STREAM_CHUNK_BYTES),
+                    encoding=response.charset_encoding,
+                    max_bytes=get_settings().max_page_bytes
+                )
         else:
-            # Fallback to body content
-            body = soup.find('body')
-            text_content = body.get_text() if body else soup.get_text()
+            page = await get_fetcher().get(url)
+            cleaned_lines = soup_paragraphs(page.content)
         
-        # Advanced text cleaning
-        lines = text_content.split('\n')
-        cleaned_lines = []
+        # Drop repeated paragraphs and this site's recurring boilerplate
+        if get_settings().boilerplate_filter_enabled:
+            cleaned_lines = get_boilerplate_filter().filter(cleaned_lines, url)
         
-        for line in lines:
-            line = line.strip()
-            # Skip empty lines, very short lines, and common non-content
-            if (len(line) > 10 and 
-                not line.lower().startswith(('cookie', 'javascript', 'advertisement', 'ads', 'menu', 'navigation')) and
-                not re.match(r'^[\s\W]*$', line)):  # Skip lines with only whitespace/symbols
-                cleaned_lines.append(line)
-        
-        # Join and clean the text
-        text = ' '.join(cleaned_lines)
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
+        # Join paragraphs, removing extra whitespace within each
+        text = '\n\n'.join(re.sub(r'\s+', ' ', line) for line in cleaned_lines).strip()
         
         # Extract meaningful content (handle short content gracefully)
         if len(text) < 50:
@@ -165,409 +164,53 @@ def extract_content_from_url(url: str) -> str:
         domain = urlparse(url).netloc
         text = f"[Kaynak: {domain}]\n\n{text}"
         
-        logger.info(f"Successfully extracted {len(text)} characters from {domain}")
+        logger.info("url_extracted", stage="extract", domain=domain, chars=len(text), sampled=True)
         return text
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request error for URL {url}: {str(e)}")
+    except FetchError as e:
+        logger.error("url_request_error", stage="extract", url=url, error=str(e))
         raise HTTPException(
             status_code=400,
             detail=f"Web sitesine erişilemedi: {str(e)}"
         )
     except Exception as e:
-        logger.error(f"Content extraction error for URL {url}: {str(e)}")
+        logger.error("url_extraction_error", stage="extract", url=url, error=str(e))
         raise HTTPException(
             status_code=400,
             detail=f"İçerik çıkarılamadı: {str(e)}"
         )
 
-def get_hf_headers():
-    """Get headers for Hugging Face Router API"""
-    if not HF_API_TOKEN:
-        raise HTTPException(
-            status_code=500, 
-            detail="HF_API_TOKEN environment variable not set"
-        )
-    return {
-        "Authorization": f"Bearer {HF_API_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
 def create_system_message(task: str, lang: str, tone: str = "casual", length: str = "medium", persona: str = "generic") -> str:
     """Create optimized system message based on task, language, tone, length and persona"""
-    
-    # Persona configurations
-    personas = {
-        "news_anchor": {
-            "tr": {"style": "objektif haber sunumu tarzında", "voice": "güvenilir ve profesyonel"},
-            "en": {"style": "objective news presentation style", "voice": "credible and professional"}
-        },
-        "educator": {
-            "tr": {"style": "eğitici ve açıklayıcı", "voice": "sabırlı ve anlaşılır"},
-            "en": {"style": "educational and explanatory", "voice": "patient and clear"}
-        },
-        "vlogger": {
-            "tr": {"style": "kişisel ve samimi vlog tarzında", "voice": "enerjik ve eğlenceli"},
-            "en": {"style": "personal and intimate vlog style", "voice": "energetic and entertaining"}
-        },
-        "influencer": {
-            "tr": {"style": "trend odaklı ve çekici", "voice": "karizmatik ve ikna edici"},
-            "en": {"style": "trend-focused and engaging", "voice": "charismatic and persuasive"}
-        },
-        "brand": {
-            "tr": {"style": "marka kimliği uyumlu", "voice": "profesyonel ve tutarlı"},
-            "en": {"style": "brand identity aligned", "voice": "professional and consistent"}
-        },
-        "generic": {
-            "tr": {"style": "genel içerik oluşturucu", "voice": "net ve etkili"},
-            "en": {"style": "general content creator", "voice": "clear and effective"}
-        }
-    }
-    
-    # Length guidelines
-    length_guide = {
-        "short": {"summary": "2-3 madde, 1 paragraf", "youtube": "30-60 saniye", "shorts": "15-30 saniye", "social": "1-2 cümle", "seo": "kısa"},
-        "medium": {"summary": "4-6 madde, 2 paragraf", "youtube": "2-5 dakika", "shorts": "30-60 saniye", "social": "2-3 cümle", "seo": "orta"},
-        "long": {"summary": "6-10 madde, 3-4 paragraf", "youtube": "5-10 dakika", "shorts": "60-90 saniye", "social": "3-4 cümle", "seo": "uzun"}
-    }
-    
-    # Tone adjustments
-    tone_styles = {
-        "casual": {"tr": "sohbet tarzında, samimi", "en": "conversational, friendly"},
-        "formal": {"tr": "profesyonel, resmi", "en": "professional, formal"},
-        "energetic": {"tr": "enerjik, heyecanlı", "en": "energetic, exciting"}
-    }
-    
-    persona_config = personas.get(persona, personas["generic"])
-    persona_style = persona_config[lang]["style"]
-    persona_voice = persona_config[lang]["voice"]
-    
-    if lang == "tr":
-        if task == "summary":
-            return f"""Sen {persona_style} uzman bir içerik analisti ve özetleme uzmanısın. Görevin verilen metni {tone_styles[tone]['tr']} bir şekilde özetlemek.
-
-PERSONA: {persona_voice} ses tonu kullan
-ÖZETLEME KRİTERLERİ:
-• Ana fikirleri ve önemli detayları kaybet
-• {length_guide[length]['summary']} formatında yaz
-• Gereksiz tekrarları çıkar
-• Mantıklı akış ve yapı oluştur
-• Anahtar kavramları vurgula
-• Anlaşılır ve akıcı dil kullan
-
-ÇIKTI FORMATI:
-📋 Ana Noktalar:
-• [Her madde için spesifik ve değerli bilgi]
-
-📝 Özet:
-[Konunun genel değerlendirmesi ve sonuç]
-
-Ton: {tone_styles[tone]['tr']}"""
-
-        elif task == "youtube":
-            return f"""Sen {persona_style} profesyonel bir YouTube içerik yazarısın. Verilen konudan {length_guide[length]['youtube']} uzunluğunda YouTube video senaryosu oluşturacaksın.
-
-PERSONA: {persona_voice} ses tonu kullan
-SENARYO KRİTERLERİ:
-• İlgi çekici açılış (hook) ile başla
-• Ana konuları mantıklı sırayla işle
-• İzleyiciyi engage edecek sorular sor
-• Örnekler ve pratik bilgiler ver
-• Güçlü bir kapanış yap
-• Call-to-action ekle
-
-ÇIKTI FORMATI:
-🎬 YouTube Video Senaryosu
-
-🚀 GİRİŞ (0-15 saniye):
-[İlgi çekici açılış, hook]
-
-📚 ANA İÇERİK:
-[Bölüm 1: Temel bilgiler]
-[Bölüm 2: Detaylar ve örnekler]  
-[Bölüm 3: Pratik uygulamalar]
-
-🎯 KAPANIŞ:
-[Özet ve call-to-action]
-
-Ton: {tone_styles[tone]['tr']}"""
-
-        elif task == "shorts":
-            return f"""Sen {persona_style} viral içerik uzmanısın. Verilen konudan {length_guide[length]['shorts']} uzunluğunda YouTube Shorts/TikTok senaryosu oluşturacaksın.
-
-PERSONA: {persona_voice} ses tonu kullan
-SHORTS KRİTERLERİ:
-• İlk 3 saniyede dikkat çek
-• Hızlı tempolu ve dinamik
-• Görsel açıklamalar ekle
-• Trend olan hashtag'ler kullan
-• Viral potansiyeli yüksek
-• Tekrar izletecek kalitede
-
-ÇIKTI FORMATI:
-⚡ Shorts/TikTok Senaryosu
-
-🔥 AÇILIŞ (0-3 saniye):
-[Çarpıcı soru/iddia]
-
-💥 ANA MESAJ (3-{length_guide[length]['shorts'].split('-')[0]} saniye):
-[Hızlı bilgi aktarımı]
-
-✨ KAPANIŞ:
-[Güçlü sonuç ve çağrı]
-
-📱 HASHTAGS: #viral #trending [konuya özel]
-
-Ton: {tone_styles[tone]['tr']}"""
-
-        elif task == "social":
-            return f"""Sen {persona_style} sosyal medya uzmanısın. Verilen içerikten {length_guide[length]['social']} uzunluğunda sosyal medya paylaşımı oluşturacaksın.
-
-PERSONA: {persona_voice} ses tonu kullan
-SOSYAL MEDYA KRİTERLERİ:
-• Dikkat çekici açılış
-• Ana mesajı net ver
-• Etkileşimi artıracak içerik
-• Uygun hashtag'ler
-• Call-to-action
-
-ÇIKTI FORMATI:
-📱 Sosyal Medya Paylaşımı:
-[Ana içerik]
-
-#hashtag #tag
-
-Ton: {tone_styles[tone]['tr']}"""
-
-        elif task == "seo":
-            return f"""Sen {persona_style} SEO uzmanısın. Verilen içerik için kapsamlı SEO paketi oluşturacaksın.
-
-PERSONA: {persona_voice} yaklaşım kullan
-SEO KRİTERLERİ:
-• Anahtar kelime optimizasyonu
-• Meta açıklama
-• Başlık önerileri
-• Hashtag stratejisi
-• İçerik yapısı
-
-ÇIKTI FORMATI:
-🔍 SEO Paketi:
-
-📝 Başlık Önerileri:
-• [3 farklı başlık seçeneği]
-
-📄 Meta Açıklama:
-[155 karakter meta açıklama]
-
-🏷️ Anahtar Kelimeler:
-[Ana ve destekleyici anahtar kelimeler]
-
-#️⃣ Hashtag Önerileri:
-[Platform bazlı hashtag'ler]
-
-Ton: {tone_styles[tone]['tr']}"""
-    
-    else:  # English
-        if task == "summary":
-            return f"""You are an expert content analyst and summarization specialist with {persona_style} approach. Your task is to create a {tone_styles[tone]['en']} summary of the given content.
-
-PERSONA: Use {persona_voice} tone
-SUMMARIZATION CRITERIA:
-• Extract key ideas and important details
-• Format as {length_guide[length]['summary']}
-• Remove unnecessary repetition
-• Create logical flow and structure  
-• Highlight key concepts
-• Use clear and fluent language
+    return prompts.system_message(task, lang, tone, length, persona)
 
-OUTPUT FORMAT:
-📋 Key Points:
-• [Specific and valuable information for each point]
-
-📝 Summary:
-[Overall assessment and conclusion of the topic]
-
-Tone: {tone_styles[tone]['en']}"""
-
-        elif task == "youtube":
-            return f"""You are a professional YouTube content writer with {persona_style} approach. Create a {length_guide[length]['youtube']} YouTube video script from the given topic.
-
-PERSONA: Use {persona_voice} tone
-SCRIPT CRITERIA:
-• Start with an engaging hook
-• Process main topics in logical order
-• Ask engaging questions for viewers
-• Provide examples and practical information
-• Create a strong conclusion
-• Include call-to-action
-
-OUTPUT FORMAT:
-🎬 YouTube Video Script
-
-🚀 INTRO (0-15 seconds):
-[Engaging opening, hook]
-
-📚 MAIN CONTENT:
-[Section 1: Basic information]
-[Section 2: Details and examples]
-[Section 3: Practical applications]
-
-🎯 CONCLUSION:
-[Summary and call-to-action]
-
-Tone: {tone_styles[tone]['en']}"""
-
-        elif task == "shorts":
-            return f"""You are a viral content expert with {persona_style} approach. Create a {length_guide[length]['shorts']} YouTube Shorts/TikTok script from the given topic.
-
-PERSONA: Use {persona_voice} tone
-SHORTS CRITERIA:
-• Grab attention in first 3 seconds
-• Fast-paced and dynamic
-• Include visual descriptions
-• Use trending hashtags
-• High viral potential
-• Re-watchable quality
-
-OUTPUT FORMAT:
-⚡ Shorts/TikTok Script
-
-🔥 OPENING (0-3 seconds):
-[Striking question/claim]
-
-💥 MAIN MESSAGE (3-{length_guide[length]['shorts'].split('-')[0]} seconds):
-[Rapid information delivery]
-
-✨ CLOSING:
-[Strong conclusion and call]
-
-📱 HASHTAGS: #viral #trending [topic-specific]
-
-Tone: {tone_styles[tone]['en']}"""
-
-        elif task == "social":
-            return f"""You are a social media expert with {persona_style} approach. Create a {length_guide[length]['social']} social media post from the given content.
-
-PERSONA: Use {persona_voice} tone
-SOCIAL MEDIA CRITERIA:
-• Attention-grabbing opening
-• Clear main message
-• Engagement-boosting content
-• Appropriate hashtags
-• Call-to-action
-
-OUTPUT FORMAT:
-📱 Social Media Post:
-[Main content]
-
-#hashtag #tag
-
-Tone: {tone_styles[tone]['en']}"""
-
-        elif task == "seo":
-            return f"""You are an SEO expert with {persona_style} approach. Create a comprehensive SEO package for the given content.
-
-PERSONA: Use {persona_voice} approach
-SEO CRITERIA:
-• Keyword optimization
-• Meta description
-• Title suggestions
-• Hashtag strategy
-• Content structure
-
-OUTPUT FORMAT:
-🔍 SEO Package:
-
-📝 Title Suggestions:
-• [3 different title options]
-
-📄 Meta Description:
-[155 character meta description]
-
-🏷️ Keywords:
-[Primary and supporting keywords]
-
-#️⃣ Hashtag Suggestions:
-[Platform-specific hashtags]
-
-Tone: {tone_styles[tone]['en']}"""
-    
-    return f"You are a helpful {task} content creator with {persona_style} approach. Create {tone} content in {lang}."
+@app.on_event("shutdown")
+async def close_router_client():
+    """Close pooled HF Router and page fetching connections"""
+    await router_backend.close()
+    await get_fetcher().aclose()
 
 async def call_hf_router(messages: list, max_tokens: int = MAX_TOKENS_DEFAULT, temperature: float = 0.3, task: str = "summary", lang: str = "tr") -> str:
-    """Call Hugging Face Router API"""
+    """Call Hugging Face Router API on the fastest healthy target"""
     try:
         if not HF_API_TOKEN:
-            logger.warning("No HF_API_TOKEN provided, returning mock response")
+            logger.warning("hf_mock_response", task=task, reason="no_token")
             return get_mock_response(task, lang)
         
-        headers = get_hf_headers()
-        
-        # Prepare payload for HF Router
-        payload = {
-            "model": HF_MODEL,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
-        
-        logger.info(f"Calling HF Router with model: {HF_MODEL}")
-        
-        response = requests.post(
-            f"{HF_BASE_URL}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=HF_TIMEOUT
-        )
-        
-        if response.status_code != 200:
-            error_msg = f"HF Router error: {response.status_code}"
-            try:
-                error_detail = response.json().get("error", {}).get("message", "Unknown error")
-                error_msg += f" - {error_detail}"
-            except:
-                error_msg += f" - {response.text[:200]}"
-            
-            logger.error(f"HF Router API error: {error_msg}")
-            raise HTTPException(
-                status_code=502,
-                detail=f"LLM provider error: {error_msg}"
-            )
-        
-        result = response.json()
-        
-        # Parse response - try different fields
-        if "choices" in result and len(result["choices"]) > 0:
-            choice = result["choices"][0]
-            if "message" in choice and "content" in choice["message"]:
-                generated_text = choice["message"]["content"]
-            elif "text" in choice:
-                generated_text = choice["text"]
-            else:
-                logger.error(f"Unexpected response format: {result}")
-                raise HTTPException(status_code=502, detail="LLM provider error: Invalid response format")
-        else:
-            logger.error(f"No choices in response: {result}")
-            raise HTTPException(status_code=502, detail="LLM provider error: No content generated")
-        
-        if not generated_text or not generated_text.strip():
-            raise HTTPException(status_code=502, detail="LLM provider error: Empty response")
-        
-        return generated_text.strip()
-        
-    except requests.exceptions.Timeout:
-        logger.error("HF Router API timeout")
-        raise HTTPException(status_code=502, detail="LLM provider error: Request timeout")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"HF Router API request error: {str(e)}")
-        # Return a fallback mock response instead of throwing error
-        return get_mock_response(task, lang)
-    except HTTPException as he:
-        # If it's an HTTP exception, try to return mock response
-        logger.error(f"HF Router HTTP error: {he.detail}")
-        return get_mock_response(task, lang)
-    except Exception as e:
-        logger.error(f"Unexpected error in HF Router call: {str(e)}", exc_info=True)
+        return await router_backend.chat(messages, max_tokens=max_tokens, temperature=temperature)
+        
+    except RejectedRequestError as e:
+        # Every target would reject it the same way (e.g. a prompt over the context length)
+        logger.error("hf_router_rejected", stage="hf", task=task, error=str(e))
+        raise HTTPException(status_code=502, detail=f"LLM provider rejected the request: {e}")
+    except AllTargetsFailedError as e:
+        if all(isinstance(error, httpx.TimeoutException) for error in e.errors.values()):
+            logger.error("hf_router_timeout", stage="hf", task=task, targets=list(e.errors))
+            raise HTTPException(status_code=502, detail="LLM provider error: Request timeout")
+        logger.error("hf_router_failed", stage="hf", task=task, error=str(e))
+        raise HTTPException(status_code=502, detail="LLM provider error: All targets failed")
+    except Exception:
+        logger.exception("hf_router_error", stage="hf", task=task)
         return get_mock_response(task, lang)
 
 def get_mock_response(task: str, lang: str) -> str:
@@ -594,7 +237,7 @@ def get_mock_response(task: str, lang: str) -> str:
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"ok": True, "status": "healthy"}
+    return {"ok": True, "status": "healthy", "providers": router_backend.router.snapshot()}
 
 # Token validation endpoint
 @app.get("/validate-token")
@@ -663,23 +306,20 @@ async def generate_content(request: GenerateRequest):
     content_to_process = request.input.strip()
     
     if is_url(content_to_process):
-        logger.info(f"Processing URL: {content_to_process}")
         try:
-            content_to_process = extract_content_from_url(content_to_process)
-            logger.info(f"Extracted {len(content_to_process)} characters from URL")
+            content_to_process = await extract_content_from_url(content_to_process)
         except HTTPException as he:
             # If content extraction fails, provide a helpful fallback
-            logger.warning(f"URL extraction failed: {he.detail}")
+            logger.warning("url_fallback", stage="extract", error=he.detail)
             content_to_process = f"URL: {content_to_process}\n\nNot: Bu URL'den içerik çıkarılamadı. Lütfen içeriği manuel olarak kopyalayıp yapıştırın veya farklı bir URL deneyin."
         except Exception as e:
-            logger.warning(f"URL extraction error: {str(e)}")
+            logger.warning("url_fallback", stage="extract", error=str(e))
             content_to_process = f"URL: {content_to_process}\n\nNot: Bu URL'den içerik çıkarılamadı. Lütfen içeriği manuel olarak kopyalayıp yapıştırın."
     
     # Create messages for chat completion with enhanced context
     system_message = create_system_message(request.task, request.lang, request.tone, request.length, request.persona)
     
     # Create enhanced user message with more context
-    content_length = len(content_to_process)
     content_type = "URL içeriği" if is_url(request.input.strip()) else "Metin"
     
     # Determine optimal max_tokens based on task and length
@@ -694,38 +334,16 @@ async def generate_content(request: GenerateRequest):
     # Use user's setting or optimal default
     max_tokens = min(request.max_tokens, optimal_tokens.get(request.task, {}).get(request.length, 512))
     
-    if request.lang == "tr":
-        user_content = f"""İçerik Türü: {content_type}
-İçerik Uzunluğu: {content_length} karakter
-Görev: {request.task.title()} oluştur
-Ton: {request.tone.title()}
-Uzunluk: {request.length.title()}
-Persona: {request.persona.title()}
-
-İÇERİK:
-{content_to_process}
-
-Lütfen yukarıdaki içeriği belirtilen kriterlere göre işle ve kaliteli bir çıktı oluştur."""
-    else:
-        user_content = f"""Content Type: {content_type}
-Content Length: {content_length} characters  
-Task: Create {request.task}
-Tone: {request.tone.title()}
-Length: {request.length.title()}
-Persona: {request.persona.title()}
-
-CONTENT:
-{content_to_process}
-
-Please process the above content according to the specified criteria and create a high-quality output."""
+    user_content = prompts.user_message(
+        condense_for_mode(content_to_process, request.task), content_type, request.lang,
+        request.task, request.persona, request.tone, request.length
+    )
     
     messages = [
         {"role": "system", "content": system_message},
         {"role": "user", "content": user_content}
     ]
     
-    logger.info(f"Generating {request.task} content: persona={request.persona}, tone={request.tone}, length={request.length}, lang={request.lang}")
-    
     try:
         result = await call_hf_router(
             messages=messages,
@@ -740,14 +358,18 @@ Please process the above content according to the specified criteria and create
         
         # Add quality indicators
         word_count = len(result.split())
-        logger.info(f"Generated {word_count} words for {request.task}")
+        logger.info(
+            "generated", stage="generate", task=request.task, persona=request.persona,
+            tone=request.tone, length=request.length, lang=request.lang,
+            words=word_count, sampled=True
+        )
         
         return GenerateResponse(result=result)
     
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Content generation error: {str(e)}", exc_info=True)
+    except Exception:
+        logger.exception("generation_error", stage="generate", task=request.task)
         raise HTTPException(
             status_code=502,
             detail="LLM provider error: Content generation failed"
@@ -777,10 +399,8 @@ async def generate_all_content(request: GenerateAllRequest):
     content_to_process = request.input.strip()
     
     if is_url(content_to_process):
-        logger.info(f"Processing URL for generate-all: {content_to_process}")
         try:
-            content_to_process = extract_content_from_url(content_to_process)
-            logger.info(f"Extracted {len(content_to_process)} characters from URL")
+            content_to_process = await extract_content_from_url(content_to_process)
         except HTTPException:
             raise
         except Exception as e:
@@ -789,6 +409,11 @@ async def generate_all_content(request: GenerateAllRequest):
                 detail=f"Failed to process URL: {str(e)}"
             )
     
+    # Every task is prompted from one shared digest of the content
+    digest = get_digest(content_to_process).render(request.lang)
+    logger.info("digest", stage="condense", source_chars=len(content_to_process), digest_chars=len(digest), sampled=True)
+    content_to_process = digest
+    
     # Generate all content types
     results = {}
     tasks = [
@@ -802,29 +427,10 @@ async def generate_all_content(request: GenerateAllRequest):
         try:
             system_message = create_system_message(task, request.lang, "casual", length, request.persona)
             
-            content_length = len(content_to_process)
             content_type = "URL içeriği" if is_url(request.input.strip()) else "Metin"
-            
-            if request.lang == "tr":
-                user_content = f"""İçerik Türü: {content_type}
-İçerik Uzunluğu: {content_length} karakter
-Görev: {task.title()} oluştur
-Persona: {request.persona.title()}
-
-İÇERİK:
-{content_to_process}
-
-Lütfen yukarıdaki içeriği belirtilen kriterlere göre işle ve kaliteli bir çıktı oluştur."""
-            else:
-                user_content = f"""Content Type: {content_type}
-Content Length: {content_length} characters  
-Task: Create {task}
-Persona: {request.persona.title()}
-
-CONTENT:
-{content_to_process}
-
-Please process the above content according to the specified criteria and create a high-quality output."""
+            user_content = prompts.user_message(
+                content_to_process, content_type, request.lang, task, request.persona
+            )
             
             messages = [
                 {"role": "system", "content": system_message},
@@ -848,20 +454,17 @@ Please process the above content according to the specified criteria and create
             )
             
             results[task] = result.strip()
-            logger.info(f"Generated {task} content: {len(result.split())} words")
+            logger.info("generated", stage="generate", task=task, words=len(result.split()), sampled=True)
             
         except Exception as e:
-            logger.error(f"Error generating {task}: {str(e)}")
-            results[task] = f"Error generating {task}: {str(e)}"
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error("generation_error", stage="generate", task=task, error=error)
+            results[task] = f"Error generating {task}: {error}"
     
     # Generate SEO package
     try:
         seo_system = create_system_message("seo", request.lang, "formal", "medium", request.persona)
-        seo_user = f"""İçerik: {content_to_process[:1000]}...
-
-Yukarıdaki içerik için kapsamlı SEO paketi oluştur.""" if request.lang == "tr" else f"""Content: {content_to_process[:1000]}...
-
-Create a comprehensive SEO package for the above content."""
+        seo_user = prompts.seo_user_message(content_to_process, request.lang)
         
         seo_messages = [
             {"role": "system", "content": seo_system},
@@ -886,17 +489,16 @@ Create a comprehensive SEO package for the above content."""
         }
         
     except Exception as e:
-        logger.error(f"Error generating SEO: {str(e)}")
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error("generation_error", stage="generate", task="seo", error=error)
         seo_data = {
             "title_suggestions": ["Başlık bulunamadı"],
             "meta_description": "Meta açıklama oluşturulamadı",
             "keywords": ["anahtar kelime bulunamadı"],
             "hashtags": ["#error"],
-            "full_result": f"SEO oluşturulamadı: {str(e)}"
+            "full_result": f"SEO oluşturulamadı: {error}"
         }
     
-    logger.info("Generate-all completed successfully")
-    
     return GenerateAllResponse(
         summary=results.get("summary", "Özet oluşturulamadı"),
         youtube=results.get("youtube", "YouTube senaryosu oluşturulamadı"), 
@@ -0,0 +1,460 @@
+"""
+Inference backends
+One async interface over the HF Inference API, the HF Router and local CPU models
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import httpx
+from app.config import get_settings
+from app.deadline import check_deadline
+from app.hf import HuggingFaceClient, HuggingFaceError, get_hf_client
+from app.logs import get_logger
+from app.providers import ProviderRouter, RejectedRequestError
+from app.tracing import span
+
+try:
+    import ctranslate2
+except ImportError:
+    ctranslate2 = None
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+
+logger = get_logger(__name__)
+
+
+class InferenceBackend(ABC):
+    """
+    Async text inference backend
+
+    `summarize` condenses text, `generate` completes a prompt (with an
+    optional system instruction), and `stream` yields the completion of a
+    prompt in pieces as they are produced.
+    """
+
+    name = "base"
+
+    def model_name(self, model: Optional[str] = None) -> str:
+        """Model that actually serves a call for the requested model"""
+        return model or ""
+
+    @abstractmethod
+    async def summarize(
+        self,
+        text: str,
+        max_length: Optional[int] = None,
+        min_length: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """Summary of text"""
+
+    @abstractmethod
+    async def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        system: Optional[str] = None
+    ) -> str:
+        """Completion of a prompt"""
+
+    async def stream(
+        self,
+        prompt: str,
+        max_new_tokens: int = 512,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        # Backends without incremental output produce a single piece
+        yield await self.generate(prompt, max_new_tokens, temperature, model, system)
+
+
+async def _sse_events(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """JSON payloads of a server-sent event stream"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
+
+
+class HFInferenceBackend(InferenceBackend):
+    """Hugging Face Inference API (task endpoints per model)"""
+
+    name = "hf_inference"
+
+    def __init__(self, client: Optional[HuggingFaceClient] = None):
+        self.client = client or get_hf_client()
+
+    def model_name(self, model: Optional[str] = None) -> str:
+        return model or self.client.settings.gen_model
+
+    async def summarize(self, text, max_length=None, min_length=None, model=None) -> str:
+        return await self.client.summarize(text, max_length=max_length, min_length=min_length, model=model)
+
+    async def generate(self, prompt, max_new_tokens=512, temperature=0.7, model=None, system=None) -> str:
+        if system:
+            prompt = f"{system}\n\n{prompt}"
+        return await self.client.generate_text(
+            prompt, max_new_tokens=max_new_tokens, temperature=temperature, model=model
+        )
+
+    async def stream(self, prompt, max_new_tokens=512, temperature=0.7, model=None, system=None):
+        if system:
+            prompt = f"{system}\n\n{prompt}"
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": max_new_tokens,
+                "temperature": temperature,
+                "do_sample": True,
+                "return_full_text": False,
+            },
+            "stream": True,
+        }
+        url = f"{self.client.base_url}/{model or self.client.settings.gen_model}"
+
+        async with httpx.AsyncClient(timeout=self.client.timeout) as client:
+            async with client.stream("POST", url, headers=self.client.headers, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise HuggingFaceError(f"Streaming failed: HTTP {response.status_code}")
+                async for event in _sse_events(response):
+                    token = event.get("token", {})
+                    if token.get("text") and not token.get("special"):
+                        yield token["text"]
+
+
+class RouterRejectedError(HuggingFaceError, RejectedRequestError):
+    """The HF Router rejected a request (e.g. a prompt over the context length)"""
+
+
+class HFRouterBackend(InferenceBackend):
+    """
+    Hugging Face Router (OpenAI-compatible chat completions)
+
+    Calls go to the fastest healthy of several equivalent model:provider
+    targets (see `ProviderRouter`). A call for a specific model uses that
+    model as its only target.
+    """
+
+    name = "hf_router"
+
+    def __init__(
+        self,
+        targets: List[str],
+        api_token: str,
+        base_url: str = "https://router.huggingface.co/v1",
+        timeout: float = 60.0,
+        hedge: bool = True,
+        hedge_delay: float = 3.0
+    ):
+        self.targets = targets
+        self.api_token = api_token
+        self.base_url = base_url
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.router = ProviderRouter(targets, hedge=hedge, hedge_delay=hedge_delay)
+        self._routers: Dict[str, ProviderRouter] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP client (keeps connections to the router alive)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _router_for(self, model: Optional[str]) -> ProviderRouter:
+        if model is None or model in self.targets:
+            return self.router
+        router = self._routers.get(model)
+        if router is None:
+            router = ProviderRouter([model], hedge=False)
+            self._routers[model] = router
+        return router
+
+    def model_name(self, model: Optional[str] = None) -> str:
+        return model or self.router.ranked(explore=False)[0]
+
+    @staticmethod
+    def _messages(prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    async def complete(self, target: str, payload: Dict[str, Any]) -> str:
+        """Request a chat completion from one router target"""
+        start = time.perf_counter()
+        with span("hf"):
+            response = await self.get_client().post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json={**payload, "model": target}
+            )
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        if response.status_code != 200:
+            error_msg = f"HF Router error: {response.status_code}"
+            try:
+                error_detail = response.json().get("error", {}).get("message", "Unknown error")
+                error_msg += f" - {error_detail}"
+            except Exception:
+                error_msg += f" - {response.text[:200]}"
+
+            logger.error(
+                "hf_router_call", stage="hf", model=target,
+                status=response.status_code, duration_ms=duration_ms, error=error_msg
+            )
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                raise RouterRejectedError(error_msg)
+            raise HuggingFaceError(error_msg)
+
+        result = response.json()
+
+        # Parse response - try different fields
+        if "choices" in result and len(result["choices"]) > 0:
+            choice = result["choices"][0]
+            if "message" in choice and "content" in choice["message"]:
+                generated_text = choice["message"]["content"]
+            elif "text" in choice:
+                generated_text = choice["text"]
+            else:
+                logger.error("hf_router_bad_response", stage="hf", model=target, response=str(result)[:500])
+                raise HuggingFaceError("Invalid response format")
+        else:
+            logger.error("hf_router_no_choices", stage="hf", model=target, response=str(result)[:500])
+            raise HuggingFaceError("No content generated")
+
+        if not generated_text or not generated_text.strip():
+            raise HuggingFaceError("Empty response")
+
+        logger.info(
+            "hf_router_call", stage="hf", model=target,
+            status=200, duration_ms=duration_ms, sampled=True
+        )
+        return generated_text.strip()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 512,
+        temperature: float = 0.3,
+        model: Optional[str] = None
+    ) -> str:
+        """
+        Chat completion on the best target
+
+        Target timeouts are not shortened to the request deadline, which
+        would count as target failures; calls still running at the
+        deadline are cancelled with the request instead.
+
+        Raises:
+            AllTargetsFailedError: If every target failed
+            DeadlineExceeded: If the request's deadline has passed
+        """
+        check_deadline("hf")
+        payload = {"messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        return await self._router_for(model).call(lambda target: self.complete(target, payload))
+
+    async def summarize(self, text, max_length=None, min_length=None, model=None) -> str:
+        system = "Summarize the user's text concisely and factually. Reply with the summary only."
+        return await self.chat(
+            self._messages(text, system), max_tokens=max_length or 200, temperature=0.2, model=model
+        )
+
+    async def generate(self, prompt, max_new_tokens=512, temperature=0.7, model=None, system=None) -> str:
+        return await self.chat(
+            self._messages(prompt, system), max_tokens=max_new_tokens, temperature=temperature, model=model
+        )
+
+    async def stream(self, prompt, max_new_tokens=512, temperature=0.7, model=None, system=None):
+        # Streams are not hedged: the best target serves the whole stream
+        target = self._router_for(model).ranked()[0]
+        payload = {
+            "model": target,
+            "messages": self._messages(prompt, system),
+            "max_tokens": max_new_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+        async with self.get_client().stream(
+            "POST", f"{self.base_url}/chat/completions", headers=self.headers, json=payload
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise HuggingFaceError(f"HF Router error: {response.status_code}")
+            async for event in _sse_events(response):
+                for choice in event.get("choices", []):
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+
+class LocalSummarizerBackend(InferenceBackend):
+    """
+    Quantized seq2seq summarizer running on the local CPU
+
+    Loads a CTranslate2 model directory (e.g. distilbart-cnn-12-6 converted
+    with `ct2-transformers-converter --quantization int8`) together with
+    the `tokenizer.json` stored next to it. Calls run one at a time on a
+    dedicated thread; CTranslate2 parallelizes each call internally.
+
+    The loaded model serves every call: a model requested by the routing
+    policy is logged (once per model) and not used.
+    """
+
+    name = "local"
+
+    # Encoder input limit of BART-style models
+    MAX_INPUT_TOKENS = 1024
+
+    def __init__(self, model_dir: str, compute_type: str = "int8", threads: int = 0, beam_size: int = 2):
+        self.model_dir = model_dir
+        self.compute_type = compute_type
+        self.threads = threads
+        self.beam_size = beam_size
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-summarizer")
+        self._ignored_models: Set[str] = set()
+
+    @classmethod
+    def is_available(cls, model_dir: str) -> bool:
+        """Whether the runtime is installed and the model files exist"""
+        return (
+            ctranslate2 is not None
+            and Tokenizer is not None
+            and os.path.isfile(os.path.join(model_dir, "model.bin"))
+            and os.path.isfile(os.path.join(model_dir, "tokenizer.json"))
+        )
+
+    def model_name(self, model: Optional[str] = None) -> str:
+        return f"local/{os.path.basename(os.path.normpath(self.model_dir))}"
+
+    def _load(self) -> Tuple[Any, Any]:
+        with self._lock:
+            if self._model is None:
+                self._tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+                self._model = ctranslate2.Translator(
+                    self.model_dir, device="cpu", compute_type=self.compute_type, intra_threads=self.threads
+                )
+                logger.info("local_model_loaded", model_dir=self.model_dir, compute_type=self.compute_type)
+        return self._model, self._tokenizer
+
+    def _summarize(self, text: str, max_length: Optional[int], min_length: Optional[int]) -> str:
+        model, tokenizer = self._load()
+        tokens = tokenizer.encode(text).tokens
+        if len(tokens) > self.MAX_INPUT_TOKENS:
+            # Keep the end-of-sequence marker the encoder expects
+            tokens = tokens[:self.MAX_INPUT_TOKENS - 1] + tokens[-1:]
+
+        results = model.translate_batch(
+            [tokens],
+            beam_size=self.beam_size,
+            max_decoding_length=max_length or 142,
+            min_decoding_length=min_length or 0,
+            no_repeat_ngram_size=3,
+        )
+        output = results[0].hypotheses[0]
+        ids = [tokenizer.token_to_id(token) for token in output]
+        return tokenizer.decode([i for i in ids if i is not None]).strip()
+
+    async def summarize(self, text, max_length=None, min_length=None, model=None) -> str:
+        if model and model not in self._ignored_models:
+            self._ignored_models.add(model)
+            logger.warning("local_model_override_ignored", requested=model, serving=self.model_name())
+        loop = asyncio.get_event_loop()
+        try:
+            with span("local-summarize"):
+                return await loop.run_in_executor(
+                    self._executor, self._summarize, text, max_length, min_length
+                )
+        except Exception as e:
+            raise HuggingFaceError(f"Local summarization failed: {str(e)}")
+
+    async def generate(self, prompt, max_new_tokens=512, temperature=0.7, model=None, system=None) -> str:
+        raise HuggingFaceError("The local backend only supports summarization")
+
+
+# Backend instances by name
+_backends: Dict[str, InferenceBackend] = {}
+
+
+def get_backend(name: str) -> InferenceBackend:
+    """
+    Get an inference backend by name ("hf_inference", "hf_router", "local")
+
+    The local backend falls back to the HF Inference API when its runtime
+    or model files are missing.
+    """
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+
+    settings = get_settings()
+    if name == "hf_inference":
+        backend = HFInferenceBackend()
+    elif name == "hf_router":
+        backend = HFRouterBackend(
+            settings.hf_router_targets,
+            settings.hf_api_token,
+            base_url=settings.hf_router_base,
+            hedge=settings.hf_router_hedge,
+            hedge_delay=settings.hf_router_hedge_delay,
+        )
+    elif name == "local":
+        if LocalSummarizerBackend.is_available(settings.local_model_dir):
+            backend = LocalSummarizerBackend(
+                settings.local_model_dir,
+                compute_type=settings.local_compute_type,
+                threads=settings.local_threads,
+            )
+        else:
+            logger.warning("local_backend_unavailable", model_dir=settings.local_model_dir)
+            backend = get_backend("hf_inference")
+    else:
+        raise ValueError(f"Unknown inference backend: {name}")
+
+    _backends[name] = backend
+    return backend
+
+
+def get_summarize_backend() -> InferenceBackend:
+    """Backend for the chunk map stage"""
+    return get_backend(get_settings().summarize_backend)
+
+
+def get_generate_backend() -> InferenceBackend:
+    """Backend for final generation calls"""
+    return get_backend(get_settings().generate_backend)
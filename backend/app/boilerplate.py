@@ -0,0 +1,253 @@
+"""
+Boilerplate filtering for extracted text
+Drops repeated paragraphs within a page and paragraphs common to a site's pages
+"""
+
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from app.config import get_settings
+
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Paragraphs are compared by the k smallest hashes of their shingles
+# (a bottom-k sketch); the share of common sketch hashes estimates their
+# Jaccard similarity
+SKETCH_SIZE = 8
+
+# Paragraphs checked one at a time before site filtering may be switched
+# off for removing too much of a page (navigation usually comes first)
+GUARD_MIN_PARAGRAPHS = 10
+
+WORD_RE = re.compile(r"\w+")
+LINE_SPLIT_RE = re.compile(r"\n+")
+
+
+def paragraph_sketch(paragraph: str, size: int = SKETCH_SIZE) -> Tuple[int, ...]:
+    """Bottom-k sketch of a paragraph's hashed word shingles"""
+    words = WORD_RE.findall(paragraph.lower())
+    if not words:
+        return ()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = sorted({zlib.crc32(shingle.encode("utf-8")) for shingle in shingles})
+    return tuple(hashes[:size])
+
+
+def _overlap(first: Tuple[int, ...], second: Set[int]) -> float:
+    if not first:
+        return 0.0
+    return sum(1 for h in first if h in second) / len(first)
+
+
+class DomainHistory:
+    """Sketch hashes of the last pages seen from one domain"""
+
+    def __init__(self, max_pages: int):
+        self.pages: "OrderedDict[str, Set[int]]" = OrderedDict()
+        self.max_pages = max_pages
+        self.counts: Counter = Counter()  # Sketch hash -> pages containing it
+
+    def add(self, url: str, hashes: Set[int]) -> None:
+        # A page fetched again replaces its earlier version instead of
+        # counting twice, which would make its own text look like boilerplate
+        self.remove(url)
+        while len(self.pages) >= self.max_pages:
+            self.remove(next(iter(self.pages)))
+        self.pages[url] = hashes
+        self.counts.update(hashes)
+
+    def remove(self, url: str) -> None:
+        hashes = self.pages.pop(url, None)
+        if hashes is None:
+            return
+        self.counts.subtract(hashes)
+        for h in hashes:
+            if self.counts[h] <= 0:
+                del self.counts[h]
+
+    def page_share(self, sketch: Tuple[int, ...], exclude: Optional[str] = None) -> float:
+        """Mean share of other recent pages containing the sketch's hashes"""
+        own = self.pages.get(exclude, set()) if exclude else set()
+        others = len(self.pages) - (1 if exclude in self.pages else 0)
+        if not sketch or others <= 0:
+            return 0.0
+        total = sum(self.counts.get(h, 0) - (1 if h in own else 0) for h in sketch)
+        return total / (len(sketch) * others)
+
+
+class BoilerplateFilter:
+    """
+    Removes boilerplate paragraphs from extracted page text
+
+    Within a page, a paragraph whose sketch mostly matches an earlier one
+    is dropped as a repeat. Across pages, each domain keeps the sketches
+    of its recently seen pages; once enough pages are known, paragraphs
+    whose shingles appear on most of them (navigation, newsletter blocks,
+    related-article lists, footers) are dropped. If that would remove most
+    of a page, only the within-page repeats are dropped.
+    """
+
+    def __init__(
+        self,
+        history_pages: int = 20,
+        min_pages: int = 5,
+        min_share: float = 0.6,
+        duplicate_similarity: float = 0.75,
+        max_removed_share: float = 0.6,
+        max_domains: int = 500
+    ):
+        self.history_pages = history_pages
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.duplicate_similarity = duplicate_similarity
+        self.max_removed_share = max_removed_share
+        self.max_domains = max_domains
+        self._domains: "OrderedDict[str, DomainHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        netloc = urlparse(url).netloc.lower()
+        return netloc[4:] if netloc.startswith("www.") else netloc
+
+    def _history(self, domain: str) -> DomainHistory:
+        history = self._domains.get(domain)
+        if history is None:
+            history = DomainHistory(self.history_pages)
+            self._domains[domain] = history
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            self._domains.move_to_end(domain)
+        return history
+
+    def filter(self, paragraphs: List[str], url: Optional[str] = None) -> List[str]:
+        """
+        Filter a page's paragraphs
+
+        Args:
+            paragraphs: Paragraphs in page order
+            url: Page URL; enables the per-domain frequency check
+
+        Returns:
+            Paragraphs that are neither repeats nor site boilerplate
+        """
+        page = PageFilter(self, url)
+        unique = [i for i, p in enumerate(paragraphs) if not page.is_repeat(p)]
+
+        kept = unique
+        if page.site_filtering:
+            content = [i for i in unique if not page.is_site_boilerplate(paragraphs[i])]
+            if len(content) >= (1 - self.max_removed_share) * len(unique):
+                kept = content
+        page.close()
+
+        return [paragraphs[i] for i in kept]
+
+    def page(self, url: Optional[str] = None) -> "PageFilter":
+        """Filter for a page whose paragraphs arrive one at a time"""
+        return PageFilter(self, url)
+
+    def filter_text(self, text: str, url: Optional[str] = None) -> str:
+        """Filter text whose paragraphs are separated by line breaks"""
+        paragraphs = [p.strip() for p in LINE_SPLIT_RE.split(text) if p.strip()]
+        return "\n\n".join(self.filter(paragraphs, url))
+
+
+class PageFilter:
+    """
+    Boilerplate checks for the paragraphs of a single page
+
+    The domain's history is consulted as it was when the page started and
+    updated once the page is closed. When paragraphs are checked one at a
+    time with `keep`, site filtering is switched off for the rest of the
+    page as soon as it has removed too large a share of the paragraphs so far.
+    """
+
+    def __init__(self, owner: BoilerplateFilter, url: Optional[str] = None):
+        self.owner = owner
+        self.url = url
+        self.sketches: List[Tuple[int, ...]] = []
+        self._seen_by_hash: Dict[int, List[int]] = {}
+        self._last: Tuple[Optional[str], Tuple[int, ...]] = (None, ())
+        self.removed = 0
+        self.history: Optional[DomainHistory] = None
+        self.site_filtering = False
+        if url:
+            with owner._lock:
+                self.history = owner._history(owner.domain_of(url))
+                known_pages = len(self.history.pages) - (1 if url in self.history.pages else 0)
+            self.site_filtering = known_pages >= owner.min_pages
+
+    def _sketch(self, paragraph: str) -> Tuple[int, ...]:
+        # is_repeat and is_site_boilerplate are called on the same paragraph
+        if self._last[0] is not paragraph:
+            self._last = (paragraph, paragraph_sketch(paragraph))
+        return self._last[1]
+
+    def is_repeat(self, paragraph: str) -> bool:
+        """Whether the paragraph (nearly) repeats an earlier one of the page"""
+        sketch = self._sketch(paragraph)
+        if not sketch:
+            return True
+        candidates = {i for h in sketch for i in self._seen_by_hash.get(h, ())}
+        if any(_overlap(sketch, set(self.sketches[i])) >= self.owner.duplicate_similarity for i in candidates):
+            return True
+        for h in sketch:
+            self._seen_by_hash.setdefault(h, []).append(len(self.sketches))
+        self.sketches.append(sketch)
+        return False
+
+    def is_site_boilerplate(self, paragraph: str) -> bool:
+        """Whether the paragraph appears on most recent pages of the domain"""
+        if not self.site_filtering or self.history is None:
+            return False
+        sketch = self._sketch(paragraph)
+        with self.owner._lock:
+            share = self.history.page_share(sketch, exclude=self.url)
+        return share >= self.owner.min_share
+
+    def keep(self, paragraph: str) -> bool:
+        """Check the next paragraph of the page"""
+        if self.is_repeat(paragraph):
+            return False
+        if self.is_site_boilerplate(paragraph):
+            self.removed += 1
+            unique = len(self.sketches)
+            if unique >= GUARD_MIN_PARAGRAPHS and self.removed > self.owner.max_removed_share * unique:
+                self.site_filtering = False
+            return False
+        return True
+
+    def close(self) -> None:
+        """Record the page in its domain's history"""
+        if self.history is None:
+            return
+        with self.owner._lock:
+            self.history.add(self.url, {h for sketch in self.sketches for h in sketch})
+        self.history = None
+
+
+# Global filter instance
+_filter: Optional[BoilerplateFilter] = None
+
+
+def get_boilerplate_filter() -> BoilerplateFilter:
+    """Get the global boilerplate filter"""
+    global _filter
+    if _filter is None:
+        settings = get_settings()
+        _filter = BoilerplateFilter(
+            history_pages=settings.boilerplate_history_pages,
+            min_pages=settings.boilerplate_min_pages,
+            min_share=settings.boilerplate_min_share,
+        )
+    return _filter
@@ -0,0 +1,462 @@
+"""
+Byte-bounded response cache
+Stores values serialized and, above a size threshold, compressed with a
+dictionary trained on cached content
+"""
+
+import gzip
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Bookkeeping memory charged per entry on top of its key and payload
+ENTRY_OVERHEAD_BYTES = 200
+
+# zlib can only reference the last 32KB of a preset dictionary
+ZLIB_DICT_BYTES = 32 * 1024
+ZSTD_DICT_BYTES = 64 * 1024
+
+# Only the start of each payload is kept as a training sample
+SAMPLE_BYTES = 4096
+
+# How often expired entries are swept out
+SWEEP_INTERVAL_SECONDS = 60.0
+
+RAW = 0  # Dictionary id of uncompressed payloads
+PLAIN = 1  # Dictionary id of payloads compressed without a dictionary
+
+
+class Compressor:
+    """
+    zstd (if installed) or zlib compression with trained dictionaries
+
+    Payloads remember the id of the dictionary they were compressed with,
+    so dictionaries trained later do not invalidate earlier entries.
+    """
+
+    def __init__(self, level: int = 3):
+        self.level = level
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self._dicts: Dict[int, Any] = {}
+        self.current = PLAIN
+
+    def train(self, samples: List[bytes]) -> bool:
+        """Train a dictionary on sample payloads and use it from now on"""
+        if not samples:
+            return False
+        dict_id = max(self._dicts, default=PLAIN) + 1
+        if zstandard is not None:
+            try:
+                self._dicts[dict_id] = zstandard.train_dictionary(ZSTD_DICT_BYTES, samples)
+            except zstandard.ZstdError:
+                # Too few or too similar samples
+                return False
+        else:
+            # A zlib preset dictionary is plain content; matches against
+            # its end are cheapest, so the newest samples go last
+            self._dicts[dict_id] = b"".join(samples)[-ZLIB_DICT_BYTES:]
+        self.current = dict_id
+        return True
+
+    def compress(self, data: bytes) -> Tuple[int, bytes]:
+        dict_id = self.current
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._dicts.get(dict_id))
+            return dict_id, compressor.compress(data)
+        if dict_id == PLAIN:
+            return dict_id, zlib.compress(data, self.level)
+        compressor = zlib.compressobj(self.level, zdict=self._dicts[dict_id])
+        return dict_id, compressor.compress(data) + compressor.flush()
+
+    def decompress(self, dict_id: int, data: bytes) -> bytes:
+        if zstandard is not None:
+            return zstandard.ZstdDecompressor(dict_data=self._dicts.get(dict_id)).decompress(data)
+        if dict_id == PLAIN:
+            return zlib.decompress(data)
+        decompressor = zlib.decompressobj(zdict=self._dicts[dict_id])
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class CountMinSketch:
+    """
+    Approximate access counts in a few bytes per key
+
+    Counters saturate at 15 and are all halved after `sample_size`
+    increments, so counts reflect recent popularity (TinyLFU aging).
+    """
+
+    MAX_COUNT = 15
+    SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    HALVE = bytes(value >> 1 for value in range(256))
+
+    def __init__(self, width: int, sample_factor: int = 10):
+        bits = max(4, (width - 1).bit_length())
+        self.width = 1 << bits
+        self._shift = 64 - bits
+        self.rows = [bytearray(self.width) for _ in self.SEEDS]
+        self.sample_size = self.width * sample_factor
+        self.additions = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        return [((h * seed) & 0xFFFFFFFFFFFFFFFF) >> self._shift for seed in self.SEEDS]
+
+    def estimate(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def add(self, key: str) -> None:
+        indexes = self._indexes(key)
+        counts = [row[i] for row, i in zip(self.rows, indexes)]
+        current = min(counts)
+        if current < self.MAX_COUNT:
+            # Conservative update: only the smallest counters grow
+            for row, i, count in zip(self.rows, indexes, counts):
+                if count == current:
+                    row[i] = count + 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [row.translate(self.HALVE) for row in self.rows]
+            self.additions //= 2
+
+
+class WindowTinyLFU:
+    """
+    W-TinyLFU admission and eviction over entry sizes in bytes
+
+    New keys enter a small LRU window. Keys leaving the window compete
+    for the main area (segmented LRU: probation, then protected after a
+    second hit). A candidate is only admitted if it has been requested
+    more often, by the frequency sketch, than every entry it would evict.
+    One-off keys from scans and bulk jobs pass through the window without
+    displacing the popular entries in the main area. With a window share
+    of 1 this is a plain LRU.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        window_share: float = 0.01,
+        protected_share: float = 0.8,
+        expected_entry_bytes: int = 2048
+    ):
+        self.max_bytes = max_bytes
+        self.window_max = max_bytes * window_share
+        self.main_max = max_bytes - self.window_max
+        self.protected_max = self.main_max * protected_share
+        self.sketch = CountMinSketch(max(max_bytes // expected_entry_bytes, 16))
+        self.window: "OrderedDict[str, int]" = OrderedDict()
+        self.probation: "OrderedDict[str, int]" = OrderedDict()
+        self.protected: "OrderedDict[str, int]" = OrderedDict()
+        self.window_bytes = 0
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        self.rejected = 0
+
+    @property
+    def bytes(self) -> int:
+        return self.window_bytes + self.probation_bytes + self.protected_bytes
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.window or key in self.probation or key in self.protected
+
+    def access(self, key: str) -> None:
+        """Record a hit on a resident key"""
+        self.sketch.add(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+        elif key in self.protected:
+            self.protected.move_to_end(key)
+        elif key in self.probation:
+            size = self.probation.pop(key)
+            self.probation_bytes -= size
+            self.protected[key] = size
+            self.protected_bytes += size
+            while self.protected_bytes > self.protected_max:
+                demoted, demoted_size = self.protected.popitem(last=False)
+                self.protected_bytes -= demoted_size
+                self.probation[demoted] = demoted_size
+                self.probation_bytes += demoted_size
+
+    def admit(self, key: str, size: int) -> List[str]:
+        """
+        Record a miss and insert the key
+
+        Returns:
+            Keys no longer resident, possibly including the new key itself
+        """
+        self.sketch.add(key)
+        self.remove(key)
+        self.window[key] = size
+        self.window_bytes += size
+
+        removed: List[str] = []
+        while self.window_bytes > self.window_max and self.window:
+            candidate, candidate_size = self.window.popitem(last=False)
+            self.window_bytes -= candidate_size
+            removed.extend(self._admit_main(candidate, candidate_size))
+        return removed
+
+    def _admit_main(self, candidate: str, size: int) -> List[str]:
+        # Entries that would have to make room, least recently used first
+        victims: List[Tuple[str, int]] = []
+        free = self.main_max - self.probation_bytes - self.protected_bytes
+        if size > self.main_max:
+            self.rejected += 1
+            return [candidate]
+        if free < size:
+            frequency = self.sketch.estimate(candidate)
+            for victim, victim_size in self._main_lru():
+                if self.sketch.estimate(victim) >= frequency:
+                    self.rejected += 1
+                    return [candidate]
+                victims.append((victim, victim_size))
+                free += victim_size
+                if free >= size:
+                    break
+
+        for victim, _ in victims:
+            self.remove(victim)
+        self.probation[candidate] = size
+        self.probation_bytes += size
+        return [victim for victim, _ in victims]
+
+    def _main_lru(self) -> Iterator[Tuple[str, int]]:
+        yield from self.probation.items()
+        yield from self.protected.items()
+
+    def remove(self, key: str) -> None:
+        for segment, attribute in (
+            (self.window, "window_bytes"),
+            (self.probation, "probation_bytes"),
+            (self.protected, "protected_bytes"),
+        ):
+            size = segment.pop(key, None)
+            if size is not None:
+                setattr(self, attribute, getattr(self, attribute) - size)
+                return
+
+
+class _Entry:
+    __slots__ = ("payload", "dict_id", "size", "raw_size", "expires")
+
+    def __init__(self, payload: bytes, dict_id: int, size: int, raw_size: int, expires: float):
+        self.payload = payload
+        self.dict_id = dict_id
+        self.size = size
+        self.raw_size = raw_size
+        self.expires = expires
+
+
+class CompressedCache(MutableMapping):
+    """
+    Cache with a time-to-live, bounded by the bytes it holds
+
+    Which entries stay is decided by a W-TinyLFU policy (a plain LRU with
+    policy="lru"). Values are pickled on insert, so a fixed memory budget holds entries
+    of any size and callers cannot mutate what is cached. Payloads of at
+    least `compress_min_bytes` are compressed. After `training_samples`
+    of them have been seen, a compression dictionary is trained on those
+    samples, which helps most for the many small, similar generation results.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        compress_min_bytes: int = 512,
+        training_samples: int = 200,
+        level: int = 3,
+        policy: str = "tinylfu",
+        window_share: float = 0.01
+    ):
+        if policy not in ("tinylfu", "lru"):
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.max_bytes = max_bytes
+        self.policy_name = policy
+        self.policy = WindowTinyLFU(max_bytes, window_share if policy == "tinylfu" else 1.0)
+        self.ttl = ttl
+        self.compress_min_bytes = compress_min_bytes
+        self.training_samples = training_samples
+        self.compressor = Compressor(level)
+        self._entries: Dict[str, _Entry] = {}
+        self._samples: Optional[List[bytes]] = [] if training_samples > 0 else None
+        self.bytes = 0
+        self.raw_bytes = 0
+        self.hits = 0
+        self.evictions = 0
+        self._last_sweep = time.monotonic()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.policy.remove(key)
+        self.bytes -= entry.size
+        self.raw_bytes -= entry.raw_size
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires <= time.monotonic():
+            self._drop(key)
+            return None
+        return entry
+
+    def __contains__(self, key: object) -> bool:
+        return self._live_entry(key) is not None
+
+    def __getitem__(self, key: str) -> Any:
+        entry = self._live_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        self.hits += 1
+        self.policy.access(key)
+        return pickle.loads(self._raw(entry))
+
+    def _raw(self, entry: _Entry) -> bytes:
+        if entry.dict_id == RAW:
+            return entry.payload
+        return self.compressor.decompress(entry.dict_id, entry.payload)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._store(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), self.ttl)
+
+    def _store(self, key: str, raw: bytes, ttl: float) -> None:
+        payload, dict_id = raw, RAW
+        if len(raw) >= self.compress_min_bytes:
+            self._collect_sample(raw)
+            dict_id, compressed = self.compressor.compress(raw)
+            if len(compressed) < len(raw):
+                payload = compressed
+            else:
+                dict_id = RAW
+
+        size = len(payload) + len(key) + ENTRY_OVERHEAD_BYTES
+        if key in self._entries:
+            self._drop(key)
+
+        now = time.monotonic()
+        self._entries[key] = _Entry(payload, dict_id, size, len(raw), now + ttl)
+        self.bytes += size
+        self.raw_bytes += len(raw)
+
+        # The policy may turn away the new entry itself
+        for removed in self.policy.admit(key, size):
+            self._drop(removed)
+            if removed != key:
+                self.evictions += 1
+
+        if now - self._last_sweep > SWEEP_INTERVAL_SECONDS:
+            self.expire()
+
+    def size_of(self, key: str) -> Optional[int]:
+        """Bytes charged for a resident key"""
+        entry = self._entries.get(key)
+        return entry.size if entry is not None else None
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._entries:
+            raise KeyError(key)
+        self._drop(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _collect_sample(self, raw: bytes) -> None:
+        if self._samples is None:
+            return
+        self._samples.append(raw[:SAMPLE_BYTES])
+        if len(self._samples) >= self.training_samples:
+            self.compressor.train(self._samples)
+            self._samples = None
+
+    def expire(self) -> None:
+        """Remove all expired entries"""
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry.expires <= now]:
+            self._drop(key)
+        self._last_sweep = now
+
+    def save(self, path: str) -> int:
+        """
+        Write the live entries to a snapshot file
+
+        Unexpired entries already in the file are kept unless this cache
+        holds a newer value, so the server and bulk runs can share one
+        snapshot. A writer that saves in between another's read and rename
+        loses its new entries to the other.
+
+        Returns:
+            Number of entries in the snapshot
+        """
+        now, wall = time.monotonic(), time.time()
+        snapshot = _read_snapshot(path)
+        for key, entry in self._entries.items():
+            if entry.expires > now:
+                snapshot[key] = (self._raw(entry), wall + entry.expires - now)
+
+        # Each writer renames its own temporary file into place, so a server
+        # and a bulk run saving at once cannot interleave their writes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=directory or ".")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return len(snapshot)
+
+    def load(self, path: str) -> int:
+        """
+        Add the unexpired entries of a snapshot file, keeping their expiry times
+
+        Returns:
+            Number of entries added
+        """
+        wall = time.time()
+        added = 0
+        for key, (raw, expires_at) in _read_snapshot(path).items():
+            if expires_at > wall and key not in self._entries:
+                self._store(key, raw, expires_at - wall)
+                added += key in self._entries
+        return added
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit statistics for /info"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "uncompressed_bytes": self.raw_bytes,
+            "compression_ratio": round(self.raw_bytes / self.bytes, 2) if self.bytes else None,
+            "codec": self.compressor.codec,
+            "dictionary": self.compressor.current > PLAIN,
+            "policy": self.policy_name,
+            "hits": self.hits,
+            "rejected": self.policy.rejected,
+            "evictions": self.evictions,
+        }
+
+
+def _read_snapshot(path: str) -> Dict[str, Tuple[bytes, float]]:
+    """{key: (pickled value, expiry wall time)} of a snapshot file; empty if missing or unreadable"""
+    try:
+        with gzip.open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
@@ -0,0 +1,253 @@
+"""
+Bulk processing command line
+Extracts and generates content for a JSONL file of inputs, resumably
+
+Usage:
+    python -m app.cli inputs.jsonl results.jsonl [--mode summary] [--concurrency 4]
+
+Each input line holds a `url` or a `text`, and optionally `id`, `mode`,
+`tone`, `length` and `lang` overriding the command line defaults. Each
+result line repeats the input's line number, id and parameters with
+either the generated `output` or an `error`.
+
+Results are appended and flushed one by one, so the output file is also
+the checkpoint: running the same command again skips every input line
+that already has a result. Extraction and generation go through the
+server's cache and cache keys; when CACHE_SNAPSHOT_FILE is set, the cache
+starts from that snapshot file and is saved back to it at the end, so
+results of a bulk run are cache hits for the server after its next
+start, and the other way round.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+from app.main import (
+    cache, cached_extract, generation_keys, get_cached_or_generate, run_generation, settings
+)
+from app.routing import get_routing_policy
+
+
+MODES = ("summary", "youtube", "shorts")
+TONES = ("neutral", "energetic", "academic")
+LENGTHS = ("short", "medium", "long")
+LANGS = ("auto", "en", "tr")
+
+# Cache snapshots are also saved during long runs, in case they are killed
+SNAPSHOT_INTERVAL_SECONDS = 300
+
+
+def read_inputs(path: str, skip: Set[int]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, input) of the non-empty input lines not in `skip`"""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if number in skip or not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                item = {"_error": f"Invalid JSON: {e}"}
+            yield number, item
+
+
+def load_checkpoint(path: str, retry_failed: bool) -> Set[int]:
+    """
+    Line numbers of inputs that already have a result
+
+    A partial last line left by a killed run is cut off so that new
+    results start on a fresh line.
+    """
+    done: Set[int] = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            result = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if retry_failed and "error" in result:
+            done.discard(result["line"])
+        else:
+            done.add(result["line"])
+    return done
+
+
+def input_lines(path: str) -> Set[int]:
+    """Line numbers of the non-empty input lines, as `read_inputs` numbers them"""
+    with open(path, encoding="utf-8") as f:
+        return {number for number, line in enumerate(f, 1) if line.strip()}
+
+
+class Progress:
+    """Throughput counters of a run"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.start = time.perf_counter()
+        self.done = 0
+        self.failed = 0
+        self.cached = 0
+        self.tokens = 0
+
+    def record(self, result: Dict[str, Any]) -> None:
+        self.done += 1
+        if "error" in result:
+            self.failed += 1
+        self.cached += bool(result.get("cached"))
+        self.tokens += result.get("tokens", 0)
+
+    def report(self, final: bool = False) -> str:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        remaining = self.total - self.skipped - self.done
+        eta = f", ETA {remaining / rate / 60:.1f} min" if rate and not final else ""
+        return (
+            f"{'Finished' if final else 'Progress'}: {self.skipped + self.done}/{self.total} "
+            f"({self.done} this run, {self.failed} failed, {self.cached} cached) "
+            f"in {elapsed:.0f}s: {rate:.2f} items/s, {self.tokens / max(elapsed, 1e-9):.0f} tokens/s{eta}"
+        )
+
+
+def resolve(item: Dict[str, Any], defaults: argparse.Namespace) -> Dict[str, Any]:
+    """Input parameters with command line defaults filled in"""
+    params = {
+        "mode": item.get("mode", defaults.mode),
+        "tone": item.get("tone", defaults.tone),
+        "length": item.get("length", defaults.length),
+        "lang": item.get("lang", defaults.lang),
+    }
+    for name, allowed in (("mode", MODES), ("tone", TONES), ("length", LENGTHS), ("lang", LANGS)):
+        if params[name] not in allowed:
+            raise ValueError(f"Invalid {name}: {params[name]!r}")
+    return params
+
+
+async def process(number: int, item: Dict[str, Any], defaults: argparse.Namespace) -> Dict[str, Any]:
+    """Extract (for URL inputs) and generate one input"""
+    result: Dict[str, Any] = {"line": number}
+    if "id" in item:
+        result["id"] = item["id"]
+    start = time.perf_counter()
+    try:
+        if "_error" in item:
+            raise ValueError(item["_error"])
+        url, text = item.get("url"), item.get("text")
+        if bool(url) == bool(text):
+            raise ValueError("Provide either text or url")
+        params = resolve(item, defaults)
+        if url:
+            result["url"] = url
+        result.update(params)
+
+        if url:
+            text = (await cached_extract(url.strip())).text[:settings.max_input_chars]
+        elif len(text) > settings.max_input_chars:
+            raise ValueError(f"Text too long. Maximum {settings.max_input_chars} characters allowed.")
+        text = text.strip()
+
+        route = get_routing_policy().route(params["mode"], params["length"], len(text))
+        _, cache_key = generation_keys(params["mode"], params["tone"], params["length"], params["lang"], route, text=text)
+        response = await get_cached_or_generate(
+            cache_key, run_generation, text,
+            params["mode"], params["tone"], params["length"], params["lang"], route
+        )
+        result.update(
+            output=response.output, tokens=response.tokens, model=response.model, cached=response.cached
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+async def run(args: argparse.Namespace) -> Progress:
+    lines = input_lines(args.input)
+    done = load_checkpoint(args.output, args.retry_failed)
+    progress = Progress(len(lines), len(done & lines))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        async def worker():
+            while True:
+                number, item = await queue.get()
+                try:
+                    result = await process(number, item, args)
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    progress.record(result)
+                finally:
+                    queue.task_done()
+
+        async def reporter():
+            saved = time.monotonic()
+            while True:
+                await asyncio.sleep(args.report_every)
+                print(progress.report(), file=sys.stderr)
+                if settings.cache_snapshot_file and time.monotonic() - saved >= SNAPSHOT_INTERVAL_SECONDS:
+                    cache.save(settings.cache_snapshot_file)
+                    saved = time.monotonic()
+
+        async def feed():
+            for number, item in read_inputs(args.input, done):
+                await queue.put((number, item))
+            await queue.join()
+
+        # A worker or reporter that fails (e.g. the output disk is full) ends
+        # the run with its error instead of leaving the queue unconsumed
+        workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+        reporting = asyncio.create_task(reporter())
+        feeding = asyncio.create_task(feed())
+        try:
+            await asyncio.wait([feeding, reporting, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in [reporting, *workers, feeding]:
+                if task.done():
+                    task.result()
+        finally:
+            for task in workers + [reporting, feeding]:
+                task.cancel()
+    return progress
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="JSONL file of inputs (url or text per line)")
+    parser.add_argument("output", help="JSONL file of results; also the resume checkpoint")
+    parser.add_argument("--mode", default="summary", choices=MODES)
+    parser.add_argument("--tone", default="neutral", choices=TONES)
+    parser.add_argument("--length", default="medium", choices=LENGTHS)
+    parser.add_argument("--lang", default="auto", choices=LANGS)
+    parser.add_argument("--concurrency", type=int, default=4, help="Inputs processed at once")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--retry-failed", action="store_true", help="Run inputs whose earlier result was an error again")
+    args = parser.parse_args(argv)
+
+    if not settings.hf_api_token:
+        parser.error("HF_API_TOKEN is not set")
+
+    if settings.cache_snapshot_file:
+        print(f"Cache: {cache.load(settings.cache_snapshot_file)} entries loaded", file=sys.stderr)
+    try:
+        progress = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if settings.cache_snapshot_file:
+            cache.save(settings.cache_snapshot_file)
+    print(progress.report(final=True), file=sys.stderr)
+    print(f"Cache: {json.dumps(cache.stats())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Extractive pre-condensation of long inputs
+Keeps the most central sentences within a token budget before prompting
+"""
+
+import re
+from typing import Dict, List, Optional
+import numpy as np
+from cachetools import LRUCache
+from app.config import get_settings
+from app.hashing import content_digest
+from app.tokens import get_token_counter
+
+
+# Sentence boundaries: terminal punctuation (optionally followed by a
+# closing quote or bracket) and whitespace, or a line break
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+|\n+")
+WORD_RE = re.compile(r"\w+")
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+
+# Sentences shorter than this carry too little signal to score
+MIN_SENTENCE_WORDS = 3
+
+# Run-on "sentences" (text without punctuation) are cut into pieces of
+# this many words so that a budget can always hold some of them
+MAX_SENTENCE_WORDS = 80
+
+# TextRank builds a dense sentence-by-term matrix; above this size the
+# centroid scorer is used instead
+MAX_TEXTRANK_CELLS = 4_000_000
+
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 30
+
+
+class RankedText:
+    """Sentences of a text with their scores and token counts"""
+
+    def __init__(self, sentences: List[str], paragraphs: np.ndarray, scores: np.ndarray, tokens: np.ndarray):
+        self.sentences = sentences
+        self.paragraphs = paragraphs
+        self.scores = scores
+        self.tokens = tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return int(self.tokens.sum())
+
+
+def split_sentences(text: str) -> List[List[str]]:
+    """Split text into paragraphs of sentences"""
+    paragraphs = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        sentences = []
+        for sentence in SENTENCE_SPLIT_RE.split(paragraph):
+            if not sentence or not sentence.strip():
+                continue
+            words = sentence.split()
+            if len(words) <= MAX_SENTENCE_WORDS:
+                sentences.append(sentence.strip())
+            else:
+                sentences.extend(
+                    " ".join(words[i:i + MAX_SENTENCE_WORDS])
+                    for i in range(0, len(words), MAX_SENTENCE_WORDS)
+                )
+        if sentences:
+            paragraphs.append(sentences)
+    return paragraphs
+
+
+def _term_matrix(sentences: List[str]):
+    """Sparse TF-IDF entries (rows, cols, weights) and vocabulary size"""
+    vocabulary: Dict[str, int] = {}
+    rows: List[int] = []
+    cols: List[int] = []
+    for i, sentence in enumerate(sentences):
+        for word in WORD_RE.findall(sentence.lower()):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    rows_arr = np.asarray(rows, dtype=np.int64)
+    cols_arr = np.asarray(cols, dtype=np.int64)
+    n, v = len(sentences), len(vocabulary)
+    if v == 0:
+        return rows_arr, cols_arr, np.zeros(0), n, v
+
+    # Collapse repeated (sentence, term) pairs into counts
+    keys, counts = np.unique(rows_arr * v + cols_arr, return_counts=True)
+    rows_arr, cols_arr = keys // v, keys % v
+
+    document_frequency = np.bincount(cols_arr, minlength=v)
+    idf = np.log((1 + n) / (1 + document_frequency)) + 1.0
+    weights = (1.0 + np.log(counts)) * idf[cols_arr]
+
+    # L2-normalize each sentence vector
+    norms = np.sqrt(np.bincount(rows_arr, weights=weights ** 2, minlength=n))
+    weights = weights / np.maximum(norms[rows_arr], 1e-12)
+    return rows_arr, cols_arr, weights, n, v
+
+
+def centroid_scores(sentences: List[str]) -> np.ndarray:
+    """Cosine similarity of each sentence to the TF-IDF centroid of the text"""
+    rows, cols, weights, n, v = _term_matrix(sentences)
+    if v == 0:
+        return np.zeros(n)
+    centroid = np.bincount(cols, weights=weights, minlength=v)
+    centroid /= max(np.linalg.norm(centroid), 1e-12)
+    return np.bincount(rows, weights=weights * centroid[cols], minlength=n)
+
+
+def textrank_scores(sentences: List[str]) -> np.ndarray:
+    """PageRank over the TF-IDF cosine similarity graph of the sentences"""
+    rows, cols, weights, n, v = _term_matrix(sentences)
+    if v == 0 or n * v > MAX_TEXTRANK_CELLS:
+        return centroid_scores(sentences)
+
+    matrix = np.zeros((n, v), dtype=np.float32)
+    matrix[rows, cols] = weights
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, out_weight, out=np.zeros_like(similarity), where=out_weight > 0)
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(TEXTRANK_ITERATIONS):
+        scores = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (transition.T @ scores)
+    return scores.astype(np.float64)
+
+
+SCORERS = {
+    "tfidf": centroid_scores,
+    "textrank": textrank_scores,
+}
+
+# Rankings are reused across budgets (e.g. every task of /generate-all)
+_rankings: LRUCache = LRUCache(maxsize=256)
+
+
+def rank_sentences(text: str, method: str = "tfidf", model: Optional[str] = None) -> RankedText:
+    """Score every sentence of text, cached per content digest"""
+    key = (content_digest(text), method, model)
+    ranked = _rankings.get(key)
+    if ranked is not None:
+        return ranked
+
+    sentences: List[str] = []
+    paragraph_ids: List[int] = []
+    for p, paragraph in enumerate(split_sentences(text)):
+        sentences.extend(paragraph)
+        paragraph_ids.extend([p] * len(paragraph))
+
+    scores = SCORERS[method](sentences) if sentences else np.zeros(0)
+    word_counts = np.fromiter((len(WORD_RE.findall(s)) for s in sentences), dtype=np.int64, count=len(sentences))
+    # Fragments (headings, bylines) rank below every real sentence
+    scores = np.where(word_counts < MIN_SENTENCE_WORDS, scores - 1.0, scores)
+
+    counter = get_token_counter(model or get_settings().gen_model)
+    tokens = np.fromiter((counter.count_segment(s) for s in sentences), dtype=np.int64, count=len(sentences))
+
+    ranked = RankedText(sentences, np.asarray(paragraph_ids, dtype=np.int64), scores, tokens)
+    _rankings[key] = ranked
+    return ranked
+
+
+def condense(text: str, budget_tokens: int, method: str = "tfidf", model: Optional[str] = None) -> str:
+    """
+    Keep the highest-scoring sentences of text within a token budget
+
+    Args:
+        text: Input text
+        budget_tokens: Token budget of the condensed text
+        method: Sentence scorer ("tfidf" centroid or "textrank")
+        model: Model whose token counter measures the budget
+
+    Returns:
+        Selected sentences in their original order, paragraphs kept apart;
+        the text itself if it already fits the budget
+    """
+    if budget_tokens <= 0 or not text:
+        return text
+
+    ranked = rank_sentences(text, method, model)
+    if ranked.total_tokens <= budget_tokens:
+        return text
+
+    # Greedy by score; a sentence that does not fit is skipped so that
+    # shorter, lower-ranked ones can still use the remaining budget. Each
+    # sentence is charged one extra token for the space or break joining it.
+    costs = ranked.tokens + 1
+    order = np.argsort(-ranked.scores, kind="stable")
+    cumulative = np.cumsum(costs[order])
+    keep = np.zeros(len(order), dtype=bool)
+    prefix = int(np.searchsorted(cumulative, budget_tokens, side="right"))
+    keep[order[:prefix]] = True
+    used = int(cumulative[prefix - 1]) if prefix else 0
+    for index in order[prefix:]:
+        if used + costs[index] <= budget_tokens:
+            keep[index] = True
+            used += int(costs[index])
+
+    paragraphs: List[List[str]] = []
+    last_paragraph = None
+    for index in np.flatnonzero(keep):
+        if ranked.paragraphs[index] != last_paragraph:
+            paragraphs.append([])
+            last_paragraph = ranked.paragraphs[index]
+        paragraphs[-1].append(ranked.sentences[index])
+    return "\n\n".join(" ".join(sentences) for sentences in paragraphs)
+
+
+# Condensed texts, so that the cost estimate of a request and its
+# generation condense the text once between them
+_condensed: LRUCache = LRUCache(maxsize=256)
+
+
+def condense_budget(mode: str) -> Optional[int]:
+    """Token budget that inputs of a generation mode are condensed to, if any"""
+    settings = get_settings()
+    if not settings.condense_enabled:
+        return None
+    return settings.condense_budgets.get(mode) or None
+
+
+def condense_for_mode(text: str, mode: str, model: Optional[str] = None) -> str:
+    """Condense text to the configured budget of a generation mode, cached per content digest"""
+    settings = get_settings()
+    budget = condense_budget(mode)
+    if not budget:
+        return text
+    key = (content_digest(text), budget, settings.condense_method, model)
+    condensed = _condensed.get(key)
+    if condensed is None:
+        condensed = _condensed[key] = condense(text, budget, settings.condense_method, model)
+    return condensed
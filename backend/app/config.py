@@ -4,7 +4,7 @@ Handles environment variables and application settings
 """
 
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -19,9 +19,96 @@ class Settings(BaseSettings):
     sum_model: str = "facebook/bart-large-cnn"
     gen_model: str = "mistralai/Mistral-7B-Instruct-v0.2"
     
+    # Inference backends: "hf_inference", "hf_router" or "local" (CPU,
+    # summarization only; falls back to hf_inference if not installed)
+    summarize_backend: str = "hf_inference"  # Chunk map stage
+    generate_backend: str = "hf_inference"  # Final generation calls
+    
+    # HF Router (chat completions) targets, tried fastest-healthy first
+    hf_router_base: str = "https://router.huggingface.co/v1"
+    hf_router_targets: List[str] = [
+        "meta-llama/Llama-3.1-8B-Instruct:novita",
+        "meta-llama/Llama-3.1-8B-Instruct:cerebras",
+        "meta-llama/Llama-3.1-8B-Instruct:nebius",
+    ]
+    hf_router_hedge: bool = True
+    hf_router_hedge_delay: float = 3.0  # Until a target's p95 is known
+    
+    # Local summarizer: CTranslate2 model directory containing tokenizer.json
+    local_model_dir: str = "models/distilbart-cnn-12-6-ct2-int8"
+    local_compute_type: str = "int8"
+    local_threads: int = 0  # 0 lets CTranslate2 decide
+    
+    # Boilerplate filter for extracted pages: repeated paragraphs are always
+    # dropped; paragraphs found on min_share of a domain's recent pages are
+    # dropped once min_pages of them have been seen
+    boilerplate_filter_enabled: bool = True
+    boilerplate_history_pages: int = 20
+    boilerplate_min_pages: int = 5
+    boilerplate_min_share: float = 0.6
+    
+    # Extractive pre-condensation: inputs above a mode's token budget are
+    # cut down to their most central sentences before prompting
+    condense_enabled: bool = True
+    condense_method: str = "tfidf"  # "tfidf" (centroid) or "textrank"
+    condense_budgets: Dict[str, int] = {
+        "summary": 2000,
+        "youtube": 2000,
+        "shorts": 800,
+        "social": 500,
+        "seo": 300,
+    }
+    
+    # Shared digest (key points, entities, facts) that all /generate-all
+    # prompts are built from
+    digest_budget_tokens: int = 600
+    digest_max_entities: int = 12
+    
+    # Model routing: named tiers override the models above, and the first
+    # matching rule (mode / length / input size) picks the tier for a request.
+    # Off by default: the small tier's output has not been checked for
+    # quality, nor for Turkish; compare tiers with benchmarks.bench_routing
+    # --live before enabling. Its rules stay within one chunk (4000 chars),
+    # so prompts fit Phi-3-mini's 4k-token context with the template
+    routing_enabled: bool = False
+    model_tiers: Dict[str, Dict[str, str]] = {
+        "small": {
+            "sum_model": "sshleifer/distilbart-cnn-12-6",
+            "gen_model": "microsoft/Phi-3-mini-4k-instruct",
+        },
+    }
+    routing_rules: List[Dict[str, Any]] = [
+        {"tier": "small", "modes": ["shorts"], "max_chars": 4000},
+        {"tier": "small", "lengths": ["short"], "max_chars": 4000},
+        {"tier": "small", "lengths": ["short", "medium"], "max_chars": 1500},
+    ]
+    
+    # Local tokenizer definitions: <tokenizer_dir>/<org>--<name>/tokenizer.json
+    tokenizer_dir: str = "tokenizers"
+    
     # API Configuration
     max_input_chars: int = 50000
     max_chunk_size: int = 4000
+    map_concurrency: int = 4  # Chunk summarization calls in flight per request
+    max_page_bytes: int = 5 * 1024 * 1024  # Streamed page download limit
+    # Page extractor of app.py: "density" scores blocks in one streaming pass
+    # over the HTML, "soup" builds a BeautifulSoup tree and looks for
+    # content selectors
+    url_extractor: str = "density"
+
+    # Page fetching: one pooled client for all extractors, polite per host
+    fetch_max_connections: int = 50
+    fetch_keepalive_seconds: float = 30.0
+    fetch_host_concurrency: int = 2  # Requests in flight per host
+    fetch_host_interval_seconds: float = 0.25  # Between request starts per host
+    fetch_max_redirects: int = 5
+    fetch_dns_ttl_seconds: int = 300
+    
+    # Requests still running this long after they arrived are cancelled
+    # (extraction, chunk summaries, HF calls and retry waits) and answered
+    # with 504; requests whose client disconnects are cancelled at once.
+    # 0 disables the deadline.
+    request_deadline_seconds: float = 120.0
     
     # CORS
     allowed_origins: List[str] = [
@@ -31,11 +118,86 @@ class Settings(BaseSettings):
     
     # Rate limiting
     extract_rate_limit: str = "10/minute"
-    generate_rate_limit: str = "5/minute"
     
-    # Cache settings
+    # Cost-weighted generation budget (in estimated tokens)
+    generate_budget_capacity: float = 20000
+    generate_budget_refill_per_second: float = 100.0
+    generate_cost_per_call: int = 100  # Fixed overhead charged per HF call
+    generate_client_budgets: Dict[str, float] = {}  # Client address -> capacity
+    
+    # Cache settings: the response cache is bounded by bytes; values of at
+    # least cache_compress_min_bytes are stored compressed (zstd if installed,
+    # else zlib) with a dictionary trained on the first cached values
     cache_ttl_seconds: int = 24 * 60 * 60  # 24 hours
-    cache_max_size: int = 1000
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_compress_min_bytes: int = 512
+    cache_dictionary_samples: int = 200
+    # Admission/eviction: "tinylfu" (W-TinyLFU, scan resistant) or "lru"
+    cache_policy: str = "tinylfu"
+    cache_window_share: float = 0.01  # Share of the cache in the LRU window
+    cache_max_size: int = 1000  # Entries of the near-duplicate index
+    # Loaded at startup and saved at shutdown by the server and by bulk
+    # runs (python -m app.cli), so each sees the other's results only after
+    # a restart; e.g. logs/cache-snapshot.pkl.gz, empty disables
+    cache_snapshot_file: str = ""
+    
+    # Near-duplicate inputs served from the cache of a similar earlier input
+    near_duplicate_enabled: bool = True
+    near_duplicate_threshold: float = 0.9  # Estimated Jaccard similarity
+    near_duplicate_min_words: int = 50
+    
+    # Startup
+    prewarm_extractors: bool = True  # Import extraction backends in the background
+    model_probe_interval_seconds: int = 300  # How often /health re-checks the models
+    
+    # Cache prewarming: seed URLs, feed items and the most requested sources
+    # are extracted and generated in the listed variants ("mode/tone/length"
+    # or "mode/tone/length/lang") plus the most requested ones, while idle
+    prewarm_enabled: bool = False
+    prewarm_urls: List[str] = []
+    prewarm_feeds: List[str] = []  # RSS or Atom feed URLs
+    prewarm_feed_items: int = 10  # Newest items taken from each feed
+    prewarm_top_sources: int = 20
+    prewarm_variants: List[str] = [
+        "summary/neutral/medium",
+        "shorts/energetic/short",
+        "youtube/neutral/medium",
+    ]
+    prewarm_top_variants: int = 2
+    prewarm_interval_seconds: int = 15 * 60
+    prewarm_budget_tokens_per_hour: float = 50000  # Estimated HF tokens
+
+    # Speculative map stage: after /extract, the chunk summaries that the
+    # likely /generate of the extracted text needs are computed in the
+    # background, so that /generate only pays for the final call; off by
+    # default, as summaries of texts that are never generated are paid for too
+    speculate_enabled: bool = False
+    speculate_variant: str = "summary/neutral/medium"  # Until variants have been requested
+    speculate_max_chunks: int = 8  # Per extracted text
+    speculate_max_active_requests: int = 4  # No speculation while busier than this
+    speculate_budget_tokens_per_hour: float = 20000  # Estimated HF tokens
+    chunk_summary_cache_size: int = 2000  # Map-stage results kept, speculative or not
+
+    # Content handles: extracted texts that /generate accepts by content_id
+    content_store_size: int = 1000
+    content_ttl_seconds: int = 3600
+
+    # Tracing and profiling
+    trace_file: str = ""  # e.g. logs/traces.jsonl; empty disables
+    trace_file_max_bytes: int = 10 * 1024 * 1024
+    profile_dir: str = "logs/profiles"
+    admin_token: str = ""  # Enables /admin endpoints when set
+    
+    # Traffic recording: anonymized shapes and timings of /extract and
+    # /generate requests, for `python -m benchmarks.replay`; off when empty
+    traffic_record_file: str = ""
+    traffic_record_max_bytes: int = 50 * 1024 * 1024
+    
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "console"
+    log_success_sample_rate: float = 0.1  # Share of routine success events kept
+    log_queue_size: int = 10000  # Records beyond this are dropped, never block
     
     # Server settings
     host: str = "0.0.0.0"
@@ -45,6 +207,7 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
         case_sensitive = False
+        protected_namespaces = ()  # Allow model_* setting names
 
 
 # Global settings instance
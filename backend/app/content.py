@@ -0,0 +1,95 @@
+"""
+Server-side content handles
+Extracted texts kept on the server so that /generate can refer to them by ID
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from cachetools import TTLCache
+from app.condense import condense_for_mode
+from app.config import get_settings
+from app.generator import chunk_text
+from app.hashing import content_digest
+from app.langid import detect_language
+
+
+class StoredContent:
+    """
+    Extracted text exactly as /generate reads it, with what was derived from it
+
+    The text is truncated and stripped once when it is stored, so a
+    generation from the handle needs no validation and no hashing: the
+    digest doubles as the content ID and as the text part of cache keys.
+    """
+
+    def __init__(self, text: str, digest: str, url: Optional[str] = None):
+        self.text = text
+        self.digest = digest
+        self.url = url
+        self.lang = detect_language(text)
+        self._derived: Dict[str, Any] = {}
+
+    @property
+    def content_id(self) -> str:
+        return self.digest
+
+    def derive(self, name: str, compute: Callable[[str], Any]) -> Any:
+        """Value computed from the text once, e.g. its near-duplicate signature"""
+        if name not in self._derived:
+            self._derived[name] = compute(self.text)
+        return self._derived[name]
+
+    def chunk_sizes(self, mode: str, model: Optional[str] = None) -> List[int]:
+        """Character counts of the chunks the map stage of a mode splits the condensed text into"""
+        def plan(text: str) -> List[int]:
+            text = condense_for_mode(text, mode, model)
+            return [len(chunk) for chunk in chunk_text(text, get_settings().max_chunk_size)]
+        return self.derive(f"chunks:{mode}:{model}", plan)
+
+
+class ContentStore:
+    """
+    Recently extracted texts by content ID
+
+    Entries expire `content_ttl_seconds` after they were last stored and
+    the oldest are dropped beyond `content_store_size`. Handles are local
+    to the process; clients fall back to posting the text when a handle
+    is unknown.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, text: str, url: Optional[str] = None) -> StoredContent:
+        """Store an extracted text, reusing the entry of an identical one"""
+        text = text[:get_settings().max_input_chars].strip()
+        digest = content_digest(text)
+        content = self.entries.get(digest)
+        if content is None:
+            content = StoredContent(text, digest, url)
+        self.entries[digest] = content  # Restarts its TTL
+        return content
+
+    def get(self, content_id: str) -> Optional[StoredContent]:
+        content = self.entries.get(content_id)
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+_content_store: Optional[ContentStore] = None
+
+
+def get_content_store() -> ContentStore:
+    """Get the global content store"""
+    global _content_store
+    if _content_store is None:
+        settings = get_settings()
+        _content_store = ContentStore(settings.content_store_size, settings.content_ttl_seconds)
+    return _content_store
@@ -0,0 +1,213 @@
+"""
+Request deadlines and cancellation
+Stops a request's remaining work when its deadline passes or its client goes away
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from app.logs import get_logger
+
+
+logger = get_logger(__name__)
+
+# Status logged for requests whose client went away (nginx convention);
+# the client never sees it
+CLIENT_CLOSED_STATUS = 499
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time"""
+    pass
+
+
+class Deadline:
+    """Point in time by which a request must be answered"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.stage = "request"  # Last stage that checked the deadline
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline of the request being handled, if any"""
+    return _current_deadline.get()
+
+
+class CancellationStats:
+    """Counts of requests cancelled, by reason and by the stage they were in"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def record(self, reason: str, stage: str) -> None:
+        self.counts[(reason, stage)] += 1
+        logger.warning("request_cancelled", reason=reason, stage=stage)
+
+    def snapshot(self) -> Dict[str, Any]:
+        totals: Counter = Counter()
+        for (reason, _), count in self.counts.items():
+            totals[reason] += count
+        return {
+            "deadline": totals["deadline"],
+            "disconnect": totals["disconnect"],
+            "by_stage": {f"{reason}/{stage}": count for (reason, stage), count in sorted(self.counts.items())},
+        }
+
+
+_stats = CancellationStats()
+
+
+def get_cancellation_stats() -> CancellationStats:
+    """Get the global cancellation counters"""
+    return _stats
+
+
+def check_deadline(stage: str) -> None:
+    """
+    Mark the start of a stage, failing fast if the request is out of time
+
+    Raises:
+        DeadlineExceeded: If the current request's deadline has passed
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return
+    deadline.stage = stage
+    if deadline.expired:
+        _stats.record("deadline", stage)
+        raise DeadlineExceeded(f"Request deadline exceeded during {stage}")
+
+
+def time_left(timeout: float) -> float:
+    """A timeout shortened to the time left before the current deadline"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    return max(0.001, min(timeout, deadline.remaining()))
+
+
+async def deadline_sleep(seconds: float, stage: str = "retry-wait") -> None:
+    """
+    Sleep before a retry, unless the retry could only start after the deadline
+
+    Raises:
+        DeadlineExceeded: Instead of sleeping past the current deadline
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None and seconds >= deadline.remaining():
+        deadline.stage = stage
+        _stats.record("deadline", stage)
+        raise DeadlineExceeded(f"Request deadline exceeded during {stage}")
+    await asyncio.sleep(seconds)
+
+
+async def without_deadline(coro):
+    """Run a coroutine free of the current request's deadline (for background tasks)"""
+    _current_deadline.set(None)  # Tasks have their own copy of the context
+    return await coro
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving each HTTP request a deadline
+
+    The request runs as a task with the deadline in its context. The task
+    is cancelled when the deadline passes, answering 504, or when the
+    client disconnects. Cancellation reaches whatever the request is
+    awaiting: HF calls, retry waits, page downloads and chunk summary
+    tasks.
+
+    Starlette's `BaseHTTPMiddleware` does not pass disconnects on to
+    `Request.is_disconnected()`, so this middleware reads them itself:
+    once the request body has been received, it waits on `receive` for
+    the disconnect message. Requests without a body never read it and are
+    only bounded by the deadline.
+    """
+
+    def __init__(self, app, seconds: float):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.seconds:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(self.seconds)
+        body_received = asyncio.Event()
+        disconnected = asyncio.Event()
+        response_started = False
+
+        async def receive_request():
+            if body_received.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body"):
+                body_received.set()
+            return message
+
+        async def send_response(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        async def watch_disconnect():
+            await body_received.wait()
+            while not disconnected.is_set():
+                if (await receive())["type"] == "http.disconnect":
+                    disconnected.set()
+
+        token = _current_deadline.set(deadline)
+        try:
+            handler = asyncio.ensure_future(self.app(scope, receive_request, send_response))
+        finally:
+            _current_deadline.reset(token)
+        watcher = asyncio.ensure_future(watch_disconnect())
+        gone = asyncio.ensure_future(disconnected.wait())
+        try:
+            await asyncio.wait({handler, gone}, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            if handler.done():
+                handler.result()
+                return
+
+            reason = "disconnect" if disconnected.is_set() else "deadline"
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            _stats.record(reason, deadline.stage)
+            if not response_started:
+                if reason == "deadline":
+                    await _send_json(send, 504, {"detail": "Request deadline exceeded"})
+                else:
+                    await _send_json(send, CLIENT_CLOSED_STATUS, {"detail": "Client closed request"})
+        finally:
+            for task in (handler, watcher, gone):
+                task.cancel()
+
+
+async def _send_json(send, status: int, content: Dict[str, Any]) -> None:
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,405 @@
+"""
+Single-pass content extraction by text and link density
+Finds the main content of a page while it streams, without building a DOM
+"""
+
+import codecs
+import html
+import re
+from typing import AsyncIterable, Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Elements whose text is never page content
+SKIP_TAGS = frozenset({
+    "head", "script", "style", "noscript", "template", "svg", "nav", "header",
+    "footer", "aside", "menu", "form", "button", "select", "textarea", "iframe",
+})
+
+# Elements that start or end a paragraph
+BLOCK_TAGS = frozenset({
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "br", "hr",
+    "table", "tr", "td", "th", "figcaption", "caption",
+})
+
+# Block elements that can hold the main content; paragraphs are scored
+# into the nearest enclosing containers
+CONTAINER_TAGS = frozenset({
+    "body", "div", "section", "article", "main", "td", "blockquote", "ul", "ol", "table",
+})
+
+# Shorter text blocks (labels, buttons, bylines) are not paragraphs
+MIN_PARAGRAPH_CHARS = 10
+SYMBOLS_ONLY_RE = re.compile(r"^[\W_]*$")
+NON_CONTENT_PREFIXES = ("cookie", "javascript", "advertisement", "ads", "menu", "navigation")
+
+# class/id hints of content and non-content containers
+POSITIVE_HINT_RE = re.compile(
+    r"article|body|content|entry|main|page|post|story|text|blog|haber|icerik|detay", re.I
+)
+NEGATIVE_HINT_RE = re.compile(
+    r"comment|sidebar|footer|nav|menu|widget|related|share|social|promo|sponsor|advert|"
+    r"\bads?\b|cookie|banner|breadcrumb|popup|subscribe|newsletter|yorum|reklam", re.I
+)
+POSITIVE_WEIGHT = 1.5
+NEGATIVE_WEIGHT = 0.3
+
+# Paragraphs with more link text than this are navigation
+MAX_LINK_DENSITY = 0.5
+
+# Characters per descendant tag at which a container counts as fully dense;
+# menus and card grids fall far below it
+FULL_TEXT_DENSITY = 25.0
+
+# Siblings of the best container scoring at least this share of it are
+# part of the content too (articles split over several blocks)
+SIBLING_SHARE = 0.2
+
+# Attribute values of elements marking the main content
+MAIN_ROLES = ("main", "article")
+
+HEADING_TAGS = frozenset({"h1", "h2", "h3"})
+
+# Tokenizer: tags, comments and declarations; text is everything between them.
+# Raw text elements are skipped up to their end tag without tokenizing.
+TAG_RE = re.compile(r"<(/?)([A-Za-z][^\s/>]*)([^>]*)>")
+ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+RAW_TEXT_TAGS = frozenset({"script", "style", "textarea", "title"})
+RAW_END_RES = {tag: re.compile(rf"</{tag}\s*>", re.I) for tag in RAW_TEXT_TAGS}
+
+
+class Paragraph(NamedTuple):
+    text: str
+    link_density: float
+    boilerplate: bool  # Inside a container hinted as non-content
+    heading: bool
+
+
+class _Frame:
+    """Running totals of an open container element"""
+
+    __slots__ = ("serial", "parent", "first", "chars", "link_chars", "tags", "score", "weight", "negative")
+
+    def __init__(self, serial: int, parent: int, first: int, weight: float, negative: bool):
+        self.serial = serial
+        self.parent = parent
+        self.first = first  # Index of the first paragraph inside
+        self.chars = 0
+        self.link_chars = 0
+        self.tags = 0
+        self.score = 0.0
+        self.weight = weight
+        self.negative = negative
+
+
+class DensityExtractor:
+    """
+    Streaming main-content extractor
+
+    Text is collected into paragraphs at block boundaries. Each paragraph
+    adds a score (length, commas, minus its link share) to its enclosing
+    container, half of it to the grandparent and a third to the next
+    ancestor. When a container closes, its score is weighted by its
+    class/id hints, its link density and its text density (characters per
+    descendant tag), and the best container so far is remembered as a
+    paragraph range. Only the paragraphs and one small record per scored
+    container are kept, never the element tree.
+
+    The markup is split by a regex tokenizer rather than `html.parser`,
+    which spends most of its time on bookkeeping this extractor does not
+    need. Attributes are only parsed for container elements.
+
+    Feed decoded HTML with `feed()`; `close()` returns the paragraphs of
+    the best container and its strong siblings.
+    """
+
+    def __init__(self):
+        self.paragraphs: List[Paragraph] = []
+        self._stack: List[_Frame] = []
+        self._tags: List[str] = []  # Tags of the open frames
+        self._candidates: List[Tuple[float, int, int, int]] = []  # (score, first, end, parent)
+        self._buffer = ""
+        self._raw_tag: Optional[str] = None
+        self._parts: List[str] = []
+        self._link_chars = 0
+        self._link_depth = 0
+        self._skip_depth = 0
+        self._negative_depth = 0
+        self._heading = False
+        self._serial = 0
+
+    # Tokenizer
+
+    def feed(self, data: str) -> None:
+        """Process the next piece of the document"""
+        self._buffer += data
+        self._scan(final=False)
+
+    def _scan(self, final: bool) -> None:
+        buffer = self._buffer
+        end = len(buffer)
+        pos = 0
+        while pos < end:
+            if self._raw_tag:
+                match = RAW_END_RES[self._raw_tag].search(buffer, pos)
+                if match is None:
+                    # Keep enough to find an end tag split across pieces
+                    pos = end if final else max(pos, end - 16)
+                    break
+                pos = match.end()
+                self._raw_tag = None
+                continue
+
+            lt = buffer.find("<", pos)
+            if lt < 0:
+                self.handle_data(buffer[pos:])
+                pos = end
+                break
+            if lt > pos:
+                self.handle_data(buffer[pos:lt])
+                pos = lt
+
+            if buffer.startswith("<!--", lt):
+                close = buffer.find("-->", lt + 4)
+                if close < 0:
+                    pos = end if final else lt
+                    break
+                pos = close + 3
+                continue
+
+            match = TAG_RE.match(buffer, lt)
+            if match is None:
+                if buffer.find(">", lt) < 0 and not final:
+                    break  # Markup continues in the next piece
+                if buffer.startswith(("<!", "<?"), lt):
+                    pos = buffer.find(">", lt) + 1 or end
+                else:
+                    self.handle_data("<")  # A literal "<" in the text
+                    pos = lt + 1
+                continue
+
+            pos = match.end()
+            tag = match.group(2).lower()
+            if match.group(1):
+                self.handle_endtag(tag)
+            elif tag in RAW_TEXT_TAGS:
+                self._raw_tag = tag
+            else:
+                self.handle_starttag(tag, match.group(3))
+        self._buffer = buffer[pos:]
+
+    # Element callbacks
+
+    def handle_starttag(self, tag: str, attrs: str) -> None:
+        if self._skip_depth:
+            if tag in SKIP_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in BLOCK_TAGS or tag in SKIP_TAGS:
+            self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+
+        if self._stack:
+            self._stack[-1].tags += 1
+        if tag == "a":
+            self._link_depth += 1
+        elif tag in CONTAINER_TAGS:
+            self._open(tag, attrs)
+        elif tag in HEADING_TAGS:
+            self._heading = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._skip_depth:
+            return
+        if tag == "a":
+            self._link_depth = max(0, self._link_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            if tag in CONTAINER_TAGS and tag in self._tags:
+                # Close unclosed children too, as browsers do
+                while self._tags.pop() != tag:
+                    self._close_frame()
+                self._close_frame()
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth:
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    # Containers
+
+    def _open(self, tag: str, attrs: str) -> None:
+        hints = []
+        role = None
+        for match in ATTR_RE.finditer(attrs):
+            name = match.group(1).lower()
+            value = match.group(2) or match.group(3) or match.group(4) or ""
+            if name in ("class", "id"):
+                hints.append(value)
+            elif name == "role":
+                role = value.lower()
+        hints = " ".join(hints)
+        weight = 1.0
+        negative = False
+        if tag in ("article", "main") or role in MAIN_ROLES:
+            weight = POSITIVE_WEIGHT
+        if hints:
+            if NEGATIVE_HINT_RE.search(hints):
+                weight, negative = NEGATIVE_WEIGHT, True
+            elif POSITIVE_HINT_RE.search(hints):
+                weight = POSITIVE_WEIGHT
+
+        self._serial += 1
+        parent = self._stack[-1].serial if self._stack else 0
+        self._stack.append(_Frame(self._serial, parent, len(self.paragraphs), weight, negative))
+        self._tags.append(tag)
+        if negative:
+            self._negative_depth += 1
+
+    def _close_frame(self) -> None:
+        frame = self._stack.pop()
+        if frame.negative:
+            self._negative_depth -= 1
+        if self._stack:
+            parent = self._stack[-1]
+            parent.chars += frame.chars
+            parent.link_chars += frame.link_chars
+            parent.tags += frame.tags
+
+        if frame.score > 0 and frame.chars:
+            link_density = frame.link_chars / frame.chars
+            text_density = min(1.0, frame.chars / max(frame.tags, 1) / FULL_TEXT_DENSITY)
+            score = frame.score * frame.weight * (1 - link_density) * text_density
+            self._candidates.append((score, frame.first, len(self.paragraphs), frame.parent))
+
+    # Paragraphs
+
+    def _flush(self) -> None:
+        heading, self._heading = self._heading, False
+        if not self._parts:
+            return
+        text = " ".join("".join(self._parts).split())
+        if "&" in text:
+            text = html.unescape(text)
+        link_chars = self._link_chars
+        self._parts = []
+        self._link_chars = 0
+        if (
+            len(text) < MIN_PARAGRAPH_CHARS
+            or SYMBOLS_ONLY_RE.match(text)
+            or text.lower().startswith(NON_CONTENT_PREFIXES)
+        ):
+            return
+
+        chars = len(text)
+        link_density = min(1.0, link_chars / chars)
+        boilerplate = self._negative_depth > 0
+        self.paragraphs.append(Paragraph(text, link_density, boilerplate, heading))
+        if not self._stack:
+            return
+
+        frame = self._stack[-1]
+        frame.chars += chars
+        frame.link_chars += link_chars
+        if boilerplate or link_density > MAX_LINK_DENSITY:
+            return
+
+        # Readability-style score: a base point, commas and length
+        score = (1 + text.count(",") + min(chars / 100, 3)) * (1 - link_density)
+        for level, ancestor in enumerate(reversed(self._stack[-3:])):
+            ancestor.score += score / (1, 2, 3)[level]
+
+    def close(self) -> List[str]:
+        """
+        Finish parsing
+
+        Returns:
+            Paragraphs of the main content, in page order
+        """
+        self._scan(final=True)
+        self._flush()
+        while self._stack:
+            self._tags.pop()
+            self._close_frame()
+        return [paragraph.text for paragraph in self._select()]
+
+    def _select(self) -> List[Paragraph]:
+        if not self._candidates:
+            return [p for p in self.paragraphs if not p.boilerplate and p.link_density <= MAX_LINK_DENSITY]
+
+        best = max(self._candidates)
+        best_score, first, end, parent = best
+        ranges = [(first, end)]
+        for candidate in self._candidates:
+            score, s_first, s_end, s_parent = candidate
+            if s_parent == parent and score >= best_score * SIBLING_SHARE and candidate != best:
+                ranges.append((s_first, s_end))
+        ranges.sort()
+
+        # The title usually sits just above the article body
+        first = ranges[0][0]
+        if first and self.paragraphs[first - 1].heading:
+            ranges.insert(0, (first - 1, first))
+
+        selected = []
+        for r_first, r_end in ranges:
+            for paragraph in self.paragraphs[r_first:r_end]:
+                if not paragraph.boilerplate and paragraph.link_density <= MAX_LINK_DENSITY:
+                    selected.append(paragraph)
+        return selected
+
+
+def extract_main_paragraphs(
+    blocks: Iterable[bytes], encoding: Optional[str] = None, max_bytes: Optional[int] = None
+) -> List[str]:
+    """
+    Main content paragraphs of an HTML byte stream
+
+    Args:
+        blocks: Body bytes as they arrive (e.g. `response.iter_content()`)
+        encoding: Charset from the Content-Type header; UTF-8 if missing or unknown
+        max_bytes: Stop reading after this many bytes
+
+    Returns:
+        Paragraphs of the best scoring content container
+    """
+    decoder = _decoder(encoding)
+    extractor = DensityExtractor()
+    received = 0
+    for block in blocks:
+        extractor.feed(decoder.decode(block))
+        received += len(block)
+        if max_bytes and received >= max_bytes:
+            break
+    extractor.feed(decoder.decode(b"", final=True))
+    return extractor.close()
+
+
+async def extract_main_paragraphs_async(
+    blocks: AsyncIterable[bytes], encoding: Optional[str] = None, max_bytes: Optional[int] = None
+) -> List[str]:
+    """`extract_main_paragraphs` of an async byte stream (e.g. `response.aiter_bytes()`)"""
+    decoder = _decoder(encoding)
+    extractor = DensityExtractor()
+    received = 0
+    async for block in blocks:
+        extractor.feed(decoder.decode(block))
+        received += len(block)
+        if max_bytes and received >= max_bytes:
+            break
+    extractor.feed(decoder.decode(b"", final=True))
+    return extractor.close()
+
+
+def _decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
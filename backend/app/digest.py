@@ -0,0 +1,156 @@
+"""
+Structured digest of an input text
+Key points, entities and facts extracted once and shared by several prompts
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set
+import numpy as np
+from cachetools import LRUCache
+from app.condense import MIN_SENTENCE_WORDS, SENTENCE_SPLIT_RE, WORD_RE, rank_sentences
+from app.config import get_settings
+from app.hashing import content_digest
+
+
+# Capitalized word sequences (names, places, organizations, acronyms);
+# apostrophe suffixes ("Google's", "İstanbul'da") end the match
+ENTITY_RE = re.compile(r"[A-ZÇĞİÖŞÜ][\w.-]*(?:\s+(?:[A-ZÇĞİÖŞÜ][\w.-]*|\d+))*")
+
+# Sentences with numbers, amounts, percentages or dates carry facts
+FACT_RE = re.compile(r"\d")
+
+# Share of the token budget spent on key points; facts get the rest
+KEY_POINT_SHARE = 0.7
+
+SECTION_LABELS = {
+    "tr": ("Ana noktalar", "Öne çıkan isimler", "Veriler ve olgular"),
+    "en": ("Key points", "Entities", "Facts"),
+}
+
+
+class Digest:
+    """Key points, entities and facts of a text, in source order"""
+
+    def __init__(
+        self,
+        key_points: List[str],
+        entities: List[str],
+        facts: List[str],
+        source_chars: int,
+        full_text: Optional[str] = None
+    ):
+        self.key_points = key_points
+        self.entities = entities
+        self.facts = facts
+        self.source_chars = source_chars
+        self.full_text = full_text  # Set when the text already fits the budget
+
+    def render(self, lang: str) -> str:
+        """Digest as prompt content; the text itself if it was short enough"""
+        if self.full_text is not None:
+            return self.full_text
+        points_label, entities_label, facts_label = SECTION_LABELS["tr" if lang == "tr" else "en"]
+        sections = [f"{points_label}:\n" + "\n".join(f"- {point}" for point in self.key_points)]
+        if self.entities:
+            sections.append(f"{entities_label}: " + ", ".join(self.entities))
+        if self.facts:
+            sections.append(f"{facts_label}:\n" + "\n".join(f"- {fact}" for fact in self.facts))
+        return "\n\n".join(sections)
+
+
+def extract_entities(sentences: List[str], limit: int) -> List[str]:
+    """
+    Most frequent capitalized phrases of the text
+
+    A capitalized word at the start of a sentence only counts if the same
+    phrase also appears capitalized inside a sentence.
+    """
+    counts: Counter = Counter()
+    first_seen: Dict[str, int] = {}
+    inside = set()
+    for index, sentence in enumerate(sentences):
+        for match in ENTITY_RE.finditer(sentence):
+            phrase = match.group().rstrip(".-")
+            if len(phrase) < 2:
+                continue
+            counts[phrase] += 1
+            first_seen.setdefault(phrase, index)
+            if match.start() > 0:
+                inside.add(phrase)
+
+    ranked = sorted(
+        (phrase for phrase in counts if phrase in inside),
+        key=lambda phrase: (-counts[phrase], first_seen[phrase])
+    )
+    return ranked[:limit]
+
+
+def _select(
+    order: np.ndarray, sentences: List[str], tokens: np.ndarray, budget: int, taken: Set[str]
+) -> List[int]:
+    """Greedily take distinct full sentences in rank order within a token budget"""
+    chosen = []
+    used = 0
+    for index in order:
+        key = sentences[index].lower()
+        if key in taken or len(WORD_RE.findall(key)) < MIN_SENTENCE_WORDS:
+            continue
+        cost = int(tokens[index]) + 3  # List marker and line break
+        if used + cost <= budget:
+            chosen.append(int(index))
+            taken.add(key)
+            used += cost
+    return sorted(chosen)
+
+
+def build_digest(text: str, budget_tokens: int, max_entities: int = 12, model: Optional[str] = None) -> Digest:
+    """
+    Build the digest of a text within a token budget
+
+    Args:
+        text: Input text
+        budget_tokens: Token budget for key points and facts
+        max_entities: Maximum number of entities listed
+        model: Model whose token counter measures the budget
+
+    Returns:
+        Digest of the text; texts within the budget are kept whole
+    """
+    settings = get_settings()
+    ranked = rank_sentences(text, settings.condense_method, model)
+    if ranked.total_tokens <= budget_tokens or not ranked.sentences:
+        return Digest([], [], [], len(text), full_text=text)
+
+    order = np.argsort(-ranked.scores, kind="stable")
+    taken: Set[str] = set()
+
+    key_budget = int(budget_tokens * KEY_POINT_SHARE)
+    key_points = _select(order, ranked.sentences, ranked.tokens, key_budget, taken)
+
+    # Facts are picked from the remaining sentences that contain numbers
+    fact_order = np.array([i for i in order if FACT_RE.search(ranked.sentences[i])], dtype=np.int64)
+    facts = _select(fact_order, ranked.sentences, ranked.tokens, budget_tokens - key_budget, taken)
+
+    return Digest(
+        key_points=[ranked.sentences[i] for i in key_points],
+        entities=extract_entities(SENTENCE_SPLIT_RE.split(text), max_entities),
+        facts=[ranked.sentences[i] for i in facts],
+        source_chars=len(text),
+    )
+
+
+# Digests are built once per input and reused by every task of a request
+# and by repeated requests for the same content
+_digests: LRUCache = LRUCache(maxsize=256)
+
+
+def get_digest(text: str, model: Optional[str] = None) -> Digest:
+    """Digest of text with the configured budget, cached per content digest"""
+    settings = get_settings()
+    key = (content_digest(text), model, settings.digest_budget_tokens)
+    digest = _digests.get(key)
+    if digest is None:
+        digest = build_digest(text, settings.digest_budget_tokens, settings.digest_max_entities, model)
+        _digests[key] = digest
+    return digest
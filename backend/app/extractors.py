@@ -4,33 +4,69 @@ Multiple fallback methods for robust text extraction
 """
 
 import re
-from typing import Optional, Dict, Any
-from urllib.parse import urlparse
+import time
 import asyncio
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlparse
+from app.boilerplate import get_boilerplate_filter
+from app.config import get_settings
+from app.deadline import check_deadline
+from app.density import NON_CONTENT_PREFIXES
+from app.fetch import FetchError, Page, get_fetcher
+from app.logs import get_logger
+from app.tracing import span
+
+
+logger = get_logger(__name__)
+
+
+# Extraction backends are imported on first use: loading trafilatura,
+# newspaper3k, readability and lxml up front takes seconds, and most
+# requests never get past the first extractor.
+BACKEND_MODULES: Dict[str, List[str]] = {
+    "trafilatura": ["trafilatura"],
+    "newspaper3k": ["newspaper"],
+    "readability": ["readability", "bs4"],
+    "beautifulsoup": ["bs4"],
+}
+
+_modules: Dict[str, Optional[ModuleType]] = {}
 
-try:
-    import trafilatura
-except ImportError:
-    trafilatura = None
 
-try:
-    from newspaper import Article
-except ImportError:
-    Article = None
+def _import(name: str) -> Optional[ModuleType]:
+    """Import a backend module once, remembering failures"""
+    if name not in _modules:
+        try:
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
+
+
+async def _load(*names: str) -> Optional[List[ModuleType]]:
+    """
+    Import backend modules without blocking the event loop
+
+    Returns:
+        The modules in order, or None if any of them is unavailable
+    """
+    if any(name not in _modules for name in names):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, lambda: [_import(name) for name in names])
+
+    modules = [_modules[name] for name in names]
+    if any(module is None for module in modules):
+        return None
+    return modules
 
-try:
-    from readability import Document
-    import requests
-except ImportError:
-    Document = None
-    requests = None
 
-try:
-    from bs4 import BeautifulSoup
-    import httpx
-except ImportError:
-    BeautifulSoup = None
-    httpx = None
+async def prewarm_extractors() -> None:
+    """Import all extraction backends in the background"""
+    for names in BACKEND_MODULES.values():
+        await _load(*names)
 
 
 class TextExtractionError(Exception):
@@ -48,57 +84,112 @@ def is_valid_url(url: str) -> bool:
 
 
 def clean_text(text: str) -> str:
-    """Clean extracted text by removing extra whitespace and formatting"""
+    """
+    Clean extracted text by removing extra whitespace and formatting
+    
+    Each non-empty line becomes a paragraph; paragraphs are separated by
+    a blank line so that chunking and filtering can work per paragraph.
+    """
     if not text:
         return ""
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove leading/trailing whitespace
-    text = text.strip()
+    # Collapse whitespace within lines
+    text = re.sub(r'[^\S\n]+', ' ', text)
     
-    # Remove common artifacts
-    text = re.sub(r'\n+', '\n', text)
-    text = re.sub(r'\t+', ' ', text)
-    
-    return text
+    # One paragraph per non-empty line
+    lines = (line.strip() for line in text.split('\n'))
+    return '\n\n'.join(line for line in lines if line)
+
+
+# Containers of the main content, most specific last
+CONTENT_SELECTORS = [
+    'article', 'main', '[role="main"]', '.content', '.post-content',
+    '.entry-content', '.article-content', '.post-body', '.story-body',
+    '.article-body', '.content-body', '#content', '#main-content'
+]
+
+UNWANTED_TAGS = [
+    'script', 'style', 'nav', 'header', 'footer', 'aside', 'menu', 'form', 'button',
+    'input', 'select', 'textarea', 'iframe', 'noscript', 'meta', 'link'
+]
+
+
+def soup_paragraphs(html: bytes) -> List[str]:
+    """
+    Main content lines of a page via a BeautifulSoup tree
 
+    Removes non-content elements, takes the first element matching
+    CONTENT_SELECTORS (or the body) and keeps its lines that look like
+    content.
 
-async def extract_with_trafilatura(url: str) -> Optional[str]:
+    Raises:
+        TextExtractionError: If BeautifulSoup is not installed
+    """
+    bs4 = _import("bs4")
+    if bs4 is None:
+        raise TextExtractionError("BeautifulSoup is not installed")
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    for element in soup(UNWANTED_TAGS):
+        element.decompose()
+
+    main_content = None
+    for selector in CONTENT_SELECTORS:
+        elements = soup.select(selector)
+        if elements:
+            main_content = elements[0]
+            break
+
+    if main_content:
+        text_content = main_content.get_text()
+    else:
+        body = soup.find('body')
+        text_content = body.get_text() if body else soup.get_text()
+
+    cleaned_lines = []
+    for line in text_content.split('\n'):
+        line = line.strip()
+        # Skip empty lines, very short lines, and common non-content
+        if (len(line) > 10 and
+            not line.lower().startswith(NON_CONTENT_PREFIXES) and
+            not re.match(r'^[\s\W]*$', line)):  # Skip lines with only whitespace/symbols
+            cleaned_lines.append(line)
+    return cleaned_lines
+
+
+async def extract_with_trafilatura(page: Page) -> Optional[str]:
     """Extract text using Trafilatura (primary method)"""
-    if not trafilatura:
+    modules = await _load("trafilatura")
+    if not modules:
         return None
+    trafilatura, = modules
     
     try:
-        # Download and extract in a thread pool to avoid blocking
+        # Extract in a thread pool to avoid blocking
         loop = asyncio.get_event_loop()
-        
-        def _extract():
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                return trafilatura.extract(downloaded, include_comments=False)
-            return None
-        
-        text = await loop.run_in_executor(None, _extract)
+        text = await loop.run_in_executor(
+            None, lambda: trafilatura.extract(page.content, url=page.url, include_comments=False)
+        )
         return clean_text(text) if text else None
         
     except Exception as e:
-        print(f"Trafilatura extraction failed: {e}")
+        logger.warning("extractor_error", extractor="Trafilatura", error=str(e))
         return None
 
 
-async def extract_with_newspaper(url: str) -> Optional[str]:
+async def extract_with_newspaper(page: Page) -> Optional[str]:
     """Extract text using Newspaper3k (fallback method)"""
-    if not Article:
+    modules = await _load("newspaper")
+    if not modules:
         return None
+    Article = modules[0].Article
     
     try:
         loop = asyncio.get_event_loop()
         
         def _extract():
-            article = Article(url)
-            article.download()
+            article = Article(page.url)
+            article.download(input_html=page.text)
             article.parse()
             return article.text
         
@@ -106,27 +197,24 @@ async def extract_with_newspaper(url: str) -> Optional[str]:
         return clean_text(text) if text else None
         
     except Exception as e:
-        print(f"Newspaper extraction failed: {e}")
+        logger.warning("extractor_error", extractor="Newspaper3k", error=str(e))
         return None
 
 
-async def extract_with_readability(url: str) -> Optional[str]:
+async def extract_with_readability(page: Page) -> Optional[str]:
     """Extract text using Readability (fallback method)"""
-    if not Document or not requests:
+    modules = await _load("readability", "bs4")
+    if not modules:
         return None
+    readability, bs4 = modules
+    Document = readability.Document
+    BeautifulSoup = bs4.BeautifulSoup
     
     try:
         loop = asyncio.get_event_loop()
+        html = await loop.run_in_executor(None, lambda: Document(page.content).summary())
         
-        def _extract():
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            doc = Document(response.content)
-            return doc.summary()
-        
-        html = await loop.run_in_executor(None, _extract)
-        
-        if html and BeautifulSoup:
+        if html:
             soup = BeautifulSoup(html, 'html.parser')
             text = soup.get_text()
             return clean_text(text)
@@ -134,32 +222,31 @@ async def extract_with_readability(url: str) -> Optional[str]:
         return None
         
     except Exception as e:
-        print(f"Readability extraction failed: {e}")
+        logger.warning("extractor_error", extractor="Readability", error=str(e))
         return None
 
 
-async def extract_with_beautifulsoup(url: str) -> Optional[str]:
+async def extract_with_beautifulsoup(page: Page) -> Optional[str]:
     """Extract text using BeautifulSoup (last resort)"""
-    if not BeautifulSoup or not httpx:
+    modules = await _load("bs4")
+    if not modules:
         return None
+    bs4, = modules
+    BeautifulSoup = bs4.BeautifulSoup
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text
-            text = soup.get_text()
-            return clean_text(text)
+        soup = BeautifulSoup(page.content, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        # Get text
+        text = soup.get_text()
+        return clean_text(text)
             
     except Exception as e:
-        print(f"BeautifulSoup extraction failed: {e}")
+        logger.warning("extractor_error", extractor="BeautifulSoup", error=str(e))
         return None
 
 
@@ -179,6 +266,14 @@ async def extract_text_from_url(url: str) -> str:
     if not is_valid_url(url):
         raise TextExtractionError("Invalid URL provided")
     
+    # The page is downloaded once; every extractor parses the same body
+    check_deadline("fetch")
+    try:
+        with span("fetch"):
+            page = await get_fetcher().get(url)
+    except FetchError as e:
+        raise TextExtractionError(str(e)) from e
+    
     # List of extraction methods in order of preference
     extractors = [
         ("Trafilatura", extract_with_trafilatura),
@@ -190,14 +285,29 @@ async def extract_text_from_url(url: str) -> str:
     last_error = None
     
     for extractor_name, extractor_func in extractors:
+        stage = f"extract-{extractor_name.lower()}"
+        check_deadline(stage)
+        start = time.perf_counter()
         try:
-            text = await extractor_func(url)
+            with span(stage):
+                text = await extractor_func(page)
+            duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            if text and get_settings().boilerplate_filter_enabled:
+                with span("boilerplate"):
+                    text = get_boilerplate_filter().filter_text(text, url)
             if text and len(text.strip()) > 50:  # Minimum viable text length
-                print(f"Successfully extracted text using {extractor_name}")
+                logger.info(
+                    "extract_succeeded", stage=stage, extractor=extractor_name,
+                    chars=len(text), duration_ms=duration_ms, sampled=True
+                )
                 return text
+            logger.info("extract_empty", stage=stage, extractor=extractor_name, duration_ms=duration_ms)
         except Exception as e:
             last_error = e
-            print(f"{extractor_name} failed: {e}")
+            logger.warning(
+                "extract_failed", stage=stage, extractor=extractor_name, error=str(e),
+                duration_ms=round((time.perf_counter() - start) * 1000, 1)
+            )
             continue
     
     # If all methods failed
@@ -208,11 +318,18 @@ async def extract_text_from_url(url: str) -> str:
     raise TextExtractionError(error_msg)
 
 
+def _is_installed(name: str) -> bool:
+    if name in _modules:
+        return _modules[name] is not None
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
 def get_extraction_info() -> Dict[str, Any]:
-    """Get information about available extraction methods"""
+    """Get information about available extraction methods (without importing them)"""
     return {
-        "trafilatura": trafilatura is not None,
-        "newspaper3k": Article is not None,
-        "readability": Document is not None and requests is not None,
-        "beautifulsoup": BeautifulSoup is not None and httpx is not None,
+        backend: all(_is_installed(name) for name in names)
+        for backend, names in BACKEND_MODULES.items()
     }
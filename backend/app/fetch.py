@@ -0,0 +1,387 @@
+"""
+Shared page fetching for the extractors
+One pooled HTTP client with cached DNS and per-host politeness limits
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+import httpcore
+import httpx
+from cachetools import LRUCache, TTLCache
+from app.config import get_settings
+from app.deadline import deadline_sleep, time_left
+from app.logs import get_logger
+
+try:
+    import h2  # noqa: F401 (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+logger = get_logger(__name__)
+
+# Sent with every page request; httpx adds Accept-Encoding for the
+# compressions it can decode (gzip, deflate, and br when brotli is installed)
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+DEFAULT_TIMEOUT_SECONDS = 15.0
+
+# Hosts whose limits are remembered
+MAX_HOSTS = 4096
+
+# Pause after a 429 or 503 without a usable Retry-After, and the longest
+# pause honoured
+DEFAULT_BACKOFF_SECONDS = 10.0
+MAX_BACKOFF_SECONDS = 120.0
+THROTTLE_STATUSES = (429, 503)
+
+
+class FetchError(Exception):
+    """A page could not be fetched"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        self.status = status
+        super().__init__(message)
+
+
+class Page(NamedTuple):
+    """A fetched page body, cut at `max_page_bytes`"""
+    url: str  # After redirects
+    content: bytes
+    encoding: Optional[str]  # Charset from the Content-Type header
+
+    @property
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding or "utf-8", errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+
+class DNSCache:
+    """Resolved addresses of host names, kept for a fixed time"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = MAX_HOSTS):
+        self.entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        """Addresses of a host, in the order the system resolver prefers"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        addresses = self.entries.get(host)
+        if addresses is not None:
+            self.hits += 1
+            return addresses
+        self.misses += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self.entries[host] = addresses
+        return addresses
+
+    def forget(self, host: str) -> None:
+        self.entries.pop(host, None)
+
+
+class _CachedDNSBackend(httpcore.AsyncNetworkBackend):
+    """Network backend connecting to the cached addresses of a host name"""
+
+    def __init__(self, dns: DNSCache):
+        self.dns = dns
+        self.backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        # TLS still verifies and sends the host name: httpcore passes it
+        # to start_tls separately from the connected address
+        try:
+            addresses = await self.dns.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(f"Cannot resolve {host}: {e}") from e
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self.backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        self.dns.forget(host)
+        raise last_error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+# httpcore errors and their httpx counterparts, most specific first
+HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.ProxyError, httpx.ProxyError),
+)
+
+
+@contextmanager
+def _httpx_errors() -> Iterator[None]:
+    """Raise httpcore errors as the httpx errors that callers catch"""
+    try:
+        yield
+    except Exception as e:
+        for error, httpx_error in HTTPCORE_ERRORS:
+            if isinstance(e, error):
+                raise httpx_error(str(e)) from e
+        raise
+
+
+class _PoolStream(httpx.AsyncByteStream):
+    """Body of a pooled response, read with httpx errors"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _httpx_errors():
+            async for part in self.stream:
+                yield part
+
+    async def aclose(self) -> None:
+        if hasattr(self.stream, "aclose"):
+            await self.stream.aclose()
+
+
+class _PooledTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport over an httpcore connection pool
+
+    httpx's own transport does not take a network backend, so the pool
+    that connects through the DNS cache is built here and requests and
+    responses are translated between the two libraries.
+    """
+
+    def __init__(self, pool: httpcore.AsyncConnectionPool):
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PoolStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+class HostLimits:
+    """Requests in flight and spacing of request starts for one host"""
+
+    def __init__(self, concurrency: int, interval: float):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.interval = interval
+        self.next_start = 0.0
+
+    async def wait_turn(self) -> float:
+        """Wait until the host may get another request; returns the wait"""
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + self.interval
+        if start > now:
+            await deadline_sleep(start - now, stage="fetch-wait")
+        return start - now
+
+    def back_off(self, seconds: float) -> None:
+        self.next_start = max(self.next_start, time.monotonic() + seconds)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Fetcher:
+    """
+    Page fetcher shared by every extractor
+
+    All page downloads go through one pooled client: connections are kept
+    alive and reused (over HTTP/2 when `h2` is installed), host names are
+    resolved once per `fetch_dns_ttl_seconds`, and every request carries
+    the same headers and accepts compressed bodies. Each host gets at most
+    `fetch_host_concurrency` requests at a time, started at least
+    `fetch_host_interval_seconds` apart; a 429 or 503 answer pauses the
+    host for its Retry-After. Timeouts are shortened to the current
+    request's deadline.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.dns = DNSCache(settings.fetch_dns_ttl_seconds)
+        self.hosts: LRUCache = LRUCache(MAX_HOSTS)
+        self.counts: Counter = Counter()
+        self.waited = 0.0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            settings = get_settings()
+            pool = httpcore.AsyncConnectionPool(
+                ssl_context=httpx.create_ssl_context(),
+                max_connections=settings.fetch_max_connections,
+                max_keepalive_connections=settings.fetch_max_connections,
+                keepalive_expiry=settings.fetch_keepalive_seconds,
+                http2=HTTP2_AVAILABLE,
+                network_backend=_CachedDNSBackend(self.dns)
+            )
+            self._client = httpx.AsyncClient(
+                transport=_PooledTransport(pool),
+                headers=REQUEST_HEADERS,
+                follow_redirects=True,
+                max_redirects=settings.fetch_max_redirects,
+                timeout=DEFAULT_TIMEOUT_SECONDS
+            )
+            self._loop = loop
+            self.hosts.clear()  # Their semaphores belong to the old loop
+        return self._client
+
+    def _limits(self, host: str) -> HostLimits:
+        limits = self.hosts.get(host)
+        if limits is None:
+            settings = get_settings()
+            limits = self.hosts[host] = HostLimits(
+                settings.fetch_host_concurrency, settings.fetch_host_interval_seconds
+            )
+        return limits
+
+    @asynccontextmanager
+    async def stream(self, url: str, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> AsyncIterator[httpx.Response]:
+        """
+        Response of a GET request, for reading its body as it arrives
+
+        The host's concurrency slot is held until the body has been read.
+
+        Raises:
+            FetchError: If the request fails or answers with an error status
+            DeadlineExceeded: If the host's turn comes after the deadline
+        """
+        client = self.client()
+        try:
+            host = httpx.URL(url).host
+        except httpx.InvalidURL as e:
+            raise FetchError(f"Invalid URL {url}: {e}") from e
+        limits = self._limits(host)
+        async with limits.semaphore:
+            waited = await limits.wait_turn()
+            if waited:
+                self.counts["host_waits"] += 1
+                self.waited += waited
+            self.counts["requests"] += 1
+            try:
+                async with client.stream("GET", url, timeout=time_left(timeout)) as response:
+                    if response.status_code in THROTTLE_STATUSES:
+                        pause = retry_after_seconds(response.headers.get("Retry-After"))
+                        limits.back_off(min(pause if pause is not None else DEFAULT_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS))
+                        self.counts["throttled"] += 1
+                        logger.warning("fetch_throttled", host=host, status=response.status_code)
+                    response.raise_for_status()
+                    yield response
+            except httpx.HTTPStatusError as e:
+                self.counts["failed"] += 1
+                raise FetchError(f"Failed to fetch {url}: HTTP {e.response.status_code}", e.response.status_code) from e
+            except httpx.HTTPError as e:
+                self.counts["failed"] += 1
+                raise FetchError(f"Failed to fetch {url}: {e}") from e
+
+    async def get(self, url: str, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> Page:
+        """
+        Fetch a page body of at most `max_page_bytes`
+
+        Raises:
+            FetchError: If the request fails or answers with an error status
+        """
+        max_bytes = get_settings().max_page_bytes
+        async with self.stream(url, timeout) as response:
+            body = bytearray()
+            async for block in response.aiter_bytes():
+                body += block
+                if len(body) >= max_bytes:
+                    break
+            return Page(str(response.url), bytes(body[:max_bytes]), response.charset_encoding)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": HTTP2_AVAILABLE,
+            **self.counts,
+            "host_wait_seconds": round(self.waited, 2),
+            "hosts": len(self.hosts),
+            "dns_hits": self.dns.hits,
+            "dns_misses": self.dns.misses,
+        }
+
+
+_fetcher: Optional[Fetcher] = None
+
+
+def get_fetcher() -> Fetcher:
+    """Get the global page fetcher"""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = Fetcher()
+    return _fetcher
@@ -1,29 +1,38 @@
 """
-Content generation utilities and prompt templates
+Content generation utilities
 Handles AI-powered content generation with different modes
 """
 
 import re
-from typing import List, Tuple, Dict, Any
-from app.hf import get_hf_client, HuggingFaceError
+import asyncio
+from collections import OrderedDict
+from typing import AsyncGenerator, List, Optional, Tuple, Dict
+from app.hf import HuggingFaceError
+from app.backends import get_summarize_backend, get_generate_backend
 from app.config import get_settings
-
-try:
-    from langdetect import detect
-except ImportError:
-    detect = None
-
-
-def detect_language(text: str) -> str:
-    """Detect language of input text"""
-    if not detect or not text.strip():
-        return "en"  # Default to English
-    
-    try:
-        detected = detect(text[:1000])  # Use first 1000 chars for detection
-        return detected if detected in ["en", "tr"] else "en"
-    except Exception:
-        return "en"
+from app.deadline import check_deadline
+from app.tokens import TokenUsage, count_tokens
+from app.langid import detect_language
+from app.prompts import SUMMARY_PROMPT, YOUTUBE_PROMPT, SHORTS_PROMPT
+from app.routing import ModelRoute, get_routing_policy
+from app.condense import condense_budget, condense_for_mode
+from app.hashing import content_digest
+from app.tracing import span
+
+
+# Output token budget of the final generation call for each mode
+MAX_NEW_TOKENS = {
+    "summary": 400,
+    "youtube": 800,
+    "shorts": 300,
+}
+
+# Maximum summary length for each chunk in the map stage
+CHUNK_SUMMARY_LENGTH = {
+    "summary": 150,
+    "youtube": 100,
+    "shorts": 80,
+}
 
 
 def chunk_text(text: str, max_chunk_size: int = 4000) -> List[str]:
@@ -75,270 +84,228 @@ def chunk_text(text: str, max_chunk_size: int = 4000) -> List[str]:
 
 def get_summary_prompt(text: str, tone: str, length: str, lang: str) -> str:
     """Generate prompt for summarization"""
-    
-    # Tone instructions
-    tone_instructions = {
-        "neutral": "in a clear and objective manner",
-        "energetic": "in an engaging and enthusiastic tone",
-        "academic": "in a formal and scholarly manner"
-    }
-    
-    # Length instructions
-    length_instructions = {
-        "short": "Create a concise summary with 3-5 bullet points and a brief paragraph.",
-        "medium": "Create a comprehensive summary with 5-8 bullet points and 1-2 paragraphs.",
-        "long": "Create a detailed summary with 8-12 bullet points and 2-3 paragraphs."
-    }
-    
-    # Language instructions
-    lang_instructions = {
-        "en": "Respond in English.",
-        "tr": "Türkçe olarak yanıtlayın.",
-        "auto": "Respond in the same language as the input text."
-    }
-    
-    prompt = f"""
-Please summarize the following text {tone_instructions.get(tone, 'clearly')}.
-
-{length_instructions.get(length, 'Create a summary')}
-
-{lang_instructions.get(lang, 'Respond in English.')}
-
-Format your response as:
-• Bullet point 1
-• Bullet point 2
-• Bullet point 3
-[Additional bullet points as needed]
-
-Summary paragraph providing key insights and main takeaways.
-
-Text to summarize:
-{text}
-
-Summary:"""
-    
-    return prompt.strip()
+    return SUMMARY_PROMPT.render(text, tone=tone, length=length, lang=lang)
 
 
 def get_youtube_prompt(text: str, tone: str, length: str, lang: str) -> str:
     """Generate prompt for YouTube script creation"""
-    
-    # Tone instructions
-    tone_instructions = {
-        "neutral": "professional and informative",
-        "energetic": "enthusiastic and engaging",
-        "academic": "educational and authoritative"
-    }
-    
-    # Length instructions
-    length_instructions = {
-        "short": "a 5-7 minute video script",
-        "medium": "an 8-12 minute video script", 
-        "long": "a 12-18 minute video script"
-    }
-    
-    # Language instructions
-    lang_instructions = {
-        "en": "Write the script in English.",
-        "tr": "Senaryoyu Türkçe yazın.",
-        "auto": "Write the script in the same language as the input text."
-    }
-    
-    prompt = f"""
-Create {length_instructions.get(length, 'a video script')} based on the following content. 
-Use a {tone_instructions.get(tone, 'professional')} tone throughout.
-
-{lang_instructions.get(lang, 'Write the script in English.')}
-
-Structure the script with these sections:
-1. HOOK (0-15 seconds): Attention-grabbing opening
-2. INTRO (15-45 seconds): Brief overview and what viewers will learn
-3. MAIN CONTENT (Sections 1-3): Core information broken into digestible segments
-4. OUTRO & CTA (Last 30 seconds): Summary and call-to-action
-5. B-ROLL SUGGESTIONS: Visual elements to accompany the script
-
-Include natural transitions, engagement cues, and speaking directions in [brackets].
-
-Source content:
-{text}
-
-YouTube Script:"""
-    
-    return prompt.strip()
+    return YOUTUBE_PROMPT.render(text, tone=tone, length=length, lang=lang)
 
 
 def get_shorts_prompt(text: str, tone: str, length: str, lang: str) -> str:
     """Generate prompt for YouTube Shorts script creation"""
-    
-    # Tone instructions
-    tone_instructions = {
-        "neutral": "clear and direct",
-        "energetic": "exciting and punchy",
-        "academic": "informative yet concise"
-    }
-    
-    # Language instructions
-    lang_instructions = {
-        "en": "Write the script in English.",
-        "tr": "Senaryoyu Türkçe yazın.",
-        "auto": "Write the script in the same language as the input text."
-    }
-    
-    prompt = f"""
-Create a YouTube Shorts script (30-60 seconds) based on the following content.
-Use a {tone_instructions.get(tone, 'engaging')} tone that's perfect for short-form content.
+    return SHORTS_PROMPT.render(text, tone=tone, length=length, lang=lang)
 
-{lang_instructions.get(lang, 'Write the script in English.')}
 
-Structure:
-• HOOK (0-3 seconds): Immediate attention grabber
-• 3 KEY POINTS (3-4 seconds each): Main insights in punchy format
-• CTA (Last 5 seconds): Strong call-to-action
+# Prompt builder and sampling temperature of the final generation call
+FINAL_PROMPTS = {
+    "summary": (get_summary_prompt, 0.3),
+    "youtube": (get_youtube_prompt, 0.7),
+    "shorts": (get_shorts_prompt, 0.8),
+}
 
-Requirements:
-- Total length: 30-60 seconds when spoken
-- Each point should be impactful and memorable
-- Use numbers, statistics, or surprising facts when possible
-- Include visual cues in [brackets]
-- End with engaging question or action
 
-Source content:
-{text}
+ChunkKey = Tuple[str, str, str]
 
-YouTube Shorts Script:"""
-    
-    return prompt.strip()
 
+class ChunkSummaryCache:
+    """
+    Map-stage results by chunk, mode and summarization model
+
+    Chunk summaries do not depend on tone, length or language, so any
+    later generation that maps the same chunk reuses them, including
+    summaries computed speculatively before their generation was
+    requested. Calls in flight are shared: a chunk that is already being
+    summarized is waited for instead of summarized twice. Speculative
+    summaries evicted before any generation read them are counted as
+    wasted.
+    """
 
-async def generate_summary(text: str, tone: str, length: str, lang: str) -> Tuple[str, int]:
-    """Generate summary using AI"""
-    settings = get_settings()
-    
-    # Auto-detect language if needed
-    if lang == "auto":
-        lang = detect_language(text)
-    
-    # Check if text needs chunking
-    if len(text) > settings.max_chunk_size:
-        chunks = chunk_text(text, settings.max_chunk_size)
-        summaries = []
-        total_tokens = 0
-        
-        hf_client = get_hf_client()
-        
-        # Summarize each chunk
-        for chunk in chunks:
-            try:
-                chunk_summary = await hf_client.summarize(
-                    chunk, 
-                    max_length=150,
-                    min_length=30
-                )
-                summaries.append(chunk_summary)
-                total_tokens += len(chunk.split()) // 4  # Rough token estimate
-            except HuggingFaceError:
-                # If HF summarization fails, use generation model
-                prompt = get_summary_prompt(chunk, tone, "short", lang)
-                chunk_summary = await hf_client.generate_text(
-                    prompt, 
-                    max_new_tokens=200,
-                    temperature=0.3
-                )
-                summaries.append(chunk_summary)
-                total_tokens += len(prompt.split()) // 4
-        
-        # Combine summaries and create final summary
-        combined_text = "\n\n".join(summaries)
-        final_prompt = get_summary_prompt(combined_text, tone, length, lang)
-        
-        final_summary = await hf_client.generate_text(
-            final_prompt,
-            max_new_tokens=400,
-            temperature=0.3
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[ChunkKey, Tuple[str, bool]]" = OrderedDict()  # Summary, unused speculation
+        self.pending: Dict[ChunkKey, asyncio.Event] = {}
+        self.hits = 0
+        self.speculative_used = 0
+        self.speculative_wasted = 0
+
+    @staticmethod
+    def key(chunk: str, mode: str, route: ModelRoute) -> ChunkKey:
+        return content_digest(chunk), mode, route.sum_model or ""
+
+    def __contains__(self, key: ChunkKey) -> bool:
+        return key in self.entries or key in self.pending
+
+    async def get(self, key: ChunkKey) -> Optional[str]:
+        """Summary of a chunk, waiting for it if it is being computed"""
+        pending = self.pending.get(key)
+        if pending is not None:
+            await pending.wait()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        summary, unused = entry
+        self.entries[key] = (summary, False)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.speculative_used += unused
+        return summary
+
+    def begin(self, key: ChunkKey) -> asyncio.Event:
+        """Mark a chunk as being summarized"""
+        event = self.pending[key] = asyncio.Event()
+        return event
+
+    def end(self, key: ChunkKey, event: asyncio.Event) -> None:
+        """Release the callers waiting for a chunk, whether it succeeded or not"""
+        if self.pending.get(key) is event:
+            del self.pending[key]
+        event.set()
+
+    def put(self, key: ChunkKey, summary: str, speculative: bool = False) -> None:
+        self.entries[key] = (summary, speculative)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            _, (_, unused) = self.entries.popitem(last=False)
+            self.speculative_wasted += unused
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "speculative_used": self.speculative_used,
+            "speculative_unused": sum(unused for _, unused in self.entries.values()),
+            "speculative_wasted": self.speculative_wasted,
+        }
+
+
+_chunk_summaries: Optional[ChunkSummaryCache] = None
+
+
+def get_chunk_summary_cache() -> ChunkSummaryCache:
+    """Get the global chunk summary cache"""
+    global _chunk_summaries
+    if _chunk_summaries is None:
+        _chunk_summaries = ChunkSummaryCache(get_settings().chunk_summary_cache_size)
+    return _chunk_summaries
+
+
+async def summarize_chunk(
+    chunk: str, mode: str, tone: str, lang: str, route: ModelRoute, usage: TokenUsage,
+    speculative: bool = False
+) -> str:
+    """
+    Map stage: summarize one chunk of a long input
+
+    Summaries go through the chunk summary cache; a cached summary adds
+    nothing to `usage`, since no tokens were spent on it for this call.
+    Speculative calls, made before any generation asked for the chunk,
+    do not fall back to the generation model, whose summaries are not
+    cached.
+    """
+    check_deadline("map")
+    summaries = get_chunk_summary_cache()
+    key = ChunkSummaryCache.key(chunk, mode, route)
+    cached = await summaries.get(key)
+    if cached is not None:
+        return cached
+
+    summarizer = get_summarize_backend()
+    pending = summaries.begin(key)
+    try:
+        with span("map"):
+            chunk_summary = await summarizer.summarize(
+                chunk,
+                max_length=CHUNK_SUMMARY_LENGTH[mode],
+                min_length=30 if mode == "summary" else None,
+                model=route.sum_model
+            )
+        usage.record(summarizer.model_name(route.sum_model), chunk, chunk_summary)
+        summaries.put(key, chunk_summary, speculative)
+        return chunk_summary
+    except HuggingFaceError:
+        if mode != "summary" or speculative:
+            raise
+    finally:
+        summaries.end(key, pending)
+
+    # If HF summarization fails, use generation model
+    generator = get_generate_backend()
+    prompt = get_summary_prompt(chunk, tone, "short", lang)
+    with span("map"):
+        chunk_summary = await generator.generate(
+            prompt,
+            max_new_tokens=200,
+            temperature=0.3,
+            model=route.gen_model
         )
-        
-        return final_summary, total_tokens
+    usage.record(generator.model_name(route.gen_model), prompt, chunk_summary)
+    return chunk_summary
+
+
+async def generate_final(
+    text: str, mode: str, tone: str, length: str, lang: str, route: ModelRoute, usage: TokenUsage
+) -> str:
+    """Final generation call over the input or its combined chunk summaries"""
+    check_deadline("generate")
+    generator = get_generate_backend()
+    build_prompt, temperature = FINAL_PROMPTS[mode]
+    prompt = build_prompt(text, tone, length, lang)
     
-    else:
-        # Direct summarization for shorter texts
-        hf_client = get_hf_client()
-        prompt = get_summary_prompt(text, tone, length, lang)
-        
-        summary = await hf_client.generate_text(
+    with span("generate"):
+        output = await generator.generate(
             prompt,
-            max_new_tokens=400,
-            temperature=0.3
+            max_new_tokens=MAX_NEW_TOKENS[mode],
+            temperature=temperature,
+            model=route.gen_model
         )
-        
-        tokens = len(prompt.split()) // 4  # Rough estimate
-        return summary, tokens
+    usage.record(generator.model_name(route.gen_model), prompt, output)
+    return output
 
 
-async def generate_youtube_script(text: str, tone: str, length: str, lang: str) -> Tuple[str, int]:
-    """Generate YouTube script using AI"""
+async def _generate(
+    text: str, mode: str, tone: str, length: str, lang: str, route: ModelRoute
+) -> Tuple[str, TokenUsage]:
     settings = get_settings()
+    usage = TokenUsage()
     
     # Auto-detect language if needed
     if lang == "auto":
-        lang = detect_language(text)
+        with span("langdetect"):
+            lang = detect_language(text)
     
-    hf_client = get_hf_client()
-    
-    # Chunk if necessary
+    # Long inputs are summarized chunk by chunk first
     if len(text) > settings.max_chunk_size:
-        chunks = chunk_text(text, settings.max_chunk_size)
-        # For scripts, we'll summarize chunks first, then create script
+        with span("chunk"):
+            chunks = chunk_text(text, settings.max_chunk_size)
         summaries = []
-        
         for chunk in chunks:
-            chunk_summary = await hf_client.summarize(chunk, max_length=100)
-            summaries.append(chunk_summary)
-        
+            summaries.append(await summarize_chunk(chunk, mode, tone, lang, route, usage))
         text = "\n\n".join(summaries)
     
-    prompt = get_youtube_prompt(text, tone, length, lang)
-    
-    script = await hf_client.generate_text(
-        prompt,
-        max_new_tokens=800,
-        temperature=0.7
-    )
-    
-    tokens = len(prompt.split()) // 4
-    return script, tokens
+    output = await generate_final(text, mode, tone, length, lang, route, usage)
+    return output, usage
+
+
+async def generate_summary(
+    text: str, tone: str, length: str, lang: str, route: ModelRoute
+) -> Tuple[str, TokenUsage]:
+    """Generate summary using AI"""
+    return await _generate(text, "summary", tone, length, lang, route)
+
+
+async def generate_youtube_script(
+    text: str, tone: str, length: str, lang: str, route: ModelRoute
+) -> Tuple[str, TokenUsage]:
+    """Generate YouTube script using AI"""
+    return await _generate(text, "youtube", tone, length, lang, route)
 
 
-async def generate_shorts_script(text: str, tone: str, length: str, lang: str) -> Tuple[str, int]:
+async def generate_shorts_script(
+    text: str, tone: str, length: str, lang: str, route: ModelRoute
+) -> Tuple[str, TokenUsage]:
     """Generate YouTube Shorts script using AI"""
-    settings = get_settings()
-    
-    # Auto-detect language if needed
-    if lang == "auto":
-        lang = detect_language(text)
-    
-    hf_client = get_hf_client()
-    
-    # Chunk if necessary and summarize
-    if len(text) > settings.max_chunk_size:
-        chunks = chunk_text(text, settings.max_chunk_size)
-        summaries = []
-        
-        for chunk in chunks:
-            chunk_summary = await hf_client.summarize(chunk, max_length=80)
-            summaries.append(chunk_summary)
-        
-        text = "\n\n".join(summaries)
-    
-    prompt = get_shorts_prompt(text, tone, length, lang)
-    
-    script = await hf_client.generate_text(
-        prompt,
-        max_new_tokens=300,
-        temperature=0.8
-    )
-    
-    tokens = len(prompt.split()) // 4
-    return script, tokens
+    return await _generate(text, "shorts", tone, length, lang, route)
 
 
 async def generate_content(
@@ -346,8 +313,9 @@ async def generate_content(
     mode: str, 
     tone: str, 
     length: str, 
-    lang: str
-) -> Tuple[str, int]:
+    lang: str,
+    route: Optional[ModelRoute] = None
+) -> Tuple[str, TokenUsage]:
     """
     Main content generation function
     
@@ -357,15 +325,118 @@ async def generate_content(
         tone: Content tone (neutral, energetic, academic)
         length: Content length (short, medium, long)
         lang: Language (auto, en, tr)
+        route: Models to use; chosen by the routing policy if omitted
         
     Returns:
-        Tuple of (generated_content, estimated_tokens)
+        Tuple of (generated_content, token_usage)
     """
+    if route is None:
+        route = get_routing_policy().route(mode, length, len(text))
+    
+    with span("condense"):
+        text = condense_for_mode(text, mode, route.gen_model)
+    
     if mode == "summary":
-        return await generate_summary(text, tone, length, lang)
+        return await generate_summary(text, tone, length, lang, route)
     elif mode == "youtube":
-        return await generate_youtube_script(text, tone, length, lang)
+        return await generate_youtube_script(text, tone, length, lang, route)
     elif mode == "shorts":
-        return await generate_shorts_script(text, tone, length, lang)
+        return await generate_shorts_script(text, tone, length, lang, route)
     else:
         raise ValueError(f"Unsupported mode: {mode}")
+
+
+async def generate_content_streamed(
+    chunks: AsyncGenerator[str, None],
+    mode: str,
+    tone: str,
+    length: str,
+    lang: str,
+    route: ModelRoute,
+    usage: Optional[TokenUsage] = None
+) -> Tuple[str, TokenUsage]:
+    """
+    Generate content from chunks that are still being produced
+
+    The map stage starts on each chunk as soon as it arrives (up to
+    `map_concurrency` at a time), so summarization overlaps the download
+    and parsing of the rest of the input. An input that fits in a single
+    chunk goes through `generate_content` like any text input.
+
+    Text inputs are condensed to the mode's budget before their map stage,
+    which the whole input is needed for. Here chunks are mapped only until
+    their input reaches that budget; later chunks skip the map stage and
+    are condensed together with the summaries of the earlier ones, so a
+    page costs about as many calls as a text of the same length.
+    
+    Args:
+        chunks: Chunks of at most `max_chunk_size` characters, in input order
+        mode: Generation mode (summary, youtube, shorts)
+        tone: Content tone (neutral, energetic, academic)
+        length: Content length (short, medium, long)
+        lang: Language (auto, en, tr)
+        route: Models to use
+        usage: Token usage to add to; its calls show what a failed stream
+            has already spent
+        
+    Returns:
+        Tuple of (generated_content, token_usage)
+        
+    Raises:
+        ValueError: If the stream yields no text
+    """
+    if mode not in FINAL_PROMPTS:
+        raise ValueError(f"Unsupported mode: {mode}")
+    
+    usage = usage if usage is not None else TokenUsage()
+    semaphore = asyncio.Semaphore(max(1, get_settings().map_concurrency))
+    map_budget = condense_budget(mode)
+    mapped_tokens = 0
+    unmapped: List[str] = []
+    
+    async def _map(chunk: str) -> str:
+        async with semaphore:
+            return await summarize_chunk(chunk, mode, tone, lang, route, usage)
+    
+    def _start(chunk: str) -> None:
+        nonlocal mapped_tokens
+        if map_budget is not None and mapped_tokens >= map_budget:
+            unmapped.append(chunk)
+            return
+        mapped_tokens += count_tokens(chunk, route.gen_model)
+        tasks.append(asyncio.create_task(_map(chunk)))
+    
+    first: Optional[str] = None
+    tasks: List[asyncio.Task] = []
+    try:
+        async for chunk in chunks:
+            if first is None:
+                # Held back until a second chunk shows that mapping is needed
+                first = chunk
+                continue
+            if not tasks:
+                if lang == "auto":
+                    with span("langdetect"):
+                        lang = detect_language(first)
+                _start(first)
+            _start(chunk)
+        
+        if first is None:
+            raise ValueError("No text found in input")
+        if not tasks:
+            output, single_usage = await generate_content(first, mode, tone, length, lang, route)
+            usage.add(single_usage)
+            return output, usage
+        
+        summaries = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await chunks.aclose()
+    
+    text = "\n\n".join([*summaries, *unmapped])
+    with span("condense"):
+        text = condense_for_mode(text, mode, route.gen_model)
+    
+    output = await generate_final(text, mode, tone, length, lang, route, usage)
+    return output, usage
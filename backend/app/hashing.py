@@ -0,0 +1,16 @@
+"""
+Content hashing utilities
+Stable digests for caching and deduplication across processes
+"""
+
+import hashlib
+
+
+def content_digest(text: str) -> str:
+    """
+    Stable hex digest of text content
+
+    Unlike the builtin `hash()`, the digest does not change between
+    processes, so it can be used in shared or persisted cache keys.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
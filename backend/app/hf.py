@@ -3,11 +3,17 @@ Hugging Face API client for AI model inference
 Handles communication with Hugging Face Inference API
 """
 
-import asyncio
 import json
+import time
 from typing import Any, Dict, Optional, Union
 import httpx
 from app.config import get_settings
+from app.deadline import DeadlineExceeded, check_deadline, deadline_sleep, time_left
+from app.logs import get_logger
+from app.tracing import span
+
+
+logger = get_logger(__name__)
 
 
 class HuggingFaceError(Exception):
@@ -48,33 +54,50 @@ class HuggingFaceClient:
             
         Raises:
             HuggingFaceError: If API request fails after retries
+            DeadlineExceeded: If the request's deadline passes first
         """
         url = f"{self.base_url}/{model}"
         
         for attempt in range(max_retries + 1):
+            check_deadline("hf")
             try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(
-                        url,
-                        headers=self.headers,
-                        json=payload
-                    )
+                # Attempts and retry waits never run past the request deadline
+                async with httpx.AsyncClient(timeout=time_left(self.timeout.read)) as client:
+                    start = time.perf_counter()
+                    with span("hf"):
+                        response = await client.post(
+                            url,
+                            headers=self.headers,
+                            json=payload
+                        )
+                    duration_ms = round((time.perf_counter() - start) * 1000, 1)
                     
                     if response.status_code == 200:
+                        logger.info(
+                            "hf_call", stage="hf", model=model, attempt=attempt,
+                            status=200, duration_ms=duration_ms, sampled=True
+                        )
                         return response.json()
                     
-                    elif response.status_code == 503:
+                    logger.warning(
+                        "hf_call", stage="hf", model=model, attempt=attempt,
+                        status=response.status_code, duration_ms=duration_ms
+                    )
+                    
+                    if response.status_code == 503:
                         # Model is loading, wait and retry
                         error_data = response.json()
                         if "loading" in str(error_data).lower():
                             wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
-                            await asyncio.sleep(wait_time)
+                            with span("hf-retry-wait"):
+                                await deadline_sleep(wait_time)
                             continue
                     
                     elif response.status_code == 429:
                         # Rate limited, wait and retry
                         wait_time = retry_delay * (2 ** attempt)
-                        await asyncio.sleep(wait_time)
+                        with span("hf-retry-wait"):
+                            await deadline_sleep(wait_time)
                         continue
                     
                     # Other error codes
@@ -83,14 +106,19 @@ class HuggingFaceClient:
                     raise HuggingFaceError(f"API request failed: {error_message}")
                     
             except httpx.TimeoutException:
+                logger.warning("hf_timeout", stage="hf", model=model, attempt=attempt)
+                check_deadline("hf")  # Timed out because the deadline cut the attempt short
                 if attempt < max_retries:
-                    await asyncio.sleep(retry_delay * (2 ** attempt))
+                    with span("hf-retry-wait"):
+                        await deadline_sleep(retry_delay * (2 ** attempt))
                     continue
                 raise HuggingFaceError("Request timed out after multiple attempts")
             
             except httpx.RequestError as e:
+                logger.warning("hf_network_error", stage="hf", model=model, attempt=attempt, error=str(e))
                 if attempt < max_retries:
-                    await asyncio.sleep(retry_delay * (2 ** attempt))
+                    with span("hf-retry-wait"):
+                        await deadline_sleep(retry_delay * (2 ** attempt))
                     continue
                 raise HuggingFaceError(f"Network error: {str(e)}")
         
@@ -100,7 +128,8 @@ class HuggingFaceClient:
         self, 
         text: str, 
         max_length: Optional[int] = None,
-        min_length: Optional[int] = None
+        min_length: Optional[int] = None,
+        model: Optional[str] = None
     ) -> str:
         """
         Summarize text using the configured summarization model
@@ -109,6 +138,7 @@ class HuggingFaceClient:
             text: Input text to summarize
             max_length: Maximum length of summary
             min_length: Minimum length of summary
+            model: Model to use instead of the configured one
             
         Returns:
             Generated summary text
@@ -124,13 +154,15 @@ class HuggingFaceClient:
             payload["parameters"]["min_length"] = min_length
         
         try:
-            response = await self.infer(self.settings.sum_model, payload)
+            response = await self.infer(model or self.settings.sum_model, payload)
             
             if isinstance(response, list) and len(response) > 0:
                 return response[0].get("summary_text", "")
             
             return response.get("summary_text", "")
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise HuggingFaceError(f"Summarization failed: {str(e)}")
     
@@ -139,7 +171,8 @@ class HuggingFaceClient:
         prompt: str, 
         max_new_tokens: int = 512,
         temperature: float = 0.7,
-        top_p: float = 0.9
+        top_p: float = 0.9,
+        model: Optional[str] = None
     ) -> str:
         """
         Generate text using the configured generation model
@@ -149,6 +182,7 @@ class HuggingFaceClient:
             max_new_tokens: Maximum number of tokens to generate
             temperature: Sampling temperature (0.0 to 1.0)
             top_p: Nucleus sampling parameter
+            model: Model to use instead of the configured one
             
         Returns:
             Generated text
@@ -165,13 +199,15 @@ class HuggingFaceClient:
         }
         
         try:
-            response = await self.infer(self.settings.gen_model, payload)
+            response = await self.infer(model or self.settings.gen_model, payload)
             
             if isinstance(response, list) and len(response) > 0:
                 return response[0].get("generated_text", "").strip()
             
             return response.get("generated_text", "").strip()
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise HuggingFaceError(f"Text generation failed: {str(e)}")
 
@@ -0,0 +1,150 @@
+"""
+Structured logging for Creator Transformer backend
+structlog events rendered and written by a background thread
+"""
+
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import structlog
+from app.config import get_settings
+from app.tracing import current_trace
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them
+
+    Rendering happens on the listener thread. When the queue is full the
+    record is dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def add_request_context(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the ID of the request being handled"""
+    trace = current_trace()
+    if trace is not None:
+        event_dict.setdefault("request_id", trace.request_id)
+    return event_dict
+
+
+def sample_success(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop a share of high-volume success events
+
+    Events logged with `sampled=True` are kept at the configured
+    success sample rate; everything else is always kept.
+    """
+    if event_dict.pop("sampled", False):
+        rate = get_settings().log_success_sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+    return event_dict
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """
+    Route structlog and stdlib logging through a queue to stdout
+
+    Safe to call more than once; only the first call has an effect.
+    """
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    settings = get_settings()
+    level = logging.getLevelName(settings.log_level.upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    shared_processors = [
+        structlog.contextvars.merge_contextvars,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        add_request_context,
+        structlog.processors.TimeStamper(fmt="iso"),
+    ]
+
+    if settings.log_format == "console":
+        renderer = structlog.dev.ConsoleRenderer(colors=False)
+    else:
+        renderer = structlog.processors.JSONRenderer()
+
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            sample_success,
+            *shared_processors,
+            # Tracebacks must be captured on the calling thread
+            structlog.processors.format_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+    # Records from plain logging (uvicorn, httpx, ...) get the same treatment
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=shared_processors,
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            renderer,
+        ],
+    )
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+
+def dropped_records() -> int:
+    """Number of records dropped because the log queue was full"""
+    return _handler.dropped if _handler is not None else 0
+
+
+def get_logger(name: str):
+    """Get a structured logger"""
+    return structlog.get_logger(name)
@@ -3,65 +3,163 @@ Creator Transformer Backend - FastAPI Application
 Main application file with API endpoints and middleware configuration
 """
 
+import asyncio
+import logging
+import secrets
 import time
 from contextlib import asynccontextmanager
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 import uvicorn
-from fastapi import FastAPI, HTTPException, Depends, Form, Request
+from fastapi import FastAPI, HTTPException, Depends, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, validator
-from cachetools import TTLCache
+from pydantic import BaseModel, ConfigDict, Field, validator
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 # Local imports
 from app.config import get_settings, configure_for_environment
-from app.extractors import extract_text_from_url, TextExtractionError, get_extraction_info
-from app.generator import generate_content
+from app.cache import CompressedCache
+from app.deadline import DeadlineExceeded, DeadlineMiddleware, get_cancellation_stats, without_deadline
+from app.extractors import (
+    extract_text_from_url, TextExtractionError, get_extraction_info, prewarm_extractors
+)
+from app.fetch import get_fetcher
+from app.generator import generate_content, generate_content_streamed
+from app.pipeline import record_paragraphs, stream_paragraphs, stream_chunks
 from app.hf import get_hf_client, HuggingFaceError, test_models
+from app.ratelimit import (
+    get_cost_limiter, estimate_generation_cost, estimate_url_generation_cost, BudgetExceededError
+)
+from app.langid import get_language_classifier
+from app.prompts import get_template
+from app.routing import ModelRoute, get_routing_policy
+from app.prewarm import PopularityTracker, PrewarmScheduler, Variant
+from app.speculate import Speculator
+from app.content import get_content_store
+from app.recording import TrafficRecorder, TrafficRecordingMiddleware
+from app.tokens import TokenUsage
+from app.similarity import NearDuplicateIndex
+from app.tracing import start_trace, current_trace, Trace, TraceWriter, SamplingProfiler
+from app.hashing import content_digest
+from app.logs import configure_logging, shutdown_logging, dropped_records, get_logger
 
 
 # Initialize settings and configuration
 configure_for_environment()
 settings = get_settings()
+configure_logging()
+logger = get_logger(__name__)
 
 # Initialize cache
-cache = TTLCache(
-    maxsize=settings.cache_max_size,
-    ttl=settings.cache_ttl_seconds
+cache = CompressedCache(
+    max_bytes=settings.cache_max_bytes,
+    ttl=settings.cache_ttl_seconds,
+    compress_min_bytes=settings.cache_compress_min_bytes,
+    training_samples=settings.cache_dictionary_samples,
+    policy=settings.cache_policy,
+    window_share=settings.cache_window_share
+)
+
+# Index of cached generation inputs for near-duplicate matching
+near_duplicates = NearDuplicateIndex(
+    threshold=settings.near_duplicate_threshold,
+    min_words=settings.near_duplicate_min_words,
+    max_entries=settings.cache_max_size
 )
 
-# Initialize rate limiter
+# Requested sources and variants, for cache prewarming
+popularity = PopularityTracker()
+
+# Extracted texts that /generate accepts by content_id
+content_store = get_content_store()
+
+# Request tracing and on-demand profiling
+trace_writer = TraceWriter(settings.trace_file, settings.trace_file_max_bytes) if settings.trace_file else None
+traffic_recorder = (
+    TrafficRecorder(settings.traffic_record_file, settings.traffic_record_max_bytes)
+    if settings.traffic_record_file else None
+)
+profiler = SamplingProfiler(settings.profile_dir)
+
+# Initialize rate limiters
 limiter = Limiter(key_func=get_remote_address)
+cost_limiter = get_cost_limiter()
+
+# Last model probe result; probes run in the background, never on the
+# request or startup path
+model_status: Dict[str, Any] = {"models": {}, "checked_at": 0.0}
+background_tasks: Dict[str, asyncio.Task] = {}
+
+# Requests currently being served; background prewarming waits for zero
+# and speculation backs off above a threshold
+active_requests = 0
+
+
+async def probe_models():
+    """Check model availability and remember the result"""
+    try:
+        models = await test_models()
+        logger.info("model_status", models=models)
+    except Exception as e:
+        logger.warning("model_probe_failed", error=str(e))
+        models = {"summarization": False, "generation": False}
+    
+    model_status["models"] = models
+    model_status["checked_at"] = time.time()
+
+
+def start_background_task(name: str, coro) -> None:
+    """Start a named background task unless one is already running"""
+    task = background_tasks.get(name)
+    if task is not None and not task.done():
+        coro.close()
+        return
+    background_tasks[name] = asyncio.create_task(without_deadline(coro))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
-    print("🚀 Starting Creator Transformer Backend...")
+    logger.info("startup")
     
-    # Test HF API connection if token is provided
+    # Build the language classifier before the first request needs it
+    get_language_classifier()
+    
+    # Results of earlier runs and bulk jobs
+    if settings.cache_snapshot_file:
+        entries = await asyncio.get_event_loop().run_in_executor(None, cache.load, settings.cache_snapshot_file)
+        logger.info("cache_loaded", entries=entries)
+    
+    # Test HF API connection in the background if token is provided
     if settings.hf_api_token:
-        try:
-            model_status = await test_models()
-            print(f"📊 Model Status: {model_status}")
-        except Exception as e:
-            print(f"⚠️  Warning: Could not test models: {e}")
+        start_background_task("probe_models", probe_models())
     else:
-        print("⚠️  Warning: No HF API token provided")
+        logger.warning("hf_token_missing")
     
-    # Check extraction methods
+    # Check extraction methods (without importing them)
     extraction_info = get_extraction_info()
     available_methods = [k for k, v in extraction_info.items() if v]
-    print(f"🔧 Available extraction methods: {available_methods}")
+    logger.info("extraction_methods", available=available_methods)
+    
+    if settings.prewarm_extractors:
+        start_background_task("prewarm_extractors", prewarm_extractors())
+    
+    if settings.prewarm_enabled and settings.hf_api_token:
+        start_background_task("prewarm_cache", prewarmer.run())
     
     yield
     
     # Shutdown
-    print("🛑 Shutting down Creator Transformer Backend...")
+    logger.info("shutdown")
+    for task in background_tasks.values():
+        task.cancel()
+    await get_fetcher().aclose()
+    if settings.cache_snapshot_file:
+        logger.info("cache_saved", entries=cache.save(settings.cache_snapshot_file))
+    shutdown_logging()
 
 
 # Create FastAPI app
@@ -74,41 +172,107 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add CORS middleware
+# Cancel requests at their deadline or when the client goes away; added
+# before the tracing middleware so that traces include cancelled requests
+app.add_middleware(DeadlineMiddleware, seconds=settings.request_deadline_seconds)
+
+# Add rate limiting
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace request stages and report them in the Server-Timing header"""
+    global active_requests
+    trace = start_trace(f"{request.method} {request.url.path}", request.headers.get("X-Request-ID"))
+    profiled = profiler.request_started()
+    status = 500
+    active_requests += 1
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        active_requests -= 1
+        trace.finish()
+        loop = asyncio.get_event_loop()
+        if profiled:
+            loop.run_in_executor(None, profiler.request_finished, trace)
+        if trace_writer:
+            loop.run_in_executor(None, trace_writer.write, trace)
+        
+        # Routine successes are sampled; errors are always logged
+        logger.log(
+            logging.INFO if status < 500 else logging.ERROR,
+            "request", method=request.method, path=request.url.path, status=status,
+            duration_ms=round(trace.duration * 1000, 1),
+            stages={name: round(total * 1000, 1) for name, (total, _) in trace.stages().items()},
+            sampled=status < 400,
+        )
+    
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["X-Request-ID"] = trace.request_id
+    return response
+
+
+# Add CORS middleware; added after the deadline and tracing middleware so
+# that their 504/499 and error responses carry the CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
     allow_credentials=False,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Budget-Limit", "X-Budget-Remaining", "X-Budget-Cost", "Retry-After",
+        "Server-Timing", "X-Request-ID",
+    ],
 )
 
-# Add rate limiting
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+# Record anonymized /extract and /generate traffic for benchmarks/replay.py;
+# added last so that it is outermost and times whole requests
+if traffic_recorder:
+    app.add_middleware(TrafficRecordingMiddleware, recorder=traffic_recorder)
 
 
 # Pydantic models
 class GenerateRequest(BaseModel):
-    """Request model for content generation"""
-    text: str = Field(..., min_length=10, max_length=50000)
-    mode: str = Field(..., regex="^(summary|youtube|shorts)$")
-    tone: str = Field(..., regex="^(neutral|energetic|academic)$")
-    length: str = Field(..., regex="^(short|medium|long)$")
-    lang: str = Field(..., regex="^(auto|en|tr)$")
+    """Request model for content generation (from text, a page URL or extracted content)"""
+    text: Optional[str] = Field(None, min_length=10, max_length=50000)
+    url: Optional[str] = Field(None, max_length=2048)
+    content_id: Optional[str] = Field(None, max_length=64)  # From /extract
+    mode: str = Field(..., pattern="^(summary|youtube|shorts)$")
+    tone: str = Field(..., pattern="^(neutral|energetic|academic)$")
+    length: str = Field(..., pattern="^(short|medium|long)$")
+    lang: str = Field(..., pattern="^(auto|en|tr)$")
     
     @validator('text')
     def validate_text(cls, v):
+        if v is None:
+            return v
         if not v.strip():
             raise ValueError('Text cannot be empty')
         return v.strip()
+    
+    @validator('url')
+    def validate_url(cls, v):
+        return v.strip() if v else None
 
 
 class GenerateResponse(BaseModel):
     """Response model for content generation"""
+    model_config = ConfigDict(protected_namespaces=())  # Allow the model_* fields
+    
     output: str
     tokens: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model: Optional[str] = None
+    model_tier: Optional[str] = None
     cached: bool = False
+    near_duplicate: bool = False
+    similarity: Optional[float] = None
 
 
 class ExtractResponse(BaseModel):
@@ -116,6 +280,16 @@ class ExtractResponse(BaseModel):
     text: str
     url: str
     cached: bool = False
+    # Handle for generating from the text without posting it back
+    content_id: Optional[str] = None
+    lang: Optional[str] = None  # Detected language
+    chunks: int = 0  # Chunks the map stage of the likeliest generation splits the text into
+
+
+class ProfileRequest(BaseModel):
+    """Request model for arming the sampling profiler"""
+    count: int = Field(5, ge=0, le=100)
+    min_duration_ms: float = Field(1000.0, ge=0)
 
 
 class HealthResponse(BaseModel):
@@ -137,11 +311,17 @@ def get_cache_key(prefix: str, **kwargs) -> str:
 
 async def get_cached_or_generate(cache_key: str, generator_func, *args, **kwargs):
     """Get from cache or generate new content"""
+    trace = current_trace()
+    
     # Check cache first
     if cache_key in cache:
         result = cache[cache_key]
+        if trace:
+            _record_cache_access(trace, cache_key, True)
         if isinstance(result, dict):
             result["cached"] = True
+        elif isinstance(result, BaseModel):
+            result = result.copy(update={"cached": True})
         return result
     
     # Generate new content
@@ -149,26 +329,158 @@ async def get_cached_or_generate(cache_key: str, generator_func, *args, **kwargs
     
     # Cache the result
     cache[cache_key] = result
+    if trace:
+        _record_cache_access(trace, cache_key, False)
     
     return result
 
 
+def _record_cache_access(trace: Trace, cache_key: str, hit: bool) -> None:
+    # Traces double as a key log for replaying cache policies
+    # (benchmarks/bench_cache.py)
+    trace.annotate(cache_key=content_digest(cache_key), cache_hit=hit, cache_bytes=cache.size_of(cache_key))
+
+
+def generation_keys(
+    mode: str,
+    tone: str,
+    length: str,
+    lang: str,
+    route: ModelRoute,
+    text: Optional[str] = None,
+    url: Optional[str] = None,
+    text_hash: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Cache keys of a generation: its parameters, and parameters plus model and input
+
+    The input is a URL, or a text given by itself or by its content digest.
+    The parameters key partitions the near-duplicate index; it leaves out
+    the model, because URL inputs are routed as inputs of the maximum size
+    and would otherwise never match the same text pasted in.
+    """
+    params_key = get_cache_key(
+        "generate",
+        mode=mode,
+        tone=tone,
+        length=length,
+        lang=lang,
+        prompt=get_template(mode).key
+    )
+    model_key = get_cache_key(params_key, model=route.gen_model)
+    if url:
+        return params_key, get_cache_key(model_key, url=url)
+    return params_key, get_cache_key(model_key, text_hash=text_hash or content_digest(text))
+
+
+def generation_response(result: Tuple[str, TokenUsage], mode: str, route: ModelRoute) -> GenerateResponse:
+    """Response for a finished generation"""
+    output, usage = result
+    logger.info(
+        "generated", stage="generate", mode=mode, model=route.gen_model,
+        model_tier=route.tier, tokens=usage.total_tokens, sampled=True
+    )
+    return GenerateResponse(
+        output=output,
+        model=route.gen_model,
+        model_tier=route.tier,
+        tokens=usage.total_tokens,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens
+    )
+
+
+async def run_generation(
+    text: str, mode: str, tone: str, length: str, lang: str, route: ModelRoute
+) -> GenerateResponse:
+    """Generate content from text"""
+    result = await generate_content(text, mode, tone, length, lang, route)
+    return generation_response(result, mode, route)
+
+
+async def cached_extract(url: str) -> ExtractResponse:
+    """Extract text from URL through the cache"""
+    async def _extract():
+        text = await extract_text_from_url(url)
+        return ExtractResponse(text=text, url=url)
+    
+    return await get_cached_or_generate(get_cache_key("extract", url=url), _extract)
+
+
+def _prewarm_route(text: str, variant: Variant) -> ModelRoute:
+    return get_routing_policy().route(variant.mode, variant.length, len(text))
+
+
+def _prewarm_url_keys(url: str, variant: Variant) -> Tuple[ModelRoute, str, str]:
+    # Routed and keyed like a /generate request for the URL
+    route = get_routing_policy().route(variant.mode, variant.length, settings.max_input_chars)
+    return (route, *generation_keys(*variant, route, url=url))
+
+
+async def prewarm_extract(url: str) -> str:
+    return (await cached_extract(url)).text
+
+
+def prewarm_is_cached(url: str, text: str, variant: Variant) -> bool:
+    _, cache_key = generation_keys(*variant, _prewarm_route(text, variant), text=text)
+    _, _, url_key = _prewarm_url_keys(url, variant)
+    return cache_key in cache and url_key in cache
+
+
+async def prewarm_generate(url: str, text: str, variant: Variant) -> None:
+    route = _prewarm_route(text, variant)
+    params_key, cache_key = generation_keys(*variant, route, text=text)
+    result = await get_cached_or_generate(cache_key, run_generation, text, *variant, route)
+    if settings.near_duplicate_enabled:
+        near_duplicates.add(near_duplicates.signature(text), params_key, cache_key)
+    
+    # Requests for the page by URL share the result when they use the same model
+    url_route, _, url_key = _prewarm_url_keys(url, variant)
+    if url_key in cache:
+        return
+    if url_route.gen_model == route.gen_model:
+        cache[url_key] = result.copy(update={"cached": False})
+    else:
+        await get_cached_or_generate(url_key, run_generation, text, *variant, url_route)
+
+
+# Fills the caches with extractions and generations of likely requests
+prewarmer = PrewarmScheduler(
+    extract=prewarm_extract,
+    is_cached=prewarm_is_cached,
+    generate=prewarm_generate,
+    is_idle=lambda: active_requests == 0,
+    popularity=popularity
+)
+
+# Maps the chunks of extracted texts before their generation is requested
+speculator = Speculator(
+    popularity=popularity,
+    is_busy=lambda: active_requests > settings.speculate_max_active_requests
+)
+
+
+def require_admin(request: Request):
+    """Allow only requests carrying the configured admin token"""
+    token = request.headers.get("X-Admin-Token", "")
+    if not settings.admin_token or not secrets.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
 # API Endpoints
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    models_status = {}
-    
+    # Report the last probe and refresh it in the background when stale
     if settings.hf_api_token:
-        try:
-            models_status = await test_models()
-        except Exception:
-            models_status = {"summarization": False, "generation": False}
+        age = time.time() - model_status["checked_at"]
+        if age > settings.model_probe_interval_seconds:
+            start_background_task("probe_models", probe_models())
     
     return HealthResponse(
         ok=True,
         timestamp=time.time(),
-        models_available=models_status
+        models_available=model_status["models"]
     )
 
 
@@ -182,24 +494,28 @@ async def extract_text(request: Request, url: str = Form(...)):
             raise HTTPException(status_code=400, detail="URL cannot be empty")
         
         url = url.strip()
-        cache_key = get_cache_key("extract", url=url)
-        
-        async def _extract():
-            text = await extract_text_from_url(url)
-            return ExtractResponse(text=text, url=url)
-        
-        result = await get_cached_or_generate(cache_key, _extract)
-        return result
+        popularity.record_source(url)
+        result = await cached_extract(url)
+        content = content_store.put(result.text, url)
+        if settings.speculate_enabled and settings.hf_api_token:
+            speculator.schedule(content)
+        return result.copy(update={
+            "content_id": content.content_id,
+            "lang": content.lang,
+            "chunks": speculator.chunk_count(content),
+        })
         
     except TextExtractionError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
+        logger.exception("extraction_error", url=url)
         raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
 
 
 @app.post("/generate", response_model=GenerateResponse)
-@limiter.limit(settings.generate_rate_limit)
-async def generate_content_endpoint(request: Request, req: GenerateRequest):
+async def generate_content_endpoint(request: Request, response: Response, req: GenerateRequest):
     """Generate content from text"""
     try:
         # Check if HF token is available
@@ -209,39 +525,170 @@ async def generate_content_endpoint(request: Request, req: GenerateRequest):
                 detail="AI models not available. Please configure HF_API_TOKEN."
             )
         
+        if sum(value is not None for value in (req.text, req.url, req.content_id)) != 1:
+            raise HTTPException(status_code=400, detail="Provide one of text, url or content_id")
+        
+        # Stored content was truncated, stripped and hashed when extracted
+        content = None
+        lang = req.lang
+        if req.content_id:
+            content = content_store.get(req.content_id)
+            if content is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Unknown or expired content_id. Extract the page again or send the text."
+                )
+            if lang == "auto":
+                lang = content.lang
+        text = content.text if content else req.text
+        
         # Validate text length
-        if len(req.text) > settings.max_input_chars:
+        if req.text and len(req.text) > settings.max_input_chars:
             raise HTTPException(
                 status_code=400,
                 detail=f"Text too long. Maximum {settings.max_input_chars} characters allowed."
             )
         
-        cache_key = get_cache_key(
-            "generate",
-            text_hash=hash(req.text),
-            mode=req.mode,
-            tone=req.tone,
-            length=req.length,
-            lang=req.lang
+        # Page length is unknown until it has been read, so URL inputs are
+        # routed as inputs of the maximum size
+        input_chars = len(text) if text else settings.max_input_chars
+        route = get_routing_policy().route(req.mode, req.length, input_chars)
+        
+        # Keyed by the requested language, so that handles and texts share results
+        params_key, cache_key = generation_keys(
+            req.mode, req.tone, req.length, req.lang, route,
+            text=text, url=req.url, text_hash=content.digest if content else None
         )
+        popularity.record_variant(Variant(req.mode, req.tone, req.length, req.lang))
+        if req.url:
+            popularity.record_source(req.url)
         
-        async def _generate():
-            output, tokens = await generate_content(
-                req.text, req.mode, req.tone, req.length, req.lang
+        # Look for a cached result of a near-identical input
+        signature = None
+        near_match = None
+        if settings.near_duplicate_enabled and text and cache_key not in cache:
+            if content:
+                signature = content.derive("signature", near_duplicates.signature)
+            else:
+                signature = near_duplicates.signature(text)
+            near_match = near_duplicates.query(
+                signature, params_key, is_live=lambda key: key in cache
             )
-            return GenerateResponse(output=output, tokens=tokens)
         
-        result = await get_cached_or_generate(cache_key, _generate)
+        # Charge the estimated inference cost against the client's budget.
+        # Cache hits do not touch the provider, so they are free.
+        client_id = get_remote_address(request)
+        if cache_key in cache or near_match:
+            cost = 0
+        elif req.url:
+            cost = estimate_url_generation_cost(req.mode)
+        else:
+            cost = estimate_generation_cost(text, req.mode, route.gen_model)
+        try:
+            remaining = cost_limiter.charge(client_id, cost)
+        except BudgetExceededError as e:
+            headers = cost_limiter.budget_headers(client_id, cost, e.remaining)
+            headers["Retry-After"] = str(int(e.retry_after) + 1)
+            raise HTTPException(
+                status_code=429,
+                detail=f"Generation budget exceeded. Retry in {int(e.retry_after) + 1} seconds.",
+                headers=headers
+            )
+        
+        async def _generate():
+            if req.url:
+                return generation_response(await _generate_from_url(), req.mode, route)
+            return await run_generation(text, req.mode, req.tone, req.length, lang, route)
+        
+        # Text of a page input, indexed for near-duplicate lookups of later
+        # texts once its result is cached
+        page_paragraphs: List[str] = []
+        
+        async def _generate_from_url():
+            # Chunks are summarized while the rest of the page downloads
+            paragraphs = record_paragraphs(stream_paragraphs(req.url), page_paragraphs)
+            chunks = stream_chunks(paragraphs, settings.max_chunk_size)
+            usage = TokenUsage()
+            try:
+                return await generate_content_streamed(
+                    chunks, req.mode, req.tone, req.length, req.lang, route, usage
+                )
+            except TextExtractionError as e:
+                # Pages the streaming parser cannot read go through the extractors,
+                # unless chunks were already summarized and would be paid for twice
+                if usage.calls:
+                    raise
+                logger.info("stream_fallback", stage="extract", url=req.url, error=str(e))
+                page = (await extract_text_from_url(req.url))[:settings.max_input_chars]
+                page_paragraphs[:] = [page]
+                return await generate_content(page, req.mode, req.tone, req.length, req.lang, route)
+        
+        if near_match:
+            result = cache[near_match.cache_key].copy(update={
+                "cached": True,
+                "near_duplicate": True,
+                "similarity": round(near_match.similarity, 3),
+            })
+        else:
+            try:
+                result = await get_cached_or_generate(cache_key, _generate)
+            except Exception:
+                # Failed generations (provider errors, deadlines) are not charged
+                cost_limiter.refund(client_id, cost)
+                raise
+            if req.url and cost:
+                # The charge assumed the largest page; settle it for the page that was
+                # read, or give it back when the result came from a generation already running
+                actual_cost = (
+                    estimate_url_generation_cost(req.mode, len("\n\n".join(page_paragraphs)))
+                    if page_paragraphs else 0
+                )
+                remaining = cost_limiter.settle(client_id, cost, actual_cost)
+                cost = min(cost, actual_cost)
+            if not result.cached:
+                if settings.near_duplicate_enabled and signature is None and page_paragraphs:
+                    signature = near_duplicates.signature("\n\n".join(page_paragraphs))
+                near_duplicates.add(signature, params_key, cache_key)
+        
+        response.headers.update(cost_limiter.budget_headers(client_id, cost, remaining))
         return result
         
+    except HTTPException:
+        raise
     except HuggingFaceError as e:
         raise HTTPException(status_code=503, detail=f"AI service error: {str(e)}")
+    except TextExtractionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.exception("generation_error", mode=req.mode)
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def arm_profiler(req: ProfileRequest):
+    """Capture sampling profiles of the next N requests slower than a threshold"""
+    profiler.arm(req.count, req.min_duration_ms)
+    return {
+        "armed": profiler.armed,
+        "remaining": profiler.remaining,
+        "min_duration_ms": req.min_duration_ms,
+        "profile_dir": settings.profile_dir,
+    }
+
+
+@app.post("/admin/prewarm", dependencies=[Depends(require_admin)])
+async def run_prewarm():
+    """Start a cache prewarming cycle now"""
+    if not settings.hf_api_token:
+        raise HTTPException(status_code=503, detail="AI models not available. Please configure HF_API_TOKEN.")
+    start_background_task("prewarm_cycle", prewarmer.run_once())
+    return {"started": True, **prewarmer.snapshot()}
+
+
 @app.get("/info")
 async def get_info():
     """Get API information and available features"""
@@ -253,9 +700,16 @@ async def get_info():
             "text_extraction": True,
             "content_generation": bool(settings.hf_api_token),
             "caching": True,
+            "near_duplicate_detection": settings.near_duplicate_enabled,
+            "content_handles": True,
             "rate_limiting": True,
         },
         "extraction_methods": extraction_info,
+        "fetch": get_fetcher().stats(),
+        "model_tiers": {
+            name: {"sum_model": route.sum_model, "gen_model": route.gen_model}
+            for name, route in get_routing_policy().routes.items()
+        },
         "supported_modes": ["summary", "youtube", "shorts"],
         "supported_tones": ["neutral", "energetic", "academic"],
         "supported_lengths": ["short", "medium", "long"],
@@ -263,14 +717,33 @@ async def get_info():
         "limits": {
             "max_input_chars": settings.max_input_chars,
             "extract_rate": settings.extract_rate_limit,
-            "generate_rate": settings.generate_rate_limit,
-        }
+            "generate_budget": settings.generate_budget_capacity,
+            "generate_budget_refill_per_second": settings.generate_budget_refill_per_second,
+            "request_deadline_seconds": settings.request_deadline_seconds,
+        },
+        "cache": cache.stats(),
+        "content": content_store.stats(),
+        "cancellations": get_cancellation_stats().snapshot(),
+        "prewarm": {"enabled": settings.prewarm_enabled, **prewarmer.snapshot()},
+        "speculation": {"enabled": settings.speculate_enabled, **speculator.snapshot()},
+        "traffic_recording": {
+            "enabled": traffic_recorder is not None,
+            "recorded": traffic_recorder.recorded if traffic_recorder else 0,
+        },
+        "logging": {
+            "success_sample_rate": settings.log_success_sample_rate,
+            "dropped_records": dropped_records(),
+        },
     }
 
 
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc):
+    # Endpoints raise FastAPI's HTTPException for missing resources (e.g. an
+    # expired content_id); unknown routes raise Starlette's
+    if isinstance(exc, HTTPException):
+        return JSONResponse(status_code=404, content={"detail": exc.detail})
     return JSONResponse(
         status_code=404,
         content={"detail": "Endpoint not found"}
@@ -304,5 +777,7 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
-        log_level="info" if not settings.debug else "debug"
+        log_level="info" if not settings.debug else "debug",
+        log_config=None,  # Keep uvicorn on the queued structured handler
+        access_log=False,  # Requests are logged by the tracing middleware
     )
@@ -0,0 +1,173 @@
+"""
+Streaming extraction pipeline
+Parses paragraphs from a page while it downloads and groups them into chunks
+"""
+
+import time
+from html.parser import HTMLParser
+from typing import AsyncGenerator, List
+from app.boilerplate import get_boilerplate_filter
+from app.config import get_settings
+from app.deadline import check_deadline
+from app.density import BLOCK_TAGS, MIN_PARAGRAPH_CHARS, SKIP_TAGS, SYMBOLS_ONLY_RE
+from app.extractors import TextExtractionError, is_valid_url
+from app.fetch import FetchError, get_fetcher
+from app.generator import chunk_text
+from app.logs import get_logger
+from app.tracing import span
+
+
+logger = get_logger(__name__)
+
+# Pages yielding less text than this are left to the full extractors
+MIN_PAGE_CHARS = 50
+
+
+class ParagraphParser(HTMLParser):
+    """Incremental HTML parser collecting the text of block elements"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[str] = []
+        self._parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS or tag in SKIP_TAGS:
+            self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS and not self._skip_depth:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._parts).split())
+        self._parts = []
+        if len(text) >= MIN_PARAGRAPH_CHARS and not SYMBOLS_ONLY_RE.match(text):
+            self.paragraphs.append(text)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+    def drain(self) -> List[str]:
+        """Paragraphs completed since the last call"""
+        paragraphs, self.paragraphs = self.paragraphs, []
+        return paragraphs
+
+
+async def stream_paragraphs(url: str) -> AsyncGenerator[str, None]:
+    """
+    Yield the paragraphs of a web page while it is downloading
+
+    Boilerplate paragraphs are dropped as they are parsed. The download
+    stops once `max_input_chars` of text or `max_page_bytes` of body have
+    been received.
+
+    Args:
+        url: Page URL
+
+    Raises:
+        TextExtractionError: If the page cannot be fetched or has no text
+    """
+    if not is_valid_url(url):
+        raise TextExtractionError("Invalid URL provided")
+
+    settings = get_settings()
+    parser = ParagraphParser()
+    page = get_boilerplate_filter().page(url) if settings.boilerplate_filter_enabled else None
+    start = time.perf_counter()
+    chars = 0
+    count = 0
+
+    def _accept(paragraphs: List[str]) -> List[str]:
+        nonlocal chars, count
+        kept = []
+        for paragraph in paragraphs:
+            if chars >= settings.max_input_chars:
+                break
+            if page and not page.keep(paragraph):
+                continue
+            paragraph = paragraph[:settings.max_input_chars - chars]
+            chars += len(paragraph)
+            count += 1
+            kept.append(paragraph)
+        return kept
+
+    try:
+        async with get_fetcher().stream(url) as response:
+            async for piece in response.aiter_text():
+                check_deadline("extract")
+                with span("parse"):
+                    parser.feed(piece)
+                    paragraphs = _accept(parser.drain())
+                for paragraph in paragraphs:
+                    yield paragraph
+                if chars >= settings.max_input_chars or response.num_bytes_downloaded >= settings.max_page_bytes:
+                    break
+            downloaded = response.num_bytes_downloaded
+    except FetchError as e:
+        raise TextExtractionError(str(e)) from e
+
+    with span("parse"):
+        parser.close()
+        paragraphs = _accept(parser.drain())
+    for paragraph in paragraphs:
+        yield paragraph
+
+    if chars < MIN_PAGE_CHARS:
+        raise TextExtractionError(f"No text found in {url}")
+    if page:
+        page.close()
+
+    logger.info(
+        "url_streamed", stage="extract", paragraphs=count, chars=chars, bytes=downloaded,
+        duration_ms=round((time.perf_counter() - start) * 1000, 1), sampled=True
+    )
+
+
+async def stream_chunks(
+    paragraphs: AsyncGenerator[str, None], max_chunk_size: int
+) -> AsyncGenerator[str, None]:
+    """
+    Group streamed paragraphs into chunks, emitting each one as soon as it is full
+
+    Chunks match `chunk_text`: paragraphs joined by blank lines up to
+    max_chunk_size characters, with longer paragraphs split by sentences.
+    """
+    current: List[str] = []
+    size = 0
+    try:
+        async for paragraph in paragraphs:
+            pieces = chunk_text(paragraph, max_chunk_size) if len(paragraph) > max_chunk_size else [paragraph]
+            for piece in pieces:
+                added = len(piece) + (2 if current else 0)
+                if current and size + added > max_chunk_size:
+                    yield "\n\n".join(current)
+                    current, size, added = [], 0, len(piece)
+                current.append(piece)
+                size += added
+        if current:
+            yield "\n\n".join(current)
+    finally:
+        await paragraphs.aclose()
+
+
+async def record_paragraphs(
+    paragraphs: AsyncGenerator[str, None], into: List[str]
+) -> AsyncGenerator[str, None]:
+    """Pass streamed paragraphs through, appending each one to `into`"""
+    try:
+        async for paragraph in paragraphs:
+            into.append(paragraph)
+            yield paragraph
+    finally:
+        await paragraphs.aclose()
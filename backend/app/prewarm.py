@@ -0,0 +1,237 @@
+"""
+Cache prewarming for popular and trending sources
+Extracts seed pages and generates their common variants while the server is idle
+"""
+
+import asyncio
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+from app.config import get_settings
+from app.fetch import FetchError, get_fetcher
+from app.logs import get_logger
+from app.ratelimit import TokenBucket, estimate_generation_cost
+from app.routing import get_routing_policy
+
+
+logger = get_logger(__name__)
+
+# How often the scheduler checks whether user traffic has stopped
+IDLE_POLL_SECONDS = 1.0
+
+# Link elements of RSS 2.0, RSS 1.0 (RDF) and Atom feeds
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+RSS1_NS = "{http://purl.org/rss/1.0/}"
+
+
+class Variant(NamedTuple):
+    """Generation parameters of a prewarmed result"""
+    mode: str
+    tone: str
+    length: str
+    lang: str
+
+    @classmethod
+    def parse(cls, spec: str) -> "Variant":
+        """Parse "mode/tone/length[/lang]" (lang defaults to auto)"""
+        parts = spec.split("/")
+        if len(parts) == 3:
+            parts.append("auto")
+        if len(parts) != 4:
+            raise ValueError(f"Invalid prewarm variant: {spec!r}")
+        return cls(*parts)
+
+
+class PopularityTracker:
+    """Request counts of source URLs and generation variants, decayed per cycle"""
+
+    def __init__(self, max_entries: int = 10000, decay: float = 0.5):
+        self.max_entries = max_entries
+        self.decay = decay
+        self.sources: Counter = Counter()
+        self.variants: Counter = Counter()
+
+    def record_source(self, url: str) -> None:
+        if url in self.sources or len(self.sources) < self.max_entries:
+            self.sources[url] += 1
+
+    def record_variant(self, variant: Variant) -> None:
+        self.variants[variant] += 1
+
+    def top_sources(self, n: int, min_count: float = 2) -> List[str]:
+        return [url for url, count in self.sources.most_common(n) if count >= min_count]
+
+    def top_variants(self, n: int) -> List[Variant]:
+        return [variant for variant, _ in self.variants.most_common(n)]
+
+    def age(self) -> None:
+        """Decay all counts so that popularity follows recent traffic"""
+        for counter in (self.sources, self.variants):
+            for key in list(counter):
+                counter[key] *= self.decay
+                if counter[key] < 0.5:
+                    del counter[key]
+
+
+def parse_feed(content: bytes, limit: int) -> List[str]:
+    """Item links of an RSS or Atom feed, newest first as listed"""
+    root = ET.fromstring(content)
+    links: List[str] = []
+    for item in root.iter():
+        if item.tag in ("item", f"{RSS1_NS}item"):
+            link = item.findtext("link") or item.findtext(f"{RSS1_NS}link")
+            if link:
+                links.append(link.strip())
+        elif item.tag == f"{ATOM_NS}entry":
+            for link in item.findall(f"{ATOM_NS}link"):
+                if link.get("rel", "alternate") == "alternate" and link.get("href"):
+                    links.append(link.get("href").strip())
+                    break
+        if len(links) >= limit:
+            break
+    return links
+
+
+class PrewarmScheduler:
+    """
+    Periodically fills the caches with likely requests
+
+    Each cycle collects the configured seed URLs, the newest items of the
+    configured feeds and the most requested source URLs. It then extracts
+    each source and generates the configured variants plus the most
+    requested ones. Work only starts while `is_idle` reports no user
+    requests in flight. Generation is charged to a separate token budget
+    so that prewarming cannot use up the HF quota that users need.
+
+    `is_cached` and `generate` get the source URL and its text, so that
+    results can be stored for requests by URL as well as by text.
+    """
+
+    def __init__(
+        self,
+        extract: Callable[[str], Awaitable[str]],
+        is_cached: Callable[[str, str, Variant], bool],
+        generate: Callable[[str, str, Variant], Awaitable[None]],
+        is_idle: Callable[[], bool],
+        popularity: PopularityTracker
+    ):
+        settings = get_settings()
+        self.extract = extract
+        self.is_cached = is_cached
+        self.generate = generate
+        self.is_idle = is_idle
+        self.popularity = popularity
+        self.budget = TokenBucket(
+            settings.prewarm_budget_tokens_per_hour,
+            settings.prewarm_budget_tokens_per_hour / 3600
+        )
+        self.last_run: Optional[Dict[str, float]] = None
+
+    def variants(self) -> List[Variant]:
+        """Configured variants followed by the most requested ones"""
+        settings = get_settings()
+        variants = [Variant.parse(spec) for spec in settings.prewarm_variants]
+        for variant in self.popularity.top_variants(settings.prewarm_top_variants):
+            if variant not in variants:
+                variants.append(variant)
+        return variants
+
+    async def collect_sources(self) -> List[str]:
+        """Seed URLs, feed items and popular sources, without duplicates"""
+        settings = get_settings()
+        sources = list(settings.prewarm_urls)
+
+        for feed in settings.prewarm_feeds:
+            try:
+                page = await get_fetcher().get(feed, timeout=10.0)
+                sources.extend(parse_feed(page.content, settings.prewarm_feed_items))
+            except (FetchError, ET.ParseError) as e:
+                logger.warning("prewarm_feed_failed", feed=feed, error=str(e))
+
+        sources.extend(self.popularity.top_sources(settings.prewarm_top_sources))
+        return list(dict.fromkeys(sources))
+
+    async def _wait_idle(self) -> None:
+        while not self.is_idle():
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def run_once(self) -> Dict[str, float]:
+        """
+        Run one prewarming cycle
+
+        Returns:
+            Counts of sources, extractions and generations of the cycle
+        """
+        start = time.time()
+        stats = {"sources": 0, "generated": 0, "cached": 0, "failed": 0, "budget_exhausted": 0}
+        sources = await self.collect_sources()
+        variants = self.variants()
+        stats["sources"] = len(sources)
+
+        for url in sources:
+            await self._wait_idle()
+            try:
+                text = await self.extract(url)
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning("prewarm_extract_failed", url=url, error=str(e))
+                continue
+
+            # Users cannot submit longer texts for generation
+            if len(text) > get_settings().max_input_chars:
+                continue
+
+            for variant in variants:
+                if self.is_cached(url, text, variant):
+                    stats["cached"] += 1
+                    continue
+                # URL requests are routed as inputs of the maximum size; when that
+                # picks another model, the page is generated once for each
+                policy = get_routing_policy()
+                gen_models = {
+                    policy.route(variant.mode, variant.length, len(text)).gen_model,
+                    policy.route(variant.mode, variant.length, get_settings().max_input_chars).gen_model,
+                }
+                cost = min(
+                    sum(estimate_generation_cost(text, variant.mode, gen_model) for gen_model in gen_models),
+                    self.budget.capacity
+                )
+                if not self.budget.try_consume(cost):
+                    stats["budget_exhausted"] = 1
+                    break
+                await self._wait_idle()
+                try:
+                    await self.generate(url, text, variant)
+                    stats["generated"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.warning("prewarm_generate_failed", url=url, variant="/".join(variant), error=str(e))
+
+            if stats["budget_exhausted"]:
+                break
+
+        self.popularity.age()
+        stats["duration_s"] = round(time.time() - start, 1)
+        stats["finished_at"] = time.time()
+        self.last_run = stats
+        logger.info("prewarm_cycle", **stats)
+        return stats
+
+    async def run(self) -> None:
+        """Run cycles forever, `prewarm_interval_seconds` apart"""
+        interval = get_settings().prewarm_interval_seconds
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("prewarm_cycle_failed")
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Scheduler state for /info"""
+        return {
+            "budget_remaining": int(self.budget.remaining),
+            "variants": ["/".join(variant) for variant in self.variants()],
+            "last_run": self.last_run,
+        }
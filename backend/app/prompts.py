@@ -0,0 +1,634 @@
+"""
+Prompt template registry
+Versioned templates compiled at startup and assembled by concatenation
+"""
+
+from itertools import product
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class PromptTemplate:
+    """
+    Versioned prompt template
+
+    The instructions for every parameter combination in `space` are
+    rendered once by `compile()`; at request time a prompt is only
+    prefix + input text + suffix. The input always goes last so that all
+    requests with the same parameters share an identical prefix, which
+    provider-side prefix (KV) caching can reuse.
+
+    Bump `version` whenever the wording changes; cache keys include it so
+    outputs produced by an older prompt are not served.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        text: str,
+        space: Optional[Dict[str, List[str]]] = None,
+        fields: Optional[Callable[..., Dict[str, str]]] = None,
+        suffix: str = ""
+    ):
+        self.name = name
+        self.version = version
+        self.text = text
+        self.space = space or {}
+        self.fields = fields or (lambda **params: params)
+        self.suffix = suffix
+        self._prefixes: Dict[Tuple, str] = {}
+
+    @property
+    def key(self) -> str:
+        """Name and version, for use in cache keys"""
+        return f"{self.name}@v{self.version}"
+
+    def _build(self, params: Dict[str, str]) -> str:
+        return self.text.format(**self.fields(**params))
+
+    def compile(self) -> None:
+        """Pre-render the prefix for every parameter combination"""
+        names = list(self.space)
+        for values in product(*self.space.values()):
+            self._prefixes[values] = self._build(dict(zip(names, values)))
+
+    def prefix(self, **params) -> str:
+        """Static part of the prompt for the given parameters"""
+        values = tuple(params.get(name) for name in self.space)
+        prefix = self._prefixes.get(values)
+        if prefix is None:
+            # Values outside the compiled space are rendered on demand
+            prefix = self._build(params)
+        return prefix
+
+    def render(self, text: str, **params) -> str:
+        """Full prompt: compiled prefix, input text, suffix"""
+        return self.prefix(**params) + text + self.suffix
+
+
+# Registry of all templates by name
+_templates: Dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    """Compile a template and add it to the registry"""
+    template.compile()
+    _templates[template.name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    """Get a registered template by name"""
+    try:
+        return _templates[name]
+    except KeyError:
+        raise ValueError(f"Unknown prompt template: {name}")
+
+
+# ---------------------------------------------------------------------------
+# Generator prompts (app.generator)
+# ---------------------------------------------------------------------------
+
+TONES = ["neutral", "energetic", "academic"]
+LENGTHS = ["short", "medium", "long"]
+LANGS = ["auto", "en", "tr"]
+
+SUMMARY_TONES = {
+    "neutral": "in a clear and objective manner",
+    "energetic": "in an engaging and enthusiastic tone",
+    "academic": "in a formal and scholarly manner",
+}
+
+SUMMARY_LENGTHS = {
+    "short": "Create a concise summary with 3-5 bullet points and a brief paragraph.",
+    "medium": "Create a comprehensive summary with 5-8 bullet points and 1-2 paragraphs.",
+    "long": "Create a detailed summary with 8-12 bullet points and 2-3 paragraphs.",
+}
+
+SUMMARY_LANGS = {
+    "en": "Respond in English.",
+    "tr": "Türkçe olarak yanıtlayın.",
+    "auto": "Respond in the same language as the input text.",
+}
+
+YOUTUBE_TONES = {
+    "neutral": "professional and informative",
+    "energetic": "enthusiastic and engaging",
+    "academic": "educational and authoritative",
+}
+
+YOUTUBE_LENGTHS = {
+    "short": "a 5-7 minute video script",
+    "medium": "an 8-12 minute video script",
+    "long": "a 12-18 minute video script",
+}
+
+SCRIPT_LANGS = {
+    "en": "Write the script in English.",
+    "tr": "Senaryoyu Türkçe yazın.",
+    "auto": "Write the script in the same language as the input text.",
+}
+
+SHORTS_TONES = {
+    "neutral": "clear and direct",
+    "energetic": "exciting and punchy",
+    "academic": "informative yet concise",
+}
+
+SUMMARY_PROMPT = register(PromptTemplate(
+    name="summary",
+    version=1,
+    text="""Please summarize the following text {tone}.
+
+{length}
+
+{lang}
+
+Format your response as:
+• Bullet point 1
+• Bullet point 2
+• Bullet point 3
+[Additional bullet points as needed]
+
+Summary paragraph providing key insights and main takeaways.
+
+Text to summarize:
+""",
+    space={"tone": TONES, "length": LENGTHS, "lang": LANGS},
+    fields=lambda tone, length, lang: {
+        "tone": SUMMARY_TONES.get(tone, "clearly"),
+        "length": SUMMARY_LENGTHS.get(length, "Create a summary"),
+        "lang": SUMMARY_LANGS.get(lang, "Respond in English."),
+    },
+    suffix="\n\nSummary:",
+))
+
+YOUTUBE_PROMPT = register(PromptTemplate(
+    name="youtube",
+    version=1,
+    text="""Create {length} based on the following content.
+Use a {tone} tone throughout.
+
+{lang}
+
+Structure the script with these sections:
+1. HOOK (0-15 seconds): Attention-grabbing opening
+2. INTRO (15-45 seconds): Brief overview and what viewers will learn
+3. MAIN CONTENT (Sections 1-3): Core information broken into digestible segments
+4. OUTRO & CTA (Last 30 seconds): Summary and call-to-action
+5. B-ROLL SUGGESTIONS: Visual elements to accompany the script
+
+Include natural transitions, engagement cues, and speaking directions in [brackets].
+
+Source content:
+""",
+    space={"tone": TONES, "length": LENGTHS, "lang": LANGS},
+    fields=lambda tone, length, lang: {
+        "tone": YOUTUBE_TONES.get(tone, "professional"),
+        "length": YOUTUBE_LENGTHS.get(length, "a video script"),
+        "lang": SCRIPT_LANGS.get(lang, "Write the script in English."),
+    },
+    suffix="\n\nYouTube Script:",
+))
+
+SHORTS_PROMPT = register(PromptTemplate(
+    name="shorts",
+    version=1,
+    text="""Create a YouTube Shorts script (30-60 seconds) based on the following content.
+Use a {tone} tone that's perfect for short-form content.
+
+{lang}
+
+Structure:
+• HOOK (0-3 seconds): Immediate attention grabber
+• 3 KEY POINTS (3-4 seconds each): Main insights in punchy format
+• CTA (Last 5 seconds): Strong call-to-action
+
+Requirements:
+- Total length: 30-60 seconds when spoken
+- Each point should be impactful and memorable
+- Use numbers, statistics, or surprising facts when possible
+- Include visual cues in [brackets]
+- End with engaging question or action
+
+Source content:
+""",
+    # Shorts have a fixed duration, so length does not change the prompt
+    space={"tone": TONES, "lang": LANGS},
+    fields=lambda tone, lang, **_: {
+        "tone": SHORTS_TONES.get(tone, "engaging"),
+        "lang": SCRIPT_LANGS.get(lang, "Write the script in English."),
+    },
+    suffix="\n\nYouTube Shorts Script:",
+))
+
+
+# ---------------------------------------------------------------------------
+# Router chat prompts (backend/app.py)
+# ---------------------------------------------------------------------------
+
+ROUTER_TASKS = ["summary", "youtube", "shorts", "social", "seo"]
+ROUTER_TONES = ["casual", "formal", "energetic"]
+PERSONA_NAMES = ["news_anchor", "educator", "vlogger", "influencer", "brand", "generic"]
+
+PERSONAS = {
+    "news_anchor": {
+        "tr": {"style": "objektif haber sunumu tarzında", "voice": "güvenilir ve profesyonel"},
+        "en": {"style": "objective news presentation style", "voice": "credible and professional"}
+    },
+    "educator": {
+        "tr": {"style": "eğitici ve açıklayıcı", "voice": "sabırlı ve anlaşılır"},
+        "en": {"style": "educational and explanatory", "voice": "patient and clear"}
+    },
+    "vlogger": {
+        "tr": {"style": "kişisel ve samimi vlog tarzında", "voice": "enerjik ve eğlenceli"},
+        "en": {"style": "personal and intimate vlog style", "voice": "energetic and entertaining"}
+    },
+    "influencer": {
+        "tr": {"style": "trend odaklı ve çekici", "voice": "karizmatik ve ikna edici"},
+        "en": {"style": "trend-focused and engaging", "voice": "charismatic and persuasive"}
+    },
+    "brand": {
+        "tr": {"style": "marka kimliği uyumlu", "voice": "profesyonel ve tutarlı"},
+        "en": {"style": "brand identity aligned", "voice": "professional and consistent"}
+    },
+    "generic": {
+        "tr": {"style": "genel içerik oluşturucu", "voice": "net ve etkili"},
+        "en": {"style": "general content creator", "voice": "clear and effective"}
+    }
+}
+
+LENGTH_GUIDE = {
+    "short": {"summary": "2-3 madde, 1 paragraf", "youtube": "30-60 saniye", "shorts": "15-30 saniye", "social": "1-2 cümle", "seo": "kısa"},
+    "medium": {"summary": "4-6 madde, 2 paragraf", "youtube": "2-5 dakika", "shorts": "30-60 saniye", "social": "2-3 cümle", "seo": "orta"},
+    "long": {"summary": "6-10 madde, 3-4 paragraf", "youtube": "5-10 dakika", "shorts": "60-90 saniye", "social": "3-4 cümle", "seo": "uzun"}
+}
+
+TONE_STYLES = {
+    "casual": {"tr": "sohbet tarzında, samimi", "en": "conversational, friendly"},
+    "formal": {"tr": "profesyonel, resmi", "en": "professional, formal"},
+    "energetic": {"tr": "enerjik, heyecanlı", "en": "energetic, exciting"}
+}
+
+SYSTEM_TEMPLATES = {
+    "tr": {
+        "summary": """Sen {persona_style} uzman bir içerik analisti ve özetleme uzmanısın. Görevin verilen metni {tone_style} bir şekilde özetlemek.
+
+PERSONA: {persona_voice} ses tonu kullan
+ÖZETLEME KRİTERLERİ:
+• Ana fikirleri ve önemli detayları kaybet
+• {length_guide} formatında yaz
+• Gereksiz tekrarları çıkar
+• Mantıklı akış ve yapı oluştur
+• Anahtar kavramları vurgula
+• Anlaşılır ve akıcı dil kullan
+
+ÇIKTI FORMATI:
+📋 Ana Noktalar:
+• [Her madde için spesifik ve değerli bilgi]
+
+📝 Özet:
+[Konunun genel değerlendirmesi ve sonuç]
+
+Ton: {tone_style}""",
+
+        "youtube": """Sen {persona_style} profesyonel bir YouTube içerik yazarısın. Verilen konudan {length_guide} uzunluğunda YouTube video senaryosu oluşturacaksın.
+
+PERSONA: {persona_voice} ses tonu kullan
+SENARYO KRİTERLERİ:
+• İlgi çekici açılış (hook) ile başla
+• Ana konuları mantıklı sırayla işle
+• İzleyiciyi engage edecek sorular sor
+• Örnekler ve pratik bilgiler ver
+• Güçlü bir kapanış yap
+• Call-to-action ekle
+
+ÇIKTI FORMATI:
+🎬 YouTube Video Senaryosu
+
+🚀 GİRİŞ (0-15 saniye):
+[İlgi çekici açılış, hook]
+
+📚 ANA İÇERİK:
+[Bölüm 1: Temel bilgiler]
+[Bölüm 2: Detaylar ve örnekler]  
+[Bölüm 3: Pratik uygulamalar]
+
+🎯 KAPANIŞ:
+[Özet ve call-to-action]
+
+Ton: {tone_style}""",
+
+        "shorts": """Sen {persona_style} viral içerik uzmanısın. Verilen konudan {length_guide} uzunluğunda YouTube Shorts/TikTok senaryosu oluşturacaksın.
+
+PERSONA: {persona_voice} ses tonu kullan
+SHORTS KRİTERLERİ:
+• İlk 3 saniyede dikkat çek
+• Hızlı tempolu ve dinamik
+• Görsel açıklamalar ekle
+• Trend olan hashtag'ler kullan
+• Viral potansiyeli yüksek
+• Tekrar izletecek kalitede
+
+ÇIKTI FORMATI:
+⚡ Shorts/TikTok Senaryosu
+
+🔥 AÇILIŞ (0-3 saniye):
+[Çarpıcı soru/iddia]
+
+💥 ANA MESAJ (3-{shorts_main_end} saniye):
+[Hızlı bilgi aktarımı]
+
+✨ KAPANIŞ:
+[Güçlü sonuç ve çağrı]
+
+📱 HASHTAGS: #viral #trending [konuya özel]
+
+Ton: {tone_style}""",
+
+        "social": """Sen {persona_style} sosyal medya uzmanısın. Verilen içerikten {length_guide} uzunluğunda sosyal medya paylaşımı oluşturacaksın.
+
+PERSONA: {persona_voice} ses tonu kullan
+SOSYAL MEDYA KRİTERLERİ:
+• Dikkat çekici açılış
+• Ana mesajı net ver
+• Etkileşimi artıracak içerik
+• Uygun hashtag'ler
+• Call-to-action
+
+ÇIKTI FORMATI:
+📱 Sosyal Medya Paylaşımı:
+[Ana içerik]
+
+#hashtag #tag
+
+Ton: {tone_style}""",
+
+        "seo": """Sen {persona_style} SEO uzmanısın. Verilen içerik için kapsamlı SEO paketi oluşturacaksın.
+
+PERSONA: {persona_voice} yaklaşım kullan
+SEO KRİTERLERİ:
+• Anahtar kelime optimizasyonu
+• Meta açıklama
+• Başlık önerileri
+• Hashtag stratejisi
+• İçerik yapısı
+
+ÇIKTI FORMATI:
+🔍 SEO Paketi:
+
+📝 Başlık Önerileri:
+• [3 farklı başlık seçeneği]
+
+📄 Meta Açıklama:
+[155 karakter meta açıklama]
+
+🏷️ Anahtar Kelimeler:
+[Ana ve destekleyici anahtar kelimeler]
+
+#️⃣ Hashtag Önerileri:
+[Platform bazlı hashtag'ler]
+
+Ton: {tone_style}""",
+    },
+    "en": {
+        "summary": """You are an expert content analyst and summarization specialist with {persona_style} approach. Your task is to create a {tone_style} summary of the given content.
+
+PERSONA: Use {persona_voice} tone
+SUMMARIZATION CRITERIA:
+• Extract key ideas and important details
+• Format as {length_guide}
+• Remove unnecessary repetition
+• Create logical flow and structure  
+• Highlight key concepts
+• Use clear and fluent language
+
+OUTPUT FORMAT:
+📋 Key Points:
+• [Specific and valuable information for each point]
+
+📝 Summary:
+[Overall assessment and conclusion of the topic]
+
+Tone: {tone_style}""",
+
+        "youtube": """You are a professional YouTube content writer with {persona_style} approach. Create a {length_guide} YouTube video script from the given topic.
+
+PERSONA: Use {persona_voice} tone
+SCRIPT CRITERIA:
+• Start with an engaging hook
+• Process main topics in logical order
+• Ask engaging questions for viewers
+• Provide examples and practical information
+• Create a strong conclusion
+• Include call-to-action
+
+OUTPUT FORMAT:
+🎬 YouTube Video Script
+
+🚀 INTRO (0-15 seconds):
+[Engaging opening, hook]
+
+📚 MAIN CONTENT:
+[Section 1: Basic information]
+[Section 2: Details and examples]
+[Section 3: Practical applications]
+
+🎯 CONCLUSION:
+[Summary and call-to-action]
+
+Tone: {tone_style}""",
+
+        "shorts": """You are a viral content expert with {persona_style} approach. Create a {length_guide} YouTube Shorts/TikTok script from the given topic.
+
+PERSONA: Use {persona_voice} tone
+SHORTS CRITERIA:
+• Grab attention in first 3 seconds
+• Fast-paced and dynamic
+• Include visual descriptions
+• Use trending hashtags
+• High viral potential
+• Re-watchable quality
+
+OUTPUT FORMAT:
+⚡ Shorts/TikTok Script
+
+🔥 OPENING (0-3 seconds):
+[Striking question/claim]
+
+💥 MAIN MESSAGE (3-{shorts_main_end} seconds):
+[Rapid information delivery]
+
+✨ CLOSING:
+[Strong conclusion and call]
+
+📱 HASHTAGS: #viral #trending [topic-specific]
+
+Tone: {tone_style}""",
+
+        "social": """You are a social media expert with {persona_style} approach. Create a {length_guide} social media post from the given content.
+
+PERSONA: Use {persona_voice} tone
+SOCIAL MEDIA CRITERIA:
+• Attention-grabbing opening
+• Clear main message
+• Engagement-boosting content
+• Appropriate hashtags
+• Call-to-action
+
+OUTPUT FORMAT:
+📱 Social Media Post:
+[Main content]
+
+#hashtag #tag
+
+Tone: {tone_style}""",
+
+        "seo": """You are an SEO expert with {persona_style} approach. Create a comprehensive SEO package for the given content.
+
+PERSONA: Use {persona_voice} approach
+SEO CRITERIA:
+• Keyword optimization
+• Meta description
+• Title suggestions
+• Hashtag strategy
+• Content structure
+
+OUTPUT FORMAT:
+🔍 SEO Package:
+
+📝 Title Suggestions:
+• [3 different title options]
+
+📄 Meta Description:
+[155 character meta description]
+
+🏷️ Keywords:
+[Primary and supporting keywords]
+
+#️⃣ Hashtag Suggestions:
+[Platform-specific hashtags]
+
+Tone: {tone_style}""",
+    },
+}
+
+
+def _system_fields(task: str, lang: str) -> Callable[..., Dict[str, str]]:
+    def fields(tone: str, length: str, persona: str) -> Dict[str, str]:
+        persona_config = PERSONAS.get(persona, PERSONAS["generic"])[lang]
+        return {
+            "persona_style": persona_config["style"],
+            "persona_voice": persona_config["voice"],
+            "tone_style": TONE_STYLES[tone][lang],
+            "length_guide": LENGTH_GUIDE[length][task],
+            "shorts_main_end": LENGTH_GUIDE[length]["shorts"].split("-")[0],
+        }
+    return fields
+
+
+for _lang, _tasks in SYSTEM_TEMPLATES.items():
+    for _task, _text in _tasks.items():
+        register(PromptTemplate(
+            name=f"system/{_task}/{_lang}",
+            version=1,
+            text=_text,
+            space={"tone": ROUTER_TONES, "length": LENGTHS, "persona": PERSONA_NAMES},
+            fields=_system_fields(_task, _lang),
+        ))
+
+
+def system_message(task: str, lang: str, tone: str, length: str, persona: str) -> str:
+    """System message for a Router chat task"""
+    template_lang = "tr" if lang == "tr" else "en"
+    name = f"system/{task}/{template_lang}"
+    if name in _templates:
+        return _templates[name].prefix(tone=tone, length=length, persona=persona)
+
+    persona_style = PERSONAS.get(persona, PERSONAS["generic"])[template_lang]["style"]
+    return f"You are a helpful {task} content creator with {persona_style} approach. Create {tone} content in {lang}."
+
+
+# User messages start with the static task description and end with the
+# per-request content, so only the tail differs between requests
+for _lang, _text in {
+    "tr": "Görev: {task} oluştur\nTon: {tone}\nUzunluk: {length}\nPersona: {persona}\n",
+    "en": "Task: Create {task}\nTone: {tone}\nLength: {length}\nPersona: {persona}\n",
+}.items():
+    register(PromptTemplate(
+        name=f"user/{_lang}",
+        version=1,
+        text=_text,
+        space={"task": ROUTER_TASKS, "tone": ROUTER_TONES, "length": LENGTHS, "persona": PERSONA_NAMES},
+        fields=lambda task, tone, length, persona, _lang=_lang: {
+            "task": task.title() if _lang == "tr" else task,
+            "tone": tone.title(),
+            "length": length.title(),
+            "persona": persona.title(),
+        },
+    ))
+
+for _lang, _text in {
+    "tr": "Görev: {task} oluştur\nPersona: {persona}\n",
+    "en": "Task: Create {task}\nPersona: {persona}\n",
+}.items():
+    register(PromptTemplate(
+        name=f"user_all/{_lang}",
+        version=1,
+        text=_text,
+        space={"task": ROUTER_TASKS, "persona": PERSONA_NAMES},
+        fields=lambda task, persona, _lang=_lang: {
+            "task": task.title() if _lang == "tr" else task,
+            "persona": persona.title(),
+        },
+    ))
+
+CONTENT_HEADERS = {
+    "tr": "İçerik Türü: {content_type}\nİçerik Uzunluğu: {content_length} karakter\n\nİÇERİK:\n",
+    "en": "Content Type: {content_type}\nContent Length: {content_length} characters\n\nCONTENT:\n",
+}
+
+CONTENT_FOOTERS = {
+    "tr": "\n\nLütfen yukarıdaki içeriği belirtilen kriterlere göre işle ve kaliteli bir çıktı oluştur.",
+    "en": "\n\nPlease process the above content according to the specified criteria and create a high-quality output.",
+}
+
+SEO_PROMPTS = {
+    "tr": ("İçerik: ", "...\n\nYukarıdaki içerik için kapsamlı SEO paketi oluştur."),
+    "en": ("Content: ", "...\n\nCreate a comprehensive SEO package for the above content."),
+}
+
+
+def user_message(
+    content: str,
+    content_type: str,
+    lang: str,
+    task: str,
+    persona: str,
+    tone: Optional[str] = None,
+    length: Optional[str] = None
+) -> str:
+    """
+    User message for a Router chat task
+
+    Without tone and length this is the shorter variant used by
+    /generate-all, where those are fixed per task.
+    """
+    template_lang = "tr" if lang == "tr" else "en"
+    if tone is None or length is None:
+        prefix = get_template(f"user_all/{template_lang}").prefix(task=task, persona=persona)
+    else:
+        prefix = get_template(f"user/{template_lang}").prefix(
+            task=task, tone=tone, length=length, persona=persona
+        )
+
+    header = CONTENT_HEADERS[template_lang].format(
+        content_type=content_type, content_length=len(content)
+    )
+    return prefix + header + content + CONTENT_FOOTERS[template_lang]
+
+
+def seo_user_message(content: str, lang: str) -> str:
+    """User message for the SEO package task"""
+    prefix, suffix = SEO_PROMPTS["tr" if lang == "tr" else "en"]
+    return prefix + content + suffix
@@ -0,0 +1,247 @@
+"""
+Latency-aware selection between equivalent inference targets
+EWMA latency and error tracking per target, with failover and hedged requests
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from app.logs import get_logger
+
+
+logger = get_logger(__name__)
+
+# Latencies kept per target for percentile estimates
+LATENCY_WINDOW = 100
+
+# Samples needed before a target's own p95 is trusted for hedging
+MIN_PERCENTILE_SAMPLES = 20
+
+
+class TargetStats:
+    """Smoothed latency and error rate of one target"""
+
+    def __init__(self, target: str, alpha: float = 0.2):
+        self.target = target
+        self.alpha = alpha
+        self.latency: Optional[float] = None  # EWMA of successful call latency (s)
+        self.error_rate = 0.0  # EWMA of failures (0..1)
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.recent: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record_success(self, latency: float) -> None:
+        self.calls += 1
+        self.recent.append(latency)
+        self.latency = latency if self.latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency
+        )
+        self.error_rate *= 1 - self.alpha
+
+    def record_cancelled(self, elapsed: float) -> None:
+        # The call would have taken at least this long; keep the tail visible
+        # to percentiles without feeding a lower bound into the EWMA
+        self.recent.append(elapsed)
+
+    def record_failure(self) -> None:
+        self.calls += 1
+        self.failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over the recent window, if there are enough samples"""
+        if len(self.recent) < MIN_PERCENTILE_SAMPLES:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def score(self, default_latency: float) -> float:
+        """Expected cost of routing to this target (lower is better)"""
+        latency = self.latency if self.latency is not None else default_latency
+        # A target that fails half the time costs about two attempts
+        return latency * (1 + self.in_flight * 0.1) / max(1.0 - self.error_rate, 0.05)
+
+    def to_dict(self) -> Dict[str, Any]:
+        p95 = self.percentile(0.95)
+        return {
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+        }
+
+
+class RejectedRequestError(Exception):
+    """
+    A target rejected the request itself (a 4xx other than 429)
+
+    Every equivalent target would reject it too, so it is neither failed
+    over nor counted against the target's health.
+    """
+
+
+class AllTargetsFailedError(Exception):
+    """Raised when every target failed for a request"""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        details = "; ".join(f"{target}: {error}" for target, error in errors.items())
+        super().__init__(f"All inference targets failed: {details}")
+
+
+class ProviderRouter:
+    """
+    Routes calls to the best of several equivalent targets
+
+    Targets are ranked by EWMA latency inflated by their EWMA error rate.
+    A failed call (server error, 429, timeout or network error) fails over
+    to the next target; a rejected request is raised at once. With hedging enabled, a
+    duplicate call goes to the runner-up once the first call has taken
+    longer than the first target's p95; the first result wins and the
+    other call is cancelled. Hedges are capped at a share of requests so
+    a degraded target cannot double the load on the others.
+    """
+
+    def __init__(
+        self,
+        targets: List[str],
+        hedge: bool = True,
+        hedge_delay: float = 2.0,
+        max_hedge_ratio: float = 0.1,
+        explore_rate: float = 0.05,
+        alpha: float = 0.2
+    ):
+        if not targets:
+            raise ValueError("At least one inference target is required")
+        self.targets = list(dict.fromkeys(targets))
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay  # Used until a target has enough samples
+        self.max_hedge_ratio = max_hedge_ratio  # Caps the extra load hedging adds
+        self.explore_rate = explore_rate
+        self.stats = {target: TargetStats(target, alpha) for target in self.targets}
+        self.requests = 0
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+
+    def ranked(self, explore: bool = True) -> List[str]:
+        """Targets in routing order, best first"""
+        known = [s.latency for s in self.stats.values() if s.latency is not None]
+        # Untried targets are assumed to be as fast as the typical one
+        default_latency = sorted(known)[len(known) // 2] if known else 0.0
+        order = sorted(
+            self.targets,
+            key=lambda target: (self.stats[target].score(default_latency), self.targets.index(target))
+        )
+        # Occasionally lead with another target so its stats stay current
+        if explore and len(order) > 1 and random.random() < self.explore_rate:
+            pick = random.randrange(1, len(order))
+            order.insert(0, order.pop(pick))
+        return order
+
+    def hedge_after(self, target: str) -> float:
+        """Seconds to wait on a target before sending a hedged duplicate"""
+        p95 = self.stats[target].percentile(0.95)
+        return p95 if p95 is not None else self.hedge_delay
+
+    def can_hedge(self) -> bool:
+        return self.hedge and self.hedged_calls < self.max_hedge_ratio * self.requests
+
+    async def _attempt(self, target: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        stats = self.stats[target]
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            result = await call(target)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the target's health
+            stats.record_cancelled(time.perf_counter() - start)
+            raise
+        except RejectedRequestError:
+            stats.calls += 1
+            raise
+        except Exception as e:
+            stats.record_failure()
+            logger.warning(
+                "target_failed", stage="hf", target=target, error=str(e),
+                duration_ms=round((time.perf_counter() - start) * 1000, 1)
+            )
+            raise
+        finally:
+            stats.in_flight -= 1
+        stats.record_success(time.perf_counter() - start)
+        return result
+
+    async def call(self, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        Run `call(target)` against the best target
+
+        Args:
+            call: Coroutine function performing the request for one target
+
+        Returns:
+            Result of the first successful call
+
+        Raises:
+            AllTargetsFailedError: If every target failed
+            RejectedRequestError: If a target rejected the request itself
+        """
+        self.requests += 1
+        queue = self.ranked()
+        primary = queue[0]
+        errors: Dict[str, BaseException] = {}
+        pending: Dict[asyncio.Task, str] = {}
+
+        def launch() -> None:
+            target = queue.pop(0)
+            pending[asyncio.ensure_future(self._attempt(target, call))] = target
+
+        launch()
+        hedged = False
+        try:
+            while pending:
+                timeout = None
+                if not hedged and queue and len(pending) == 1 and self.can_hedge():
+                    timeout = self.hedge_after(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # First target is slower than its p95: race a duplicate
+                    hedged = True
+                    self.hedged_calls += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    target = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and target != primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if isinstance(task.exception(), RejectedRequestError):
+                        raise task.exception()
+                    errors[target] = task.exception()
+
+                # Fail over to the next target if nothing else is running
+                if not pending and queue:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise AllTargetsFailedError(errors)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-target statistics in routing order"""
+        return {
+            "targets": {target: self.stats[target].to_dict() for target in self.ranked(explore=False)},
+            "requests": self.requests,
+            "hedged_calls": self.hedged_calls,
+            "hedge_wins": self.hedge_wins,
+        }
@@ -0,0 +1,269 @@
+"""
+Cost-weighted rate limiting for generation requests
+Token buckets that charge each request its estimated inference cost
+"""
+
+import math
+import time
+from typing import Dict, Optional
+from cachetools import TTLCache
+from app.config import get_settings
+from app.generator import MAX_NEW_TOKENS, CHUNK_SUMMARY_LENGTH
+from app.tokens import count_tokens
+from app.condense import condense_budget, condense_for_mode
+
+
+# Instruction text that every prompt template adds around the input
+PROMPT_OVERHEAD_TOKENS = 150
+
+# Characters per token assumed for text that has not been read yet
+CHARS_PER_TOKEN = 4
+
+
+class BudgetExceededError(Exception):
+    """Raised when a client does not have enough budget left for a request"""
+
+    def __init__(self, cost: int, remaining: int, capacity: int, retry_after: float):
+        self.cost = cost
+        self.remaining = remaining
+        self.capacity = capacity
+        self.retry_after = retry_after
+        super().__init__(
+            f"Request cost {cost} exceeds remaining budget {remaining}"
+        )
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+
+    @property
+    def remaining(self) -> float:
+        """Tokens currently available"""
+        self._refill()
+        return self.tokens
+
+    def try_consume(self, amount: float) -> bool:
+        """Take `amount` tokens if available"""
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def retry_after(self, amount: float) -> float:
+        """Seconds until `amount` tokens will be available"""
+        self._refill()
+        missing = amount - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_rate if self.refill_rate > 0 else float("inf")
+
+
+def estimate_generation_cost(text: str, mode: str, model: Optional[str] = None) -> int:
+    """
+    Estimate the inference cost of a generation request in tokens
+
+    Mirrors the call pattern of `generate_content`: the text is condensed
+    to the mode's token budget, and texts still longer than the chunk size
+    go through a map stage (one summarization call per chunk) followed by
+    a final generation call over the combined summaries. Condensed texts
+    are cached, so the generation that follows reuses this condensation.
+
+    Args:
+        text: Input text
+        mode: Generation mode (summary, youtube, shorts)
+        model: Generation model of the request's route (default `gen_model`)
+
+    Returns:
+        Estimated cost covering prompt tokens, output tokens and per-call overhead
+    """
+    settings = get_settings()
+    max_new_tokens = MAX_NEW_TOKENS.get(mode, max(MAX_NEW_TOKENS.values()))
+    model = model or settings.gen_model
+    text = condense_for_mode(text, mode, model)
+    input_tokens = count_tokens(text, model)
+
+    if len(text) <= settings.max_chunk_size:
+        calls = 1
+        prompt_tokens = input_tokens + PROMPT_OVERHEAD_TOKENS
+        output_tokens = max_new_tokens
+    else:
+        chunks = math.ceil(len(text) / settings.max_chunk_size)
+        chunk_summary = CHUNK_SUMMARY_LENGTH.get(mode, max(CHUNK_SUMMARY_LENGTH.values()))
+        calls = chunks + 1
+        # Map stage reads every chunk, reduce stage reads every chunk summary
+        prompt_tokens = input_tokens + chunks * chunk_summary + PROMPT_OVERHEAD_TOKENS
+        output_tokens = chunks * chunk_summary + max_new_tokens
+
+    return prompt_tokens + output_tokens + calls * settings.generate_cost_per_call
+
+
+def estimate_url_generation_cost(mode: str, page_chars: Optional[int] = None) -> int:
+    """
+    Estimate the inference cost of generating from a page URL
+
+    Mirrors the call pattern of `generate_content_streamed`: chunks are
+    mapped until their input reaches the mode's condense budget, and the
+    summaries plus any unmapped text are condensed for the final call.
+    The page is not read before the charge, so the up-front estimate
+    assumes a page of `max_input_chars` characters; once the page has been
+    read, the estimate for its real length settles the charge.
+
+    Args:
+        mode: Generation mode (summary, youtube, shorts)
+        page_chars: Characters of the page text (default `max_input_chars`)
+
+    Returns:
+        Estimated cost covering prompt tokens, output tokens and per-call overhead
+    """
+    settings = get_settings()
+    max_new_tokens = MAX_NEW_TOKENS.get(mode, max(MAX_NEW_TOKENS.values()))
+    chunk_summary = CHUNK_SUMMARY_LENGTH.get(mode, max(CHUNK_SUMMARY_LENGTH.values()))
+    if page_chars is None:
+        page_chars = settings.max_input_chars
+    page_chars = min(page_chars, settings.max_input_chars)
+    budget = condense_budget(mode)
+
+    if page_chars <= settings.max_chunk_size:
+        input_tokens = page_chars // CHARS_PER_TOKEN
+        if budget is not None:
+            input_tokens = min(input_tokens, budget)
+        prompt_tokens = input_tokens + PROMPT_OVERHEAD_TOKENS
+        return prompt_tokens + max_new_tokens + settings.generate_cost_per_call
+
+    mapped_chars = page_chars
+    if budget is not None:
+        # The chunk that crosses the budget is still mapped
+        mapped_chars = min(page_chars, budget * CHARS_PER_TOKEN + settings.max_chunk_size)
+    chunks = math.ceil(mapped_chars / settings.max_chunk_size)
+    final_tokens = chunks * chunk_summary + (page_chars - mapped_chars) // CHARS_PER_TOKEN
+    if budget is not None:
+        final_tokens = min(final_tokens, budget)
+
+    # Map stage reads the mapped chunks, reduce stage reads the condensed rest
+    prompt_tokens = mapped_chars // CHARS_PER_TOKEN + final_tokens + PROMPT_OVERHEAD_TOKENS
+    output_tokens = chunks * chunk_summary + max_new_tokens
+    return prompt_tokens + output_tokens + (chunks + 1) * settings.generate_cost_per_call
+
+
+class CostLimiter:
+    """Per-client token buckets charged by estimated request cost"""
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_second: float,
+        client_budgets: Optional[Dict[str, float]] = None,
+        max_clients: int = 10000
+    ):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.client_budgets = client_budgets or {}
+
+        # An idle bucket is full again after capacity / rate seconds, so
+        # expiring it after that long loses no state
+        largest = max([capacity, *self.client_budgets.values()])
+        full_refill = largest / refill_per_second if refill_per_second > 0 else 24 * 60 * 60
+        self._buckets: TTLCache = TTLCache(maxsize=max_clients, ttl=max(full_refill, 1.0))
+
+    def _bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            capacity = self.client_budgets.get(client_id, self.capacity)
+            # Custom budgets refill proportionally to their size
+            rate = self.refill_per_second * capacity / self.capacity if self.capacity else 0.0
+            bucket = TokenBucket(capacity, rate)
+        # Re-inserting refreshes the expiry of active clients
+        self._buckets[client_id] = bucket
+        return bucket
+
+    def charge(self, client_id: str, cost: int) -> int:
+        """
+        Charge a request against the client's budget
+
+        Requests costing more than the whole budget are charged the full
+        budget so that they can still run once the bucket is full.
+
+        Returns:
+            Remaining budget after the charge
+
+        Raises:
+            BudgetExceededError: If the client cannot afford the request yet
+        """
+        bucket = self._bucket(client_id)
+        amount = min(cost, bucket.capacity)
+
+        if not bucket.try_consume(amount):
+            raise BudgetExceededError(
+                cost=cost,
+                remaining=int(bucket.tokens),
+                capacity=int(bucket.capacity),
+                retry_after=bucket.retry_after(amount)
+            )
+
+        return int(bucket.tokens)
+
+    def refund(self, client_id: str, cost: int) -> int:
+        """
+        Give back a charge whose request failed before producing a result
+
+        Returns:
+            Remaining budget after the refund
+        """
+        return self.settle(client_id, cost, 0)
+
+    def settle(self, client_id: str, cost: int, actual_cost: int) -> int:
+        """
+        Give back the part of a charge that a request turned out not to need
+
+        Args:
+            client_id: Client that was charged
+            cost: Estimated cost the request was charged
+            actual_cost: Cost of what the request actually did
+
+        Returns:
+            Remaining budget after the adjustment
+        """
+        bucket = self._bucket(client_id)
+        unused = min(cost, bucket.capacity) - min(actual_cost, bucket.capacity)
+        if unused > 0:
+            bucket.tokens = min(bucket.capacity, bucket.remaining + unused)
+        return int(bucket.remaining)
+
+    def budget_headers(self, client_id: str, cost: int, remaining: int) -> Dict[str, str]:
+        """Response headers describing the client's budget"""
+        bucket = self._bucket(client_id)
+        return {
+            "X-Budget-Limit": str(int(bucket.capacity)),
+            "X-Budget-Remaining": str(max(remaining, 0)),
+            "X-Budget-Cost": str(cost),
+        }
+
+
+# Global limiter instance
+_cost_limiter: Optional[CostLimiter] = None
+
+
+def get_cost_limiter() -> CostLimiter:
+    """Get the global cost limiter instance"""
+    global _cost_limiter
+    if _cost_limiter is None:
+        settings = get_settings()
+        _cost_limiter = CostLimiter(
+            capacity=settings.generate_budget_capacity,
+            refill_per_second=settings.generate_budget_refill_per_second,
+            client_budgets=settings.generate_client_budgets,
+        )
+    return _cost_limiter
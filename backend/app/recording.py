@@ -0,0 +1,182 @@
+"""
+Traffic recording for replay
+Records anonymized shapes and timings of /extract and /generate requests
+"""
+
+import asyncio
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from app.condense import SENTENCE_SPLIT_RE
+from app.hashing import content_digest
+from app.logs import get_logger
+from app.tracing import JsonlWriter
+
+
+logger = get_logger(__name__)
+
+RECORDED_PATHS = ("/extract", "/generate")
+
+# Hex digits kept of each sentence digest: enough to tell the sentences
+# of a workload apart, too few to look a sentence up
+SENTENCE_DIGEST_CHARS = 8
+
+# Bodies beyond this size are not inspected
+MAX_CAPTURE_BYTES = 1024 * 1024
+
+GENERATE_PARAMS = ("mode", "tone", "length", "lang")
+
+
+def text_shape(text: str) -> Dict[str, Any]:
+    """
+    Shape of a text without its words
+
+    Its digest tells exact repeats apart; the digest and length of every
+    sentence, grouped by paragraph, let a replay rebuild a text that
+    repeats (or nearly repeats) other texts exactly where the original did.
+    """
+    paragraphs = []
+    for paragraph in text.split("\n\n"):
+        sentences = [sentence for sentence in SENTENCE_SPLIT_RE.split(paragraph) if sentence.strip()]
+        if sentences:
+            paragraphs.append([
+                [content_digest(sentence)[:SENTENCE_DIGEST_CHARS], len(sentence)] for sentence in sentences
+            ])
+    return {"digest": content_digest(text), "chars": len(text), "paragraphs": paragraphs}
+
+
+def url_shape(url: str) -> Dict[str, Any]:
+    """Host of a URL and a digest of the whole URL"""
+    return {"host": urlsplit(url.strip()).hostname or "", "url_digest": content_digest(url.strip())}
+
+
+class TrafficRecorder:
+    """
+    Writes one anonymized record per /extract and /generate request
+
+    Texts are reduced to `text_shape`, URLs to `url_shape` and client
+    addresses to a digest salted per process; generation parameters,
+    status, duration and the cache outcome are kept as they are.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.writer = JsonlWriter(path, max_bytes)
+        self.salt = secrets.token_hex(8)
+        self.recorded = 0
+
+    def record(
+        self,
+        path: str,
+        client: str,
+        started_at: float,
+        duration: float,
+        status: int,
+        request_body: bytes,
+        response_body: bytes
+    ) -> None:
+        """Shape and append one request (runs in a worker thread)"""
+        try:
+            record = {
+                "ts": round(started_at, 3),
+                "path": path,
+                "status": status,
+                "duration_ms": round(duration * 1000, 1),
+                "client": content_digest(self.salt + client)[:12],
+                **self._shape(path, request_body, response_body if status == 200 else b""),
+            }
+            self.writer.append(record)
+            self.recorded += 1
+        except Exception as e:
+            logger.warning("traffic_record_failed", path=path, error=str(e))
+
+    @staticmethod
+    def _shape(path: str, request_body: bytes, response_body: bytes) -> Dict[str, Any]:
+        response = _json(response_body) or {}
+        if path == "/extract":
+            url = parse_qs(request_body.decode("utf-8", errors="replace")).get("url", [""])[0]
+            shape: Dict[str, Any] = {"input": url_shape(url)}
+            if response:
+                shape["result"] = {
+                    "cached": response.get("cached", False),
+                    "content_id": response.get("content_id"),
+                    "lang": response.get("lang"),
+                    "text": text_shape(response.get("text", "")),
+                }
+            return shape
+
+        request = _json(request_body) or {}
+        if request.get("text"):
+            source = text_shape(request["text"].strip())
+        elif request.get("url"):
+            source = url_shape(request["url"])
+        else:
+            source = {"content_id": request.get("content_id")}
+        shape = {"params": {name: request.get(name) for name in GENERATE_PARAMS}, "input": source}
+        if response:
+            shape["result"] = {
+                "cached": response.get("cached", False),
+                "near_duplicate": response.get("near_duplicate", False),
+                "tokens": response.get("tokens", 0),
+            }
+        return shape
+
+
+def _json(body: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class TrafficRecordingMiddleware:
+    """
+    ASGI middleware passing /extract and /generate requests to a recorder
+
+    Request and response bodies are copied as they stream through; shaping
+    and writing happen in a worker thread after the response is sent.
+    Added last, it is the outermost middleware, so recorded durations
+    cover all the others and cancelled requests are recorded with the
+    status the client got.
+    """
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in RECORDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        request_body = bytearray()
+        response_body = bytearray()
+        status = 500
+
+        async def receive_request():
+            message = await receive()
+            if message["type"] == "http.request" and len(request_body) < MAX_CAPTURE_BYTES:
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def send_response(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and len(response_body) < MAX_CAPTURE_BYTES:
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_request, send_response)
+        finally:
+            duration = time.perf_counter() - start
+            client = scope["client"][0] if scope.get("client") else ""
+            asyncio.get_event_loop().run_in_executor(
+                None, self.recorder.record, scope["path"], client, started_at, duration,
+                status, bytes(request_body), bytes(response_body)
+            )
@@ -0,0 +1,112 @@
+"""
+Model routing policy
+Maps generation mode, length and input size to a model tier
+"""
+
+from typing import Any, Dict, List, Optional
+from app.config import get_settings
+
+
+DEFAULT_TIER = "default"
+
+
+class ModelRoute:
+    """Models chosen to serve one request"""
+
+    def __init__(self, tier: str, sum_model: str, gen_model: str):
+        self.tier = tier
+        self.sum_model = sum_model
+        self.gen_model = gen_model
+
+    def __repr__(self) -> str:
+        return f"ModelRoute({self.tier!r}, sum_model={self.sum_model!r}, gen_model={self.gen_model!r})"
+
+
+class RoutingRule:
+    """
+    One routing rule; every condition that is set must hold
+
+    Args:
+        tier: Tier to route matching requests to
+        modes: Generation modes the rule applies to
+        lengths: Requested output lengths the rule applies to
+        min_chars: Minimum input size in characters
+        max_chars: Maximum input size in characters
+    """
+
+    def __init__(
+        self,
+        tier: str,
+        modes: Optional[List[str]] = None,
+        lengths: Optional[List[str]] = None,
+        min_chars: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ):
+        self.tier = tier
+        self.modes = set(modes) if modes else None
+        self.lengths = set(lengths) if lengths else None
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+
+    def matches(self, mode: str, length: str, input_chars: int) -> bool:
+        if self.modes is not None and mode not in self.modes:
+            return False
+        if self.lengths is not None and length not in self.lengths:
+            return False
+        if self.min_chars is not None and input_chars < self.min_chars:
+            return False
+        if self.max_chars is not None and input_chars > self.max_chars:
+            return False
+        return True
+
+
+class RoutingPolicy:
+    """
+    Ordered routing rules over named model tiers
+
+    The first matching rule picks the tier; requests no rule matches use
+    the default tier (`Settings.sum_model` / `Settings.gen_model`). A tier
+    may override only one of its two models; the other falls back to the
+    default.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, Dict[str, str]],
+        rules: List[Dict[str, Any]],
+        default_sum_model: str,
+        default_gen_model: str
+    ):
+        self.routes = {DEFAULT_TIER: ModelRoute(DEFAULT_TIER, default_sum_model, default_gen_model)}
+        for name, models in tiers.items():
+            self.routes[name] = ModelRoute(
+                name,
+                models.get("sum_model", default_sum_model),
+                models.get("gen_model", default_gen_model)
+            )
+
+        self.rules = [RoutingRule(**rule) for rule in rules]
+        for rule in self.rules:
+            if rule.tier not in self.routes:
+                raise ValueError(f"Routing rule refers to unknown model tier: {rule.tier}")
+
+    def route(self, mode: str, length: str, input_chars: int) -> ModelRoute:
+        """Pick the models for a request"""
+        for rule in self.rules:
+            if rule.matches(mode, length, input_chars):
+                return self.routes[rule.tier]
+        return self.routes[DEFAULT_TIER]
+
+
+# Global routing policy instance
+_policy: Optional[RoutingPolicy] = None
+
+
+def get_routing_policy() -> RoutingPolicy:
+    """Get the global routing policy, built from settings on first use"""
+    global _policy
+    if _policy is None:
+        settings = get_settings()
+        rules = settings.routing_rules if settings.routing_enabled else []
+        _policy = RoutingPolicy(settings.model_tiers, rules, settings.sum_model, settings.gen_model)
+    return _policy
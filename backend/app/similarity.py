@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection for generation inputs
+MinHash signatures over word shingles with an LSH band index
+"""
+
+import re
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# Signature length and LSH banding (bands * rows == permutations). With 32
+# bands of 4 rows, pairs above ~0.6 similarity almost always share a band.
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 32
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Shingles are hashed in blocks to bound the size of the permutation matrix
+BLOCK_SIZE = 4096
+
+WORD_RE = re.compile(r"\w+")
+
+
+class NearDuplicateMatch:
+    """A cached input similar enough to serve the current request"""
+
+    def __init__(self, cache_key: str, similarity: float):
+        self.cache_key = cache_key
+        self.similarity = similarity
+
+
+class MinHasher:
+    """Vectorized MinHash over hashed word shingles"""
+
+    def __init__(self, num_perm: int = NUM_PERMUTATIONS, seed: int = 1):
+        # Fixed seed: signatures must be comparable across requests
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=(num_perm, 1), dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=(num_perm, 1), dtype=np.int64).astype(np.uint64)
+        self.num_perm = num_perm
+
+    def shingles(self, text: str) -> np.ndarray:
+        """32-bit hashes of normalized word shingles"""
+        words = WORD_RE.findall(text.lower())
+        if not words:
+            return np.zeros(0, dtype=np.uint64)
+
+        ids = np.fromiter(
+            (zlib.crc32(word.encode("utf-8")) for word in words),
+            dtype=np.uint64,
+            count=len(words)
+        )
+        if len(ids) < SHINGLE_SIZE:
+            return np.unique(ids)
+
+        # Polynomial combination of each window of word ids (wraps mod 2^64)
+        combined = np.zeros(len(ids) - SHINGLE_SIZE + 1, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for offset in range(SHINGLE_SIZE):
+                combined = combined * np.uint64(1000003) + ids[offset:offset + len(combined)]
+        return np.unique(combined & MAX_HASH)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of text, or None if it has no words"""
+        hashes = self.shingles(text)
+        if len(hashes) == 0:
+            return None
+
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), BLOCK_SIZE):
+            block = hashes[start:start + BLOCK_SIZE][np.newaxis, :]
+            permuted = ((self.a * block + self.b) % MERSENNE_PRIME) & MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature
+
+
+def estimate_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(first == second))
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures, partitioned by request parameters
+
+    Only inputs generated with the same parameters (mode, tone, length,
+    language, prompt version) can match each other.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        min_words: int = 50,
+        max_entries: int = 10000,
+        num_bands: int = NUM_BANDS
+    ):
+        self.threshold = threshold
+        self.min_words = min_words
+        self.max_entries = max_entries
+        self.num_bands = num_bands
+        self.hasher = MinHasher()
+        self.rows = self.hasher.num_perm // num_bands
+
+        self._entries: "OrderedDict[str, Tuple[str, np.ndarray]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, bytes], Set[str]] = {}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature for text, or None if it is too short to compare reliably"""
+        if len(WORD_RE.findall(text)) < self.min_words:
+            return None
+        return self.hasher.signature(text)
+
+    def _band_keys(self, signature: np.ndarray, params_key: str) -> List[Tuple[str, int, bytes]]:
+        return [
+            (params_key, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.num_bands)
+        ]
+
+    def query(
+        self,
+        signature: Optional[np.ndarray],
+        params_key: str,
+        is_live: Callable[[str], bool] = lambda cache_key: True
+    ) -> Optional[NearDuplicateMatch]:
+        """
+        Find the most similar indexed input above the threshold
+
+        Args:
+            signature: Signature of the incoming text
+            params_key: Request parameters the match must share
+            is_live: Whether a cache key still has a cached result
+
+        Returns:
+            Best match, or None
+        """
+        if signature is None:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(signature, params_key):
+            candidates.update(self._buckets.get(key, ()))
+
+        best = None
+        for cache_key in candidates:
+            _, candidate = self._entries[cache_key]
+            similarity = estimate_similarity(signature, candidate)
+            if similarity < self.threshold:
+                continue
+            if not is_live(cache_key):
+                # The cached result expired; the index entry is useless now
+                self.remove(cache_key)
+                continue
+            if best is None or similarity > best.similarity:
+                best = NearDuplicateMatch(cache_key, similarity)
+
+        return best
+
+    def add(self, signature: Optional[np.ndarray], params_key: str, cache_key: str) -> None:
+        """Index the signature of an input whose result is cached under cache_key"""
+        if signature is None:
+            return
+
+        self.remove(cache_key)
+        while len(self._entries) >= self.max_entries:
+            oldest = next(iter(self._entries))
+            self.remove(oldest)
+
+        self._entries[cache_key] = (params_key, signature)
+        for key in self._band_keys(signature, params_key):
+            self._buckets.setdefault(key, set()).add(cache_key)
+
+    def remove(self, cache_key: str) -> None:
+        """Drop an entry from the index"""
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+
+        params_key, signature = entry
+        for key in self._band_keys(signature, params_key):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,148 @@
+"""
+Speculative map stage after text extraction
+Summarizes the chunks of freshly extracted text before its generation is requested
+"""
+
+import asyncio
+from collections import Counter
+from typing import Any, Callable, Dict, Set
+from cachetools import LRUCache
+from app.config import get_settings
+from app.condense import condense_for_mode
+from app.content import StoredContent
+from app.deadline import without_deadline
+from app.generator import (
+    CHUNK_SUMMARY_LENGTH, ChunkSummaryCache, chunk_text, get_chunk_summary_cache, summarize_chunk
+)
+from app.logs import get_logger
+from app.prewarm import PopularityTracker, Variant
+from app.ratelimit import CHARS_PER_TOKEN, TokenBucket
+from app.routing import get_routing_policy
+from app.tokens import TokenUsage
+from app.tracing import span, start_trace
+
+
+logger = get_logger(__name__)
+
+# Texts speculated on recently, so that pages extracted again are skipped
+RECENT_TEXTS = 1024
+
+# Texts speculated on at the same time
+MAX_RUNNING = 2
+
+
+class Speculator:
+    """
+    Runs the map stage of the likely next /generate of an extracted text
+
+    The frontend extracts a page and generates from the returned text a
+    few seconds later. Right after /extract, the text is condensed and
+    chunked exactly as /generate would for the most requested variant
+    (or `speculate_variant` until there is one), and its chunks are
+    summarized one at a time into the chunk summary cache, using the
+    language detected when the text was stored. The matching /generate
+    then finds those summaries, or waits for the one in flight, and only
+    pays for the final call.
+
+    Speculation is low priority: it is skipped while the server serves
+    more than `speculate_max_active_requests` requests and stops when
+    the server gets that busy. Its calls are limited to
+    `speculate_max_chunks` per text and charged to a separate token
+    budget. Speculative summaries that no generation reads are reported
+    as unused, and as wasted once evicted, by the chunk summary cache.
+    """
+
+    def __init__(self, popularity: PopularityTracker, is_busy: Callable[[], bool]):
+        settings = get_settings()
+        self.popularity = popularity
+        self.is_busy = is_busy
+        self.budget = TokenBucket(
+            settings.speculate_budget_tokens_per_hour,
+            settings.speculate_budget_tokens_per_hour / 3600
+        )
+        self.recent: LRUCache = LRUCache(RECENT_TEXTS)
+        self.running: Set[asyncio.Task] = set()
+        self.counts: Counter = Counter()
+
+    def variant(self) -> Variant:
+        """Variant the next generation most likely asks for"""
+        top = self.popularity.top_variants(1)
+        return top[0] if top else Variant.parse(get_settings().speculate_variant)
+
+    def chunk_count(self, content: StoredContent) -> int:
+        """Chunks the map stage of the likely next generation splits a text into"""
+        variant = self.variant()
+        route = get_routing_policy().route(variant.mode, variant.length, len(content.text))
+        return len(content.chunk_sizes(variant.mode, route.gen_model))
+
+    def schedule(self, content: StoredContent) -> None:
+        """Start speculating on an extracted text in the background, if worthwhile"""
+        if self.chunk_count(content) < 2:
+            return
+        if content.digest in self.recent:
+            self.counts["skipped_repeat"] += 1
+            return
+        if self.is_busy() or len(self.running) >= MAX_RUNNING:
+            self.counts["skipped_busy"] += 1
+            return
+
+        self.recent[content.digest] = True
+        task = asyncio.create_task(without_deadline(self.run(content)))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def run(self, content: StoredContent) -> None:
+        """Condense, chunk and map a text for the predicted variant"""
+        settings = get_settings()
+        text = content.text
+        trace = start_trace("speculate")  # Keeps these spans out of the /extract trace
+        variant = self.variant()
+        route = get_routing_policy().route(variant.mode, variant.length, len(text))
+        usage = TokenUsage()
+        mapped = 0
+        try:
+            with span("condense"):
+                text = condense_for_mode(text, variant.mode, route.gen_model)
+            if len(text) <= settings.max_chunk_size:
+                self.counts["single_chunk"] += 1
+                return
+
+            lang = content.lang if variant.lang == "auto" else variant.lang
+            with span("chunk"):
+                chunks = chunk_text(text, settings.max_chunk_size)
+
+            self.counts["started"] += 1
+            summaries = get_chunk_summary_cache()
+            for chunk in chunks[:settings.speculate_max_chunks]:
+                if ChunkSummaryCache.key(chunk, variant.mode, route) in summaries:
+                    continue
+                if self.is_busy():
+                    self.counts["stopped_busy"] += 1
+                    break
+                cost = len(chunk) // CHARS_PER_TOKEN + CHUNK_SUMMARY_LENGTH[variant.mode]
+                if not self.budget.try_consume(cost):
+                    self.counts["stopped_budget"] += 1
+                    break
+                await summarize_chunk(chunk, variant.mode, variant.tone, lang, route, usage, speculative=True)
+                mapped += 1
+        except Exception as e:
+            self.counts["failed"] += 1
+            logger.warning("speculation_failed", error=str(e))
+        finally:
+            trace.finish()
+            self.counts["chunks"] += mapped
+            self.counts["tokens"] += usage.total_tokens
+            if mapped:
+                logger.info(
+                    "speculation", mode=variant.mode, chunks=mapped, tokens=usage.total_tokens,
+                    duration_ms=round(trace.duration * 1000, 1),
+                    stages={name: round(total * 1000, 1) for name, (total, _) in trace.stages().items()},
+                )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.counts,
+            "running": len(self.running),
+            "budget_remaining": int(self.budget.remaining),
+            "summaries": get_chunk_summary_cache().stats(),
+        }
@@ -0,0 +1,261 @@
+"""
+Token counting utilities
+Pluggable per-model token counters with a calibrated fallback estimator
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+from cachetools import LRUCache
+from app.config import get_settings
+from app.logs import get_logger
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+
+# Prompts and articles are counted paragraph by paragraph so that the
+# static instruction blocks at the start of every prompt are only
+# tokenized once. BPE merges never cross a blank line in practice, so
+# the per-paragraph sum matches a full encode closely.
+SEGMENT_SEPARATOR = "\n\n"
+SEPARATOR_TOKENS = 1
+
+# Longer segments are article bodies that rarely repeat; skip memoizing them
+MAX_MEMO_SEGMENT_CHARS = 4000
+
+# Byte classes of the estimator's features, so that a segment is measured
+# with a few C-level passes over its UTF-8 bytes instead of regexes: ASCII
+# bytes are classified as `\w` and `\s` would, and every byte of a
+# non-ASCII character counts as a word character (these are letters in
+# the English and Turkish texts served; rare typographic quotes and dashes
+# count as word characters rather than punctuation)
+SPACE_BYTES = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+WORD_BYTES = bytes(b for b in range(256) if b >= 0x80 or chr(b).isalnum() or b == ord("_"))
+WORD_OR_SPACE_BYTES = WORD_BYTES + SPACE_BYTES
+# Maps word bytes to "a" and all others to " ", so that splitting counts words
+WORD_RUNS = bytes(ord("a") if b in WORD_BYTES else ord(" ") for b in range(256))
+
+# Estimator coefficients: tokens per word, per word character, per
+# punctuation mark and per extra UTF-8 byte. The defaults are set by hand,
+# not fitted: a 4.5-character English word costs 0.55 + 4.5 * 0.17 = 1.3
+# tokens, about what Llama/Mistral-style BPE vocabularies spend; every
+# punctuation mark is its own token; and Turkish letters (ç, ğ, ı, ö, ş, ü)
+# split into a second piece about half of the time. `python -m
+# benchmarks.bench_tokens --fit` fits them to a model's tokenizer by least
+# squares and saves them as the model's estimator.json, which is used in
+# place of the defaults wherever the tokenizer itself is not deployed.
+DEFAULT_COEFFICIENTS = (0.55, 0.17, 1.0, 0.5)
+
+
+logger = get_logger(__name__)
+
+
+class TokenCounter(ABC):
+    """Base class for token counters with per-segment memoization"""
+
+    name = "base"
+
+    def __init__(self, memo_size: int = 4096):
+        self._memo: LRUCache = LRUCache(maxsize=memo_size)
+
+    @abstractmethod
+    def count_segment(self, text: str) -> int:
+        """Count tokens of a single paragraph"""
+
+    def count(self, text: str) -> int:
+        """
+        Count tokens in text
+
+        Args:
+            text: Text to count, typically a full prompt
+
+        Returns:
+            Number of tokens
+        """
+        if not text:
+            return 0
+
+        segments = text.split(SEGMENT_SEPARATOR)
+        total = (len(segments) - 1) * SEPARATOR_TOKENS
+
+        for segment in segments:
+            if not segment:
+                continue
+            if len(segment) > MAX_MEMO_SEGMENT_CHARS:
+                total += self.count_segment(segment)
+                continue
+
+            tokens = self._memo.get(segment)
+            if tokens is None:
+                tokens = self.count_segment(segment)
+                self._memo[segment] = tokens
+            total += tokens
+
+        return total
+
+
+class TokenizerFileCounter(TokenCounter):
+    """Exact counts from a local `tokenizer.json` definition"""
+
+    name = "tokenizer"
+
+    def __init__(self, path: str, memo_size: int = 4096):
+        super().__init__(memo_size)
+        self.path = path
+        self.tokenizer = Tokenizer.from_file(path)
+
+    def count_segment(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+class EstimatorCounter(TokenCounter):
+    """
+    Fast linear estimate from word, character and byte statistics
+
+    The features add up over paragraphs, so a whole text is measured in
+    one pass instead of paragraph by paragraph through the memo; a cold
+    count costs about as much as `len(text.split())`.
+    """
+
+    name = "estimator"
+
+    def __init__(self, coefficients=DEFAULT_COEFFICIENTS, memo_size: int = 4096):
+        super().__init__(memo_size)
+        self.coefficients = tuple(coefficients)
+
+    def _estimate(self, text: str) -> int:
+        words, word_chars, punct, extra_bytes = segment_features(text)
+        w_words, w_chars, w_punct, w_bytes = self.coefficients
+        return max(1, round(w_words * words + w_chars * word_chars + w_punct * punct + w_bytes * extra_bytes))
+
+    def count_segment(self, text: str) -> int:
+        return self._estimate(text)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return self._estimate(text) + text.count(SEGMENT_SEPARATOR) * SEPARATOR_TOKENS
+
+
+def segment_features(text: str) -> Tuple[int, int, int, int]:
+    """Words, word characters, punctuation marks and extra UTF-8 bytes of a text"""
+    data = text.encode("utf-8")
+    words = len(data.translate(WORD_RUNS).split())
+    punct = len(data.translate(None, WORD_OR_SPACE_BYTES))
+    spaces = len(data) - len(data.translate(None, SPACE_BYTES))
+    return words, len(text) - punct - spaces, punct, len(data) - len(text)
+
+
+def fit_coefficients(segments: Sequence[str], counts: Sequence[int]) -> Tuple[float, float, float, float]:
+    """
+    Fit estimator coefficients to exact token counts
+
+    Args:
+        segments: Sample paragraphs, covering the languages the model sees
+        counts: Exact token count of each paragraph
+
+    Returns:
+        Non-negative least-squares coefficients in `DEFAULT_COEFFICIENTS` order
+    """
+    import numpy as np
+
+    features = np.array([segment_features(segment) for segment in segments], dtype=np.float64)
+    targets = np.asarray(counts, dtype=np.float64)
+    active = list(range(features.shape[1]))
+    # Drop features whose weight comes out negative and refit without them
+    while True:
+        weights, *_ = np.linalg.lstsq(features[:, active], targets, rcond=None)
+        if (weights >= 0).all():
+            break
+        active.pop(int(np.argmin(weights)))
+    coefficients = [0.0] * features.shape[1]
+    for index, weight in zip(active, weights):
+        coefficients[index] = round(float(weight), 4)
+    return tuple(coefficients)
+
+
+def tokenizer_path(model: str, filename: str = "tokenizer.json") -> str:
+    """Local tokenizer definition path for a model (org/name -> org--name)"""
+    settings = get_settings()
+    return os.path.join(settings.tokenizer_dir, model.replace("/", "--"), filename)
+
+
+def load_coefficients(model: str) -> Optional[List[float]]:
+    """Fitted estimator coefficients of a model, if `bench_tokens --fit` saved them"""
+    path = tokenizer_path(model, "estimator.json")
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            coefficients = json.load(f)["coefficients"]
+        if len(coefficients) != len(DEFAULT_COEFFICIENTS):
+            raise ValueError(f"expected {len(DEFAULT_COEFFICIENTS)} coefficients")
+        return [float(value) for value in coefficients]
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        logger.warning("estimator_load_failed", model=model, path=path, error=str(e))
+        return None
+
+
+# Counters are built once per model
+_counters: Dict[str, TokenCounter] = {}
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """
+    Get the token counter for a model
+
+    Uses the model's local tokenizer definition when it exists and the
+    `tokenizers` package is installed, otherwise the estimator with the
+    model's fitted coefficients (or the defaults).
+    """
+    counter = _counters.get(model)
+    if counter is not None:
+        return counter
+
+    path = tokenizer_path(model)
+    if Tokenizer is not None and os.path.isfile(path):
+        try:
+            counter = TokenizerFileCounter(path)
+        except Exception as e:
+            logger.warning("tokenizer_load_failed", model=model, path=path, error=str(e))
+
+    if counter is None:
+        counter = EstimatorCounter(load_coefficients(model) or DEFAULT_COEFFICIENTS)
+
+    _counters[model] = counter
+    return counter
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens for a model (defaults to the generation model)"""
+    return get_token_counter(model or get_settings().gen_model).count(text)
+
+
+class TokenUsage:
+    """Prompt and completion tokens accumulated over a request's inference calls"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def record(self, model: str, prompt: str, completion: str) -> None:
+        """Count one inference call with the model's own counter"""
+        counter = get_token_counter(model)
+        self.prompt_tokens += counter.count(prompt)
+        self.completion_tokens += counter.count(completion)
+        self.calls += 1
+
+    def add(self, other: "TokenUsage") -> None:
+        """Count the calls of another usage as well"""
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.calls += other.calls
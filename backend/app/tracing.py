@@ -0,0 +1,241 @@
+"""
+Request tracing and on-demand profiling
+Per-request stage spans reported as Server-Timing headers and trace files
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+# Client-supplied request IDs are kept only if they look like IDs; they
+# name profile files and are echoed in a response header
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class Trace:
+    """Stage spans recorded while handling one request"""
+
+    def __init__(self, name: str, request_id: Optional[str] = None):
+        self.name = name
+        if not request_id or not REQUEST_ID_RE.fullmatch(request_id):
+            request_id = uuid.uuid4().hex[:16]
+        self.request_id = request_id
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Tuple[str, float, float]] = []
+        self.attributes: Dict[str, Any] = {}
+
+    def annotate(self, **attributes: Any) -> None:
+        """Attach attributes (e.g. cache key and outcome) to the trace"""
+        self.attributes.update(attributes)
+
+    def add(self, name: str, start: float, duration: float) -> None:
+        self.spans.append((name, start - self.start, duration))
+
+    def finish(self) -> float:
+        self.duration = time.perf_counter() - self.start
+        return self.duration
+
+    def stages(self) -> "OrderedDict[str, Tuple[float, int]]":
+        """Total duration and count per stage name, in first-seen order"""
+        totals: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        for name, _, duration in self.spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        return totals
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)"""
+        entries = []
+        for name, (total, count) in self.stages().items():
+            entry = f"{_metric_name(name)};dur={total * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        if self.duration is not None:
+            entries.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0.0) * 1000, 1),
+            "spans": [
+                {"stage": name, "offset_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, offset, duration in self.spans
+            ],
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        return data
+
+
+def _metric_name(name: str) -> str:
+    # Server-Timing metric names must be HTTP tokens
+    return re.sub(r"[^A-Za-z0-9_-]", "-", name)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(name: str, request_id: Optional[str] = None) -> Trace:
+    """Start a trace for the current request context"""
+    trace = Trace(name, request_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    """Trace of the request being handled, if any"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Record the duration of a stage in the current trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+class JsonlWriter:
+    """Appends records to a JSONL file, rotating it at a size limit"""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class TraceWriter(JsonlWriter):
+    """Appends finished traces to a JSONL file, rotating it at a size limit"""
+
+    def write(self, trace: Trace) -> None:
+        self.append(trace.to_dict())
+
+
+class SamplingProfiler:
+    """
+    Stack-sampling profiler for slow requests
+
+    While armed, a background thread samples the stack of the event loop
+    thread. When a request finishes above the slow threshold, the samples
+    taken during it are written as folded stacks (one `frame;frame;... N`
+    line per stack), which flamegraph.pl and speedscope can render.
+    Concurrent requests share the loop thread, so a profile shows
+    everything the process did while the slow request was in flight.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, max_samples: int = 200000):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.remaining = 0
+        self.min_duration = 0.0
+        self._samples: Deque[Tuple[float, str]] = deque(maxlen=max_samples)
+        self._active = 0
+        self._thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def armed(self) -> bool:
+        return self.remaining > 0
+
+    def arm(self, count: int, min_duration_ms: float) -> None:
+        """Capture profiles for the next `count` requests slower than the threshold"""
+        self.remaining = count
+        self.min_duration = min_duration_ms / 1000
+
+    def disarm(self) -> None:
+        self.remaining = 0
+
+    def request_started(self) -> bool:
+        """Begin sampling for a request; returns whether it is being profiled"""
+        if not self.armed:
+            return False
+
+        with self._lock:
+            self._thread_id = threading.get_ident()
+            self._active += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return True
+
+    def request_finished(self, trace: Trace) -> Optional[str]:
+        """
+        Stop sampling for a request and save its profile if it was slow
+
+        Returns:
+            Path of the written profile, or None
+        """
+        with self._lock:
+            self._active -= 1
+            if not self.armed or (trace.duration or 0.0) < self.min_duration:
+                return None
+            self.remaining -= 1
+
+        start = trace.started_at
+        end = start + (trace.duration or 0.0)
+        stacks = Counter(stack for at, stack in list(self._samples) if start <= at <= end)
+        if not stacks:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{trace.request_id}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._active <= 0:
+                    self._thread = None
+                    return
+                thread_id = self._thread_id
+
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                self._samples.append((time.time(), _fold(frame)))
+            time.sleep(self.interval)
+
+
+def _fold(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
@@ -0,0 +1,4 @@
+"""
+Benchmark scripts for Creator Transformer backend
+Run from the backend directory, e.g. `python -m benchmarks.bench_tokens`
+"""
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Pre-condensation benchmark
+Measures sentence scoring time and prompt token savings per mode
+
+Usage:
+    python -m benchmarks.bench_condense [--iterations N]
+"""
+
+import argparse
+import time
+from app.condense import SCORERS, _rankings, condense, condense_for_mode
+from app.config import get_settings
+from app.tokens import count_tokens
+from benchmarks.bench_routing import make_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    print("✂️  Pre-condensation benchmark\n")
+
+    print("Cold scoring time (tokenize, score, count tokens):")
+    for size in [4000, 12000, 50000]:
+        text = make_text(size)
+        for method in SCORERS:
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                _rankings.clear()
+                condense(text, 500, method)
+            elapsed = (time.perf_counter() - start) / args.iterations
+            print(f"  {size:>6} chars  {method:<9} {elapsed * 1e3:8.2f} ms")
+
+    text = make_text(50000)
+    original = count_tokens(text)
+    print(f"\nPrompt input tokens for a {len(text)} char article ({original} tokens):")
+    for mode, budget in settings.condense_budgets.items():
+        condensed = count_tokens(condense_for_mode(text, mode))
+        print(f"  {mode:<8} budget {budget:>5}  →  {condensed:>5} tokens ({condensed / original:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Page extractor benchmark
+Compares the streaming density extractor with the BeautifulSoup extractor on fixture pages
+
+Usage:
+    python -m benchmarks.bench_extract [--iterations N] [--large-kb KB]
+
+Quality is the token F1 of each extractor's paragraphs against the gold
+text of benchmarks/fixtures/extract/<name>.txt. CPU time and peak
+allocated memory are measured on the fixtures and on a large page built
+by padding one fixture with comments and link lists.
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List, Tuple
+from app.condense import WORD_RE
+from app.density import extract_main_paragraphs
+from app.extractors import soup_paragraphs
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "extract"
+
+# Body bytes per network read, as in app.py
+BLOCK_BYTES = 64 * 1024
+
+
+def density(html: bytes) -> List[str]:
+    blocks = (html[i:i + BLOCK_BYTES] for i in range(0, len(html), BLOCK_BYTES))
+    return extract_main_paragraphs(blocks)
+
+
+EXTRACTORS: List[Tuple[str, Callable[[bytes], List[str]]]] = [
+    ("soup", soup_paragraphs),
+    ("density", density),
+]
+
+
+def token_f1(extracted: str, gold: str) -> Tuple[float, float, float]:
+    """Precision, recall and F1 of extracted word tokens against gold tokens"""
+    got = Counter(WORD_RE.findall(extracted.lower()))
+    want = Counter(WORD_RE.findall(gold.lower()))
+    common = sum((got & want).values())
+    precision = common / max(sum(got.values()), 1)
+    recall = common / max(sum(want.values()), 1)
+    f1 = 2 * precision * recall / (precision + recall) if common else 0.0
+    return precision, recall, f1
+
+
+def large_page(kb: int) -> bytes:
+    """The news fixture padded with comments and link lists up to about kb kilobytes"""
+    html = (FIXTURES / "news_article.html").read_text(encoding="utf-8")
+    comment = (
+        '<div class="comment"><div class="author"><a href="/u/{i}">reader{i}</a></div>'
+        '<p>I have been taking the tram for {i} years and I think this is a step in the right direction, '
+        'although the timing could have been better.</p><span class="likes">{i} likes</span></div>\n'
+    )
+    links = '<li><a href="/news/{i}">Another story from the archive, number {i}</a></li>\n'
+    padding = []
+    size = len(html)
+    i = 0
+    while size < kb * 1024:
+        piece = comment.format(i=i) + links.format(i=i)
+        padding.append(piece)
+        size += len(piece)
+        i += 1
+    half = len(padding) // 2
+    html = html.replace('<aside class="sidebar">', '<aside class="sidebar"><ul>' + "".join(padding[:half]) + "</ul>")
+    html = html.replace('<section id="comments" class="comments">',
+                        '<section id="comments" class="comments">' + "".join(padding[half:]))
+    return html.encode("utf-8")
+
+
+def measure(func: Callable[[bytes], List[str]], html: bytes, iterations: int) -> Tuple[float, float]:
+    """Seconds per call and peak allocated megabytes of one call"""
+    func(html)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(html)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--large-kb", type=int, default=2048)
+    args = parser.parse_args()
+
+    print("📰 Page extractor benchmark\n")
+    print(f"  {'fixture':<18} {'extractor':<9} {'precision':>10} {'recall':>8} {'F1':>6} {'ms':>8} {'peak MB':>8}")
+    totals = {name: [] for name, _ in EXTRACTORS}
+    for path in sorted(FIXTURES.glob("*.html")):
+        html = path.read_bytes()
+        gold = path.with_suffix(".txt").read_text(encoding="utf-8")
+        for name, func in EXTRACTORS:
+            precision, recall, f1 = token_f1("\n".join(func(html)), gold)
+            elapsed, peak = measure(func, html, args.iterations)
+            totals[name].append(f1)
+            print(f"  {path.stem:<18} {name:<9} {precision:>10.1%} {recall:>8.1%} {f1:>6.2f} {elapsed * 1e3:>8.2f} {peak:>8.2f}")
+
+    print()
+    for name, scores in totals.items():
+        print(f"  mean F1 {name:<9} {sum(scores) / max(len(scores), 1):.2f}")
+
+    html = large_page(args.large_kb)
+    print(f"\nLarge page ({len(html) / 1024:.0f} KB):")
+    results = {}
+    for name, func in EXTRACTORS:
+        results[name] = measure(func, html, max(args.iterations // 10, 1))
+        elapsed, peak = results[name]
+        print(f"  {name:<9} {elapsed * 1e3:>8.1f} ms {peak:>8.1f} MB peak")
+    (soup_time, soup_peak), (density_time, density_peak) = results["soup"], results["density"]
+    print(f"\n  density vs soup: {soup_time / density_time:.1f}x less CPU, {soup_peak / density_peak:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Language detection benchmark
+Compares the trigram classifier (cold and cached) with langdetect
+
+Usage:
+    python -m benchmarks.bench_langid [--iterations N]
+"""
+
+import argparse
+import time
+from app.langid import TrigramClassifier, SEED_TEXT, detect_language
+from benchmarks.bench_tokens import SAMPLES
+
+try:
+    from langdetect import DetectorFactory, detect
+except ImportError:
+    detect = None
+
+
+CASES = [
+    ("en", SAMPLES["en"]),
+    ("tr", SAMPLES["tr"]),
+    ("en", "Breaking: city council approves new budget for public transport"),
+    ("tr", "Son dakika: belediye meclisi toplu taşıma için yeni bütçeyi onayladı"),
+    ("tr", "Bugun hava cok guzel, aksam parkta yuruyus yapmayi dusunuyoruz"),
+    ("en", "Top 10 tips to make your morning routine more productive"),
+]
+
+
+def bench(label: str, func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"  {label:<32} {elapsed * 1e6:10.1f} µs/call")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    text = (SAMPLES["en"] + " ") * 5
+
+    print(f"🌐 Language detection benchmark ({args.iterations} iterations)\n")
+
+    start = time.perf_counter()
+    classifier = TrigramClassifier(SEED_TEXT)
+    print(f"  {'trigram classifier build':<32} {(time.perf_counter() - start) * 1e3:10.1f} ms")
+
+    bench("trigram classify", lambda: classifier.classify(text), args.iterations)
+    detect_language(text)
+    bench("detect_language (cached)", lambda: detect_language(text), args.iterations)
+
+    if detect is not None:
+        DetectorFactory.seed = 0
+        bench("langdetect.detect", lambda: detect(text[:1000]), max(args.iterations // 10, 1))
+
+    print("\nAccuracy:")
+    for expected, sample in CASES:
+        ours = classifier.classify(sample)
+        theirs = detect(sample) if detect is not None else "-"
+        mark = "✅" if ours == expected else "❌"
+        print(f"  {mark} expected={expected} trigram={ours} langdetect={theirs}  {sample[:40]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Model routing benchmark
+Shows which tier serves each request shape and, with --live, measures latency per tier
+
+Usage:
+    python -m benchmarks.bench_routing [--iterations N] [--live]
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter, defaultdict
+from app.config import get_settings
+from app.generator import generate_content
+from app.ratelimit import estimate_generation_cost
+from app.routing import DEFAULT_TIER, get_routing_policy
+from benchmarks.bench_tokens import SAMPLES, bench
+
+
+MODES = ["summary", "youtube", "shorts"]
+LENGTHS = ["short", "medium", "long"]
+INPUT_SIZES = [300, 1500, 4000, 12000, 50000]
+
+
+def make_text(chars: int) -> str:
+    """English/Turkish article text of roughly the given size"""
+    paragraphs = []
+    size = 0
+    i = 0
+    while size < chars:
+        paragraph = f"{SAMPLES['en'] if i % 2 else SAMPLES['tr']} ({i})"
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+        i += 1
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def offline_report(iterations: int) -> None:
+    policy = get_routing_policy()
+    texts = {size: make_text(size) for size in INPUT_SIZES}
+
+    print("Tier per request shape (rows: mode/length, columns: input chars)\n")
+    print(f"  {'':<16}" + "".join(f"{size:>10}" for size in INPUT_SIZES))
+    tier_counts: Counter = Counter()
+    tokens_by_tier: Counter = Counter()
+    for mode in MODES:
+        for length in LENGTHS:
+            row = []
+            for size in INPUT_SIZES:
+                route = policy.route(mode, length, size)
+                row.append(route.tier)
+                tier_counts[route.tier] += 1
+                tokens_by_tier[route.tier] += estimate_generation_cost(texts[size], mode, route.gen_model)
+            print(f"  {mode + '/' + length:<16}" + "".join(f"{tier:>10}" for tier in row))
+
+    total = sum(tier_counts.values())
+    print("\nShare of a uniform request mix:")
+    for tier, count in tier_counts.most_common():
+        route = policy.routes[tier]
+        print(
+            f"  {tier:<10} {count / total:6.1%} of requests, "
+            f"{tokens_by_tier[tier]:>8} est. tokens  ({route.gen_model})"
+        )
+
+    print()
+    bench("route()", lambda: policy.route("shorts", "medium", 3000), iterations)
+
+
+async def live_report(repeats: int) -> None:
+    """Time real generations with the routed tier and with the default tier"""
+    policy = get_routing_policy()
+    default = policy.routes[DEFAULT_TIER]
+    latencies = defaultdict(list)
+
+    shapes = [("shorts", "medium", 1500), ("summary", "short", 1500), ("youtube", "long", 12000)]
+    for mode, length, size in shapes:
+        text = make_text(size)
+        routed = policy.route(mode, length, size)
+        for route in ([routed] if routed.tier == DEFAULT_TIER else [routed, default]):
+            for _ in range(repeats):
+                start = time.perf_counter()
+                try:
+                    _, usage = await generate_content(text, mode, "neutral", length, "auto", route)
+                except Exception as e:
+                    print(f"  ❌ {mode}/{length}/{size} on {route.tier}: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+                latencies[(mode, length, size, route.tier)].append((elapsed, usage.total_tokens))
+
+    print("\nLive latency (median of runs):")
+    for (mode, length, size, tier), runs in sorted(latencies.items()):
+        runs.sort()
+        elapsed, tokens = runs[len(runs) // 2]
+        print(f"  {mode + '/' + length:<16} {size:>6} chars  {tier:<10} {elapsed:7.2f} s  {tokens:>6} tokens")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--live", action="store_true", help="Call the HF API (needs HF_API_TOKEN)")
+    parser.add_argument("--repeats", type=int, default=3, help="Live runs per shape and tier")
+    args = parser.parse_args()
+
+    print("🧭 Model routing benchmark\n")
+    settings = get_settings()
+    if not settings.routing_enabled:
+        # The rules are what is being evaluated, so they apply here regardless
+        print("ℹ️  Routing is off in the server (ROUTING_ENABLED); showing the configured rules\n")
+        settings.routing_enabled = True
+    offline_report(args.iterations)
+
+    if args.live:
+        if not get_settings().hf_api_token:
+            print("\n⚠️  HF_API_TOKEN is not set; skipping live run")
+            return
+        asyncio.run(live_report(args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Token counter benchmark
+Measures estimator speed and, when a local tokenizer file exists, its error
+
+Usage:
+    python -m benchmarks.bench_tokens [--model MODEL] [--iterations N] [--fit]
+
+With --fit, the estimator coefficients are fitted by least squares to the
+tokenizer's counts of the sample and fixture paragraphs, and saved as
+estimator.json next to the model's tokenizer.json. Deploy that file without
+the tokenizer to get fitted estimates.
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import List
+from app.config import get_settings
+from app.tokens import (
+    DEFAULT_COEFFICIENTS, EstimatorCounter, TokenizerFileCounter, Tokenizer, fit_coefficients, tokenizer_path
+)
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "extract"
+
+
+SAMPLES = {
+    "en": (
+        "The central bank kept interest rates unchanged on Thursday, citing "
+        "persistent inflation in services and a labour market that remains "
+        "tighter than expected. Analysts had forecast a 25 basis point cut, "
+        "and markets fell 1.4% after the announcement."
+    ),
+    "tr": (
+        "Merkez Bankası perşembe günü faiz oranlarını sabit tuttu; hizmet "
+        "enflasyonundaki kalıcılığı ve beklenenden sıkı seyreden işgücü "
+        "piyasasını gerekçe olarak gösterdi. Analistler 25 baz puanlık indirim "
+        "bekliyordu ve açıklamanın ardından piyasalar %1,4 düştü."
+    ),
+}
+
+
+def bench(label: str, func, iterations: int) -> float:
+    """Run func repeatedly and print the mean time per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = (time.perf_counter() - start) / iterations
+    print(f"  {label:<38} {elapsed * 1e6:10.1f} µs/call")
+    return elapsed
+
+
+def corpus() -> List[str]:
+    """Sample paragraphs and the lines (one paragraph each) of the extraction fixtures' gold texts"""
+    paragraphs = list(SAMPLES.values())
+    for path in sorted(FIXTURES.glob("*.txt")):
+        paragraphs.extend(line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip())
+    return paragraphs
+
+
+def relative_error(counter: EstimatorCounter, paragraphs: List[str], counts: List[int]) -> float:
+    """Mean absolute error of a counter relative to exact counts"""
+    return sum(abs(counter.count_segment(p) - n) / n for p, n in zip(paragraphs, counts)) / len(paragraphs)
+
+
+def fit(exact: TokenizerFileCounter, model: str) -> None:
+    paragraphs = corpus()
+    counts = [exact.count_segment(p) for p in paragraphs]
+    coefficients = fit_coefficients(paragraphs, counts)
+    print(f"\nFitted on {len(paragraphs)} paragraphs:")
+    print(f"  default {DEFAULT_COEFFICIENTS}  mean error {relative_error(EstimatorCounter(), paragraphs, counts):.1%}")
+    print(f"  fitted  {coefficients}  mean error {relative_error(EstimatorCounter(coefficients), paragraphs, counts):.1%}")
+
+    path = tokenizer_path(model, "estimator.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"model": model, "coefficients": coefficients, "paragraphs": len(paragraphs)}, f, indent=2)
+    print(f"  saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=get_settings().gen_model)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--fit", action="store_true", help="Fit and save estimator coefficients")
+    args = parser.parse_args()
+
+    # A ~12k char article made of distinct paragraphs, plus a prompt that
+    # repeats a static instruction prefix in front of it
+    article = "\n\n".join(
+        f"{SAMPLES['en']} ({i})" if i % 2 else f"{SAMPLES['tr']} ({i})"
+        for i in range(48)
+    )
+    prompt = "Please summarize the following text.\n\nFormat your response as bullet points.\n\n" + article
+
+    print(f"🔢 Token counter benchmark ({args.iterations} iterations)\n")
+
+    estimator = EstimatorCounter()
+    bench("estimator, new counter", lambda: EstimatorCounter().count(prompt), max(args.iterations // 10, 1))
+    estimator.count(prompt)
+    bench("estimator, reused counter", lambda: estimator.count(prompt), args.iterations)
+    bench("naive len(split()) // 4", lambda: len(prompt.split()) // 4, args.iterations)
+
+    path = tokenizer_path(args.model)
+    if Tokenizer is None or not os.path.isfile(path):
+        print(f"\n⚠️  No tokenizer file at {path}; skipping accuracy check")
+        return
+
+    exact = TokenizerFileCounter(path)
+    bench("tokenizer file, cold", lambda: TokenizerFileCounter(path).count(prompt), max(args.iterations // 100, 1))
+
+    print("\nEstimator error vs tokenizer file:")
+    for lang, text in SAMPLES.items():
+        truth = exact.count_segment(text)
+        estimate = estimator.count_segment(text)
+        naive = len(text.split()) // 4
+        print(
+            f"  {lang}: exact={truth:4d}  estimator={estimate:4d} "
+            f"({(estimate - truth) / truth:+.1%})  naive={naive:4d} ({(naive - truth) / truth:+.1%})"
+        )
+
+    if args.fit:
+        fit(exact, args.model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Mock Hugging Face Inference API
+Answers summarization and generation calls with deterministic text after a simulated latency
+
+Usage:
+    python -m benchmarks.mock_inference [--port 8900] [--latency-ms 400] [--ms-per-1k-chars 150]
+
+Point the backend at it with HF_API_BASE=http://127.0.0.1:8900/models and
+any HF_API_TOKEN. Calls with `max_new_tokens` are answered as generation
+(`generated_text`), others as summarization (`summary_text`); the same
+input always gets the same answer. Latency is a fixed part plus a part
+per 1000 input characters, varied by up to `--jitter` of itself with a
+seeded random generator. GET /stats returns the calls and input
+characters per model.
+"""
+
+import argparse
+import asyncio
+import random
+from collections import Counter
+from typing import Any, Dict
+import uvicorn
+from fastapi import FastAPI, Request
+from app.hashing import content_digest
+
+
+WORDS = (
+    "the report says results were strong this quarter while teams keep shipping "
+    "new features for users and partners across several markets with steady growth"
+).split()
+
+
+def answer(text: str, words: int) -> str:
+    """Deterministic pseudo text of a given number of words for an input"""
+    rng = random.Random(content_digest(text))
+    sentences = []
+    while words > 0:
+        count = min(words, rng.randint(8, 16))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(count)).capitalize() + ".")
+        words -= count
+    return " ".join(sentences)
+
+
+def create_app(
+    latency_ms: float = 400.0,
+    ms_per_1k_chars: float = 150.0,
+    jitter: float = 0.2,
+    seed: int = 7
+) -> FastAPI:
+    """
+    Mock inference app
+
+    Args:
+        latency_ms: Fixed latency of every call
+        ms_per_1k_chars: Added latency per 1000 input characters
+        jitter: Largest relative deviation from the computed latency
+        seed: Seed of the latency jitter
+
+    Returns:
+        FastAPI app serving POST /models/{model} and GET /stats
+    """
+    app = FastAPI(title="Mock Inference API")
+    rng = random.Random(seed)
+    calls: Counter = Counter()
+    chars: Counter = Counter()
+
+    @app.post("/models/{model:path}")
+    async def infer(model: str, request: Request):
+        payload = await request.json()
+        text = str(payload.get("inputs", ""))
+        parameters = payload.get("parameters") or {}
+        calls[model] += 1
+        chars[model] += len(text)
+
+        delay = (latency_ms + ms_per_1k_chars * len(text) / 1000) / 1000
+        await asyncio.sleep(delay * (1 + rng.uniform(-jitter, jitter)))
+
+        if "max_new_tokens" in parameters:
+            # About 0.75 words per token
+            return [{"generated_text": answer(text, max(1, int(parameters["max_new_tokens"] * 0.75)))}]
+        return [{"summary_text": answer(text, max(1, int(parameters.get("max_length", 120) * 0.75)))}]
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return {
+            "calls": dict(calls),
+            "input_chars": dict(chars),
+            "total_calls": sum(calls.values()),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--ms-per-1k-chars", type=float, default=150.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.ms_per_1k_chars, args.jitter, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
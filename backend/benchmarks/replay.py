@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Recorded traffic replay
+Drives recorded /extract and /generate traffic against a backend using the mock inference API
+
+Usage:
+    python -m benchmarks.replay logs/traffic.jsonl [--speed 10] [--concurrency 16]
+        [--env CACHE_POLICY=lru ...] [--json report.json] [--compare baseline.json]
+
+Records come from a server run with TRAFFIC_RECORD_FILE set. The replay
+starts the mock inference API (benchmarks/mock_inference.py), a page
+server and a backend on this tree, then sends the recorded requests in
+their recorded order and spacing (divided by --speed). Texts and pages
+are rebuilt from the recorded shapes: every recorded sentence digest
+becomes the same synthetic sentence of the same length wherever it
+occurs, so exact and near repeats recur where they did in the recorded
+traffic. Content handles from /extract are mapped to the replayed ones.
+
+The report compares latency percentiles and cache hits per endpoint
+with the recorded ones and counts the inference calls per model. Run it
+before and after a change (with --json) and pass the first report to
+--compare, or compare settings of one build with --env.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+import uvicorn
+from benchmarks.mock_inference import create_app
+
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Backend settings of a replay: results come from the mock and the replayed
+# traffic alone, and no limit meant for real clients throttles it
+BACKEND_ENV = {
+    "HF_API_TOKEN": "replay",
+    "SUMMARIZE_BACKEND": "hf_inference",
+    "GENERATE_BACKEND": "hf_inference",
+    "TRACE_FILE": "",
+    "TRAFFIC_RECORD_FILE": "",
+    "CACHE_SNAPSHOT_FILE": "",
+    "PREWARM_ENABLED": "false",
+    "PREWARM_EXTRACTORS": "false",
+    "MODEL_PROBE_INTERVAL_SECONDS": "86400",
+    "EXTRACT_RATE_LIMIT": "1000000/minute",
+    "GENERATE_BUDGET_CAPACITY": "1e12",
+    "GENERATE_BUDGET_REFILL_PER_SECOND": "1e12",
+    # Every page comes from the local page server, so per-site politeness
+    # would serialize the whole replay
+    "FETCH_HOST_CONCURRENCY": "1000",
+    "FETCH_HOST_INTERVAL_SECONDS": "0",
+    "LOG_LEVEL": "WARNING",
+    "ENVIRONMENT": "replay",
+}
+
+VOCABULARY = {
+    "en": (
+        "the a and of to in is that for it with as was on be by this are from or "
+        "have an they which one you were all we her she there would their what "
+        "people market city report school water energy company team season game "
+        "government research study health price growth plan year week new local "
+        "said says found shows expected increase decision service public system"
+    ).split(),
+    "tr": (
+        "ve bir bu da de için ile olarak çok daha gibi kadar sonra ancak göre "
+        "olan ise şu her yeni büyük önemli yıl gün hafta şehir okul su enerji "
+        "şirket takım sezon maç hükümet araştırma sağlık fiyat büyüme plan "
+        "açıkladı belirtti gösteriyor bekleniyor artış karar hizmet kamu sistem"
+    ).split(),
+}
+
+# Pages of URLs whose extraction was not recorded (e.g. /generate by URL)
+DEFAULT_PAGE_PARAGRAPHS = [[[f"default{i}-{j}", 100] for j in range(5)] for i in range(6)]
+
+# Longest wait of a /generate by content_id for its /extract
+HANDLE_WAIT_SECONDS = 60.0
+
+
+def load_records(paths: List[str]) -> List[Dict[str, Any]]:
+    """Recorded requests of traffic files, in the order they arrived"""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda record: record["ts"])
+
+
+def synthetic_sentence(digest: str, chars: int, lang: str) -> str:
+    """The same sentence of about `chars` characters for every occurrence of a digest"""
+    rng = random.Random(f"{lang}:{digest}")
+    words = VOCABULARY.get(lang, VOCABULARY["en"])
+    sentence = rng.choice(words).capitalize()
+    while len(sentence) < chars - 1:
+        sentence += " " + rng.choice(words)
+    return sentence + "."
+
+
+def synthetic_text(shape: Dict[str, Any], lang: str) -> str:
+    """A text with the recorded paragraphs and sentences"""
+    return "\n\n".join(
+        " ".join(synthetic_sentence(digest, chars, lang) for digest, chars in sentences)
+        for sentences in shape.get("paragraphs") or []
+    )
+
+
+def page_path(source: Dict[str, Any]) -> str:
+    return f"/{source.get('host') or 'unknown'}/{source['url_digest']}"
+
+
+def page_html(paragraphs: List[str]) -> bytes:
+    body = "\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Replay</title></head>"
+        f"<body><nav><a href=\"/\">Home</a></nav><article>{body}</article></body></html>"
+    ).encode("utf-8")
+
+
+def build_pages(records: List[Dict[str, Any]]) -> Dict[str, bytes]:
+    """HTML of every URL in the records, from its recorded extraction if there is one"""
+    pages: Dict[str, bytes] = {}
+    for record in records:
+        source = record.get("input") or {}
+        if "url_digest" not in source:
+            continue
+        path = page_path(source)
+        result = record.get("result") or {}
+        if record["path"] == "/extract" and result.get("text"):
+            text = synthetic_text(result["text"], result.get("lang") or "en")
+            pages[path] = page_html(text.split("\n\n"))
+        elif record["path"] == "/extract" and record["status"] != 200:
+            pages.setdefault(path, b"")  # Extraction failed, serve a 404
+    for record in records:
+        source = record.get("input") or {}
+        if "url_digest" in source and page_path(source) not in pages:
+            lang = (record.get("params") or {}).get("lang") or "en"
+            text = synthetic_text({"paragraphs": DEFAULT_PAGE_PARAGRAPHS}, "tr" if lang == "tr" else "en")
+            pages[page_path(source)] = page_html(text.split("\n\n"))
+    return pages
+
+
+class PageServer:
+    """Serves synthetic pages on a local port"""
+
+    def __init__(self, pages: Dict[str, bytes]):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = pages.get(self.path)
+                if not body:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+class MockInference:
+    """The mock inference API, served from a thread"""
+
+    def __init__(self, latency_ms: float, ms_per_1k_chars: float):
+        port = free_port()
+        config = uvicorn.Config(
+            create_app(latency_ms, ms_per_1k_chars), host="127.0.0.1", port=port, log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        return httpx.get(f"{self.base_url}/stats").json()
+
+    def close(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(env: Dict[str, str], log_path: Optional[str]) -> Tuple[subprocess.Popen, str]:
+    """Run the backend of this tree and wait until its startup probe is done"""
+    port = free_port()
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2).json().get("models_available"):
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Backend did not start within 60 seconds")
+
+
+def generate_body(record: Dict[str, Any], pages_url: str, handle: Optional[str]) -> Dict[str, Any]:
+    params = record.get("params") or {}
+    body = {name: params.get(name) or default for name, default in (
+        ("mode", "summary"), ("tone", "neutral"), ("length", "medium"), ("lang", "auto")
+    )}
+    source = record.get("input") or {}
+    if "url_digest" in source:
+        body["url"] = pages_url + page_path(source)
+    elif handle is not None:
+        body["content_id"] = handle
+    else:
+        body["text"] = synthetic_text(source, "tr" if body["lang"] == "tr" else "en")
+    return body
+
+
+async def replay(
+    records: List[Dict[str, Any]],
+    base_url: str,
+    pages_url: str,
+    speed: float,
+    concurrency: int
+) -> List[Dict[str, Any]]:
+    """Send the records at their recorded pace; returns one result per record"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    handles: Dict[str, asyncio.Future] = {}
+    for record in records:
+        content_id = (record.get("result") or {}).get("content_id")
+        if record["path"] == "/extract" and content_id:
+            handles[content_id] = loop.create_future()
+    results: List[Dict[str, Any]] = []
+
+    async def send(client: httpx.AsyncClient, record: Dict[str, Any]) -> None:
+        outcome = {"path": record["path"], "recorded": record}
+        source = record.get("input") or {}
+        handle = None
+        if record["path"] == "/generate" and "content_id" in source:
+            future = handles.get(source["content_id"])
+            if future is None:
+                outcome["skipped"] = "handle extracted before the recording"
+                results.append(outcome)
+                return
+            try:
+                handle = await asyncio.wait_for(asyncio.shield(future), HANDLE_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                handle = None
+            if handle is None:
+                outcome["skipped"] = "extraction of the handle failed"
+                results.append(outcome)
+                return
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if record["path"] == "/extract":
+                    response = await client.post("/extract", data={"url": pages_url + page_path(source)})
+                else:
+                    response = await client.post("/generate", json=generate_body(record, pages_url, handle))
+                outcome["status"] = response.status_code
+                outcome["body"] = response.json() if response.status_code == 200 else {}
+            except httpx.HTTPError as e:
+                outcome["status"] = 0
+                outcome["body"] = {}
+                outcome["error"] = str(e)
+            outcome["duration_ms"] = (time.perf_counter() - start) * 1000
+
+        if record["path"] == "/extract":
+            content_id = (record.get("result") or {}).get("content_id")
+            if content_id in handles and not handles[content_id].done():
+                handles[content_id].set_result(outcome["body"].get("content_id"))
+        results.append(outcome)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        tasks = []
+        first = records[0]["ts"]
+        started = time.monotonic()
+        for record in records:
+            delay = (record["ts"] - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, record)))
+        await asyncio.gather(*tasks)
+    for future in handles.values():
+        if not future.done():
+            future.cancel()
+    return results
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(ordered[-1], 1)}
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-endpoint outcome of a replay next to the recorded one"""
+    endpoints: Dict[str, Any] = {}
+    by_path: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for outcome in results:
+        by_path[outcome["path"]].append(outcome)
+
+    for path, outcomes in sorted(by_path.items()):
+        sent = [outcome for outcome in outcomes if "skipped" not in outcome]
+        ok = [outcome for outcome in sent if outcome["status"] == 200]
+        recorded_ok = [outcome["recorded"] for outcome in sent if outcome["recorded"]["status"] == 200]
+        statuses = Counter(str(outcome["status"]) for outcome in sent)
+        endpoints[path] = {
+            "requests": len(outcomes),
+            "skipped": len(outcomes) - len(sent),
+            "statuses": dict(statuses),
+            "status_changed": sum(outcome["status"] != outcome["recorded"]["status"] for outcome in sent),
+            "latency_ms": percentiles([outcome["duration_ms"] for outcome in ok]),
+            "recorded_latency_ms": percentiles([record["duration_ms"] for record in recorded_ok]),
+            "cache_hit_ratio": round(sum(bool(o["body"].get("cached")) for o in ok) / len(ok), 3) if ok else None,
+            "recorded_cache_hit_ratio": round(
+                sum(bool((r.get("result") or {}).get("cached")) for r in recorded_ok) / len(recorded_ok), 3
+            ) if recorded_ok else None,
+        }
+        if path == "/generate":
+            endpoints[path]["near_duplicate_hits"] = sum(bool(o["body"].get("near_duplicate")) for o in ok)
+            endpoints[path]["recorded_near_duplicate_hits"] = sum(
+                bool((r.get("result") or {}).get("near_duplicate")) for r in recorded_ok
+            )
+    return endpoints
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    def delta(value, old) -> str:
+        if baseline is None or value is None or old is None:
+            return ""
+        return f" ({value - old:+.1f})" if isinstance(value, float) else f" ({value - old:+d})"
+
+    print(f"\n  {'endpoint':<10} {'n':>5} {'changed':>8} {'':>9} {'p50':>16} {'p90':>16} {'p99':>16} {'hits':>8}")
+    for path, stats in report["endpoints"].items():
+        old = (baseline or {}).get("endpoints", {}).get(path, {})
+        for label, latency, hits in (
+            ("replay", stats["latency_ms"], stats["cache_hit_ratio"]),
+            ("recorded", stats["recorded_latency_ms"], stats["recorded_cache_hit_ratio"]),
+        ):
+            columns = []
+            for q in ("p50", "p90", "p99"):
+                value = "-" if latency[q] is None else str(latency[q])
+                if label == "replay":
+                    value += delta(latency[q], old.get("latency_ms", {}).get(q))
+                columns.append(f"{value:>16}")
+            hit_ratio = f"{hits:.1%}" if hits is not None else "-"
+            name, count, changed = (path, stats["requests"], stats["status_changed"]) if label == "replay" else ("", "", "")
+            print(f"  {name:<10} {count:>5} {changed:>8} {label:>9} {' '.join(columns)} {hit_ratio:>8}")
+        if stats["skipped"]:
+            print(f"  {'':<10} {stats['skipped']} skipped (content handle not replayable)")
+        if "near_duplicate_hits" in stats:
+            print(f"  {'':<10} near-duplicate hits: {stats['near_duplicate_hits']} "
+                  f"(recorded {stats['recorded_near_duplicate_hits']})")
+
+    old_calls = (baseline or {}).get("hf_calls", {})
+    print(f"\n  Inference calls: {report['hf_calls']['total']}{delta(report['hf_calls']['total'], old_calls.get('total'))}")
+    for model, calls in sorted(report["hf_calls"]["by_model"].items()):
+        print(f"    {model:<45} {calls:>6}{delta(calls, old_calls.get('by_model', {}).get(model))}")
+
+    server = report.get("server", {})
+    if server.get("speculation"):
+        summaries = server["speculation"].get("summaries", {})
+        print(f"\n  Speculation: {server['speculation'].get('chunks', 0)} chunks mapped, "
+              f"{summaries.get('speculative_used', 0)} used, {summaries.get('speculative_wasted', 0)} wasted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traffic", nargs="+", help="Traffic JSONL files (TRAFFIC_RECORD_FILE)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than recorded")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at most")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N records")
+    parser.add_argument("--latency-ms", type=float, default=400.0, help="Mock inference latency per call")
+    parser.add_argument("--ms-per-1k-chars", type=float, default=150.0, help="Mock latency per 1000 input characters")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Backend settings to override")
+    parser.add_argument("--server-log", help="Write the backend's output to this file")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Earlier --json report to show differences against")
+    args = parser.parse_args()
+
+    records = load_records(args.traffic)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No recorded requests in the given files")
+        return
+    span_seconds = records[-1]["ts"] - records[0]["ts"]
+    print(f"🔁 Replaying {len(records)} requests recorded over {span_seconds:.0f}s at {args.speed:g}x "
+          f"(about {span_seconds / args.speed:.0f}s)")
+
+    overrides = dict(item.split("=", 1) for item in args.env)
+    pages = PageServer(build_pages(records))
+    mock = MockInference(args.latency_ms, args.ms_per_1k_chars)
+    backend, base_url = start_backend(
+        {**BACKEND_ENV, "HF_API_BASE": f"{mock.base_url}/models", **overrides}, args.server_log
+    )
+    try:
+        calls_before = Counter(mock.stats()["calls"])
+        started = time.perf_counter()
+        results = asyncio.run(replay(records, base_url, pages.base_url, args.speed, args.concurrency))
+        elapsed = time.perf_counter() - started
+        calls = Counter(mock.stats()["calls"])
+        calls.subtract(calls_before)
+        server = httpx.get(f"{base_url}/info", timeout=10).json()
+    finally:
+        backend.terminate()
+        backend.wait(timeout=30)
+        mock.close()
+        pages.close()
+
+    report = {
+        "traffic": args.traffic,
+        "requests": len(records),
+        "speed": args.speed,
+        "elapsed_seconds": round(elapsed, 1),
+        "env": overrides,
+        "endpoints": summarize(results),
+        "hf_calls": {"total": sum(calls.values()), "by_model": {m: n for m, n in calls.items() if n}},
+        "server": {name: server.get(name) for name in ("cache", "content", "speculation", "fetch", "cancellations")},
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\n  Replayed in {elapsed:.1f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,7 +52,6 @@ def main():
         ("trafilatura", "trafilatura"),
         ("beautifulsoup4", "bs4"),
         ("newspaper3k", "newspaper"),
-        ("langdetect", "langdetect"),
         ("cachetools", "cachetools"),
         ("slowapi", "slowapi"),
     ]
@@ -65,6 +64,9 @@ def main():
     optional_packages = [
         ("readability-lxml", "readability"),
         ("requests", "requests"),
+        ("tokenizers", "tokenizers"),
+        ("ctranslate2", "ctranslate2"),
+        ("zstandard", "zstandard"),
     ]
     
     for package_name, import_name in optional_packages:
@@ -0,0 +1,70 @@
+"""
+Fixtures running the app in process against the mock inference API
+and a local page server (the helpers of benchmarks/replay.py)
+"""
+
+import os
+import random
+from typing import Dict
+import pytest
+from benchmarks.replay import BACKEND_ENV, MockInference, PageServer
+
+
+# Pages served to the app, by path; tests add their own
+PAGES: Dict[str, bytes] = {}
+
+WORDS = (
+    "council approved water plan city residents budget harbour river district school transport "
+    "energy housing market season report public research growth team system"
+).split()
+
+
+def paragraphs(topic: str, count: int):
+    """Distinct paragraphs of sentences made of seeded random words"""
+    rng = random.Random(topic)
+    return [
+        " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(14)).capitalize() + f" in {topic}."
+            for _ in range(4)
+        )
+        for _ in range(count)
+    ]
+
+
+def article(paragraphs) -> bytes:
+    """HTML page holding paragraphs in an article element"""
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    return f"<html><body><article>{body}</article></body></html>".encode()
+
+
+@pytest.fixture(scope="session")
+def mock():
+    server = MockInference(latency_ms=5, ms_per_1k_chars=1)
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def pages():
+    server = PageServer(PAGES)
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def backend_env(mock):
+    os.environ.update({**BACKEND_ENV, "HF_API_BASE": f"{mock.base_url}/models", "SPECULATE_ENABLED": "false"})
+    # Test modules may have imported the settings already; modules of the
+    # app that copy them at import are only imported by the fixtures below
+    from app import config
+    settings = config.Settings()
+    for name in config.Settings.model_fields:
+        setattr(config.settings, name, getattr(settings, name))
+
+
+@pytest.fixture(scope="session")
+def client(backend_env):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,25 @@
+"""
+/extract, end to end against a local page server
+"""
+
+from tests.conftest import PAGES, article, paragraphs
+
+
+def test_chunk_count_follows_condensed_text(client, pages):
+    from app.condense import condense_for_mode
+    from app.config import get_settings
+    from app.generator import chunk_text
+    from app.main import speculator
+    from app.routing import get_routing_policy
+
+    PAGES["/long-article"] = article(paragraphs("the old harbour", 80))
+    response = client.post("/extract", data={"url": f"{pages.base_url}/long-article"})
+    assert response.status_code == 200
+    result = response.json()
+
+    max_chunk_size = get_settings().max_chunk_size
+    variant = speculator.variant()
+    route = get_routing_policy().route(variant.mode, variant.length, len(result["text"]))
+    condensed = condense_for_mode(result["text"], variant.mode, route.gen_model)
+    assert len(chunk_text(result["text"], max_chunk_size)) > len(chunk_text(condensed, max_chunk_size))
+    assert result["chunks"] == len(chunk_text(condensed, max_chunk_size))
@@ -0,0 +1,44 @@
+"""
+/generate from URLs, end to end against the mock inference API
+"""
+
+from tests.conftest import PAGES, article, paragraphs
+
+
+PARAMS = {"mode": "summary", "tone": "neutral", "length": "medium", "lang": "en"}
+
+def test_single_chunk_page_reports_usage(client, pages):
+    PAGES["/single-chunk"] = article(paragraphs("harbour", 4))
+    response = client.post("/generate", json={**PARAMS, "url": f"{pages.base_url}/single-chunk"})
+    assert response.status_code == 200
+    result = response.json()
+    assert not result["cached"]
+    assert result["prompt_tokens"] > 0
+    assert result["completion_tokens"] > 0
+    assert result["tokens"] == result["prompt_tokens"] + result["completion_tokens"]
+
+
+def test_page_text_finds_result_of_its_url(client, pages, monkeypatch):
+    from app import routing
+    from app.config import get_settings
+
+    # URL inputs are routed as inputs of the maximum size, the pasted text by
+    # its length, so with the routing rules on they get different models
+    settings = get_settings()
+    monkeypatch.setattr(routing, "_policy", routing.RoutingPolicy(
+        settings.model_tiers, settings.routing_rules, settings.sum_model, settings.gen_model
+    ))
+    page = paragraphs("the river district", 6)
+    PAGES["/pasted-later"] = article(page)
+    params = {**PARAMS, "mode": "shorts", "length": "short"}
+    response = client.post("/generate", json={**params, "url": f"{pages.base_url}/pasted-later"})
+    assert response.status_code == 200
+    assert not response.json()["cached"]
+
+    text = "\n\n".join(page)
+    assert routing.get_routing_policy().route("shorts", "short", len(text)).tier != routing.DEFAULT_TIER
+    response = client.post("/generate", json={**params, "text": text})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["cached"]
+    assert result["near_duplicate"]
@@ -0,0 +1,40 @@
+"""
+Provider failures of the Space app (app.py) reach the caller as errors
+"""
+
+import importlib.util
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def space(backend_env):
+    # app.py shares its name with the app package, so it is loaded from its path
+    spec = importlib.util.spec_from_file_location("space_app", Path(__file__).parent.parent / "app.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fail_with(space, monkeypatch, error):
+    async def chat(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(space, "HF_API_TOKEN", "test")
+    monkeypatch.setattr(space.router_backend, "chat", chat)
+
+
+def test_rejected_request_is_not_answered_with_mock_text(space, monkeypatch):
+    from app.backends import RouterRejectedError
+    fail_with(space, monkeypatch, RouterRejectedError("HF Router error 400: prompt too long"))
+    response = TestClient(space.app).post("/generate", json={"input": "Some text to summarize here", "task": "summary"})
+    assert response.status_code == 502
+    assert "rejected" in response.json()["detail"]
+
+
+def test_failed_targets_are_not_answered_with_mock_text(space, monkeypatch):
+    from app.providers import AllTargetsFailedError
+    fail_with(space, monkeypatch, AllTargetsFailedError({"model:provider": RuntimeError("HTTP 503")}))
+    response = TestClient(space.app).post("/generate", json={"input": "Some text to summarize here", "task": "summary"})
+    assert response.status_code == 502
+    assert response.json()["detail"] == "LLM provider error: All targets failed"
@@ -0,0 +1,30 @@
+"""
+Token estimator features and counts
+"""
+
+import re
+from app.tokens import SEGMENT_SEPARATOR, EstimatorCounter, segment_features
+
+
+TEXTS = [
+    "The central bank kept interest rates unchanged on Thursday; markets fell 1.4% (as_expected).",
+    "Merkez Bankası perşembe günü faiz oranlarını sabit tuttu, piyasalar %1,4 düştü.",
+]
+
+
+def test_features_match_their_regex_definitions():
+    for text in TEXTS:
+        punct = len(re.findall(r"[^\w\s]", text))
+        assert segment_features(text) == (
+            len(re.findall(r"\w+", text)),
+            len(text) - punct - len(re.findall(r"\s", text)),
+            punct,
+            len(text.encode("utf-8")) - len(text),
+        )
+
+
+def test_text_is_counted_as_the_sum_of_its_paragraphs():
+    counter = EstimatorCounter()
+    text = SEGMENT_SEPARATOR.join(TEXTS * 10)
+    by_paragraph = sum(counter.count_segment(paragraph) for paragraph in TEXTS * 10) + 19
+    assert abs(counter.count(text) - by_paragraph) <= 10